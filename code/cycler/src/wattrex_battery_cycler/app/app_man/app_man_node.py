@@ -22,7 +22,7 @@ from system_shared_tool import (SysShdChanC, SysShdSharedObjC, SysShdNodeC,
 #######################          PROJECT IMPORTS         #######################
 from wattrex_cycler_datatypes.cycler_data import (CyclerDataAllStatusC, CyclerDataGenMeasC,
                                         CyclerDataExtMeasC, CyclerDataAlarmC, CyclerDataMergeTagsC,
-                                        CyclerDataCyclerStationC)
+                                        CyclerDataCyclerStationC, CyclerDataExtMeasFixedC)
 from .context import * # pylint: disable=wildcard-import, unused-wildcard-import
 from mid.mid_str import MidStrNodeC, MidStrReqCmdE, MidStrCmdDataC # pylint: disable= import-error, wrong-import-order
 from mid.mid_meas import MidMeasNodeC # pylint: disable= import-error, wrong-import-order
@@ -122,6 +122,11 @@ class AppManNodeC(SysShdNodeC): # pylint: disable=too-many-instance-attributes
             cs_info: CyclerDataCyclerStationC = response.station
             # launch the man_core and meas node if cs is not deprecated
             if not cs_info.deprecated:
+                # The extended measures are fixed by the devices of the cycler station, store
+                # them in slots so the copies of the shared object are cheap
+                ext_meas_type = CyclerDataExtMeasFixedC.from_devices(cs_info.devices)
+                self.__shd_ext_meas = SysShdSharedObjC(ext_meas_type())
+                self._th_str.share_ext_meas(self.__shd_ext_meas)
                 ### 1.2 Manager thread ###
                 self.man_core: AppManCoreC= AppManCoreC(devices=cs_info.devices, # pylint: disable=attribute-defined-outside-init
                                         str_reqs= reqs_chan, str_data= data_chan,
@@ -26,7 +26,8 @@ from system_config_tool import sys_conf_update_config_params
 
 DEFAULT_PERIOD_ELECT_MEAS   : int       = 25 # Express in centiseconds
 DEFAULT_PERIOD_TEMP_MEAS    : int       = 25 # Express in centiseconds
+DEFAULT_FRAME_POLL          : int       = 20 # Express in milliseconds, epc frames poll period
 
-CONSTANTS_NAMES = ('DEFAULT_PERIOD_ELECT_MEAS', 'DEFAULT_PERIOD_TEMP_MEAS')
+CONSTANTS_NAMES = ('DEFAULT_PERIOD_ELECT_MEAS', 'DEFAULT_PERIOD_TEMP_MEAS', 'DEFAULT_FRAME_POLL')
 sys_conf_update_config_params(context=globals(),
                               constants_names=CONSTANTS_NAMES)
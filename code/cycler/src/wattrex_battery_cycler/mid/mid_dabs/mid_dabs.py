@@ -6,8 +6,11 @@ the device and request info from it.
 """
 #######################        MANDATORY IMPORTS         #######################
 from __future__ import annotations
-from typing import List #, Dict
+from typing import Callable, Dict, List, Tuple
 #######################         GENERIC IMPORTS          #######################
+from operator import attrgetter
+from threading import Event
+from time import perf_counter, sleep
 
 #######################       THIRD PARTY IMPORTS        #######################
 
@@ -15,6 +18,7 @@ from system_logger_tool import sys_log_logger_get_module_logger, Logger
 log: Logger = sys_log_logger_get_module_logger(__name__)
 
 from scpi_sniffer       import DrvScpiSerialConfC
+from system_shared_tool import SysShdIpcChanC
 from wattrex_driver_epc import DrvEpcDeviceC, DrvEpcDataC
 # from wattrex_driver_ea  import DrvEaDeviceC, DrvEaDataC
 # from wattrex_driver_rs  import DrvRsDeviceC, DrvRsDataC
@@ -34,9 +38,64 @@ from wattrex_cycler_datatypes.cycler_data import (CyclerDataDeviceTypeE, CyclerD
 #######################              ENUMS               #######################
 
 ######################             CONSTANTS              ######################
-from .context import DEFAULT_PERIOD_ELECT_MEAS, DEFAULT_PERIOD_TEMP_MEAS
+from .context import DEFAULT_PERIOD_ELECT_MEAS, DEFAULT_PERIOD_TEMP_MEAS, DEFAULT_FRAME_POLL
+# Bits of the can id with the type of the epc message, and the types of the periodic frames,
+# electrical and temperature measures
+_EPC_MSG_MASK = 0x00F
+_EPC_PERIODIC_MSGS = (0xC, 0xD)
+# Attribute of the epc driver with its reception queue. The driver has no public access to it,
+# so its version is pinned in the requirements and checked again on each upgrade
+_EPC_RX_ATTR = '_DrvEpcDeviceC__device_handler'
+
+#######################            FUNCTIONS             #######################
+
+def _compile_mapping(mapping: Dict[str, int]) -> Tuple[Callable[[object], Tuple], Tuple[str, ...]]:
+    """Compile the mapping of the measures of a device, attribute of the driver data and its
+    UsedMeasID, into a getter of all the values at once and the names of the extended measures
+    attributes where they are written, attribute + '_' + UsedMeasID, in the same order.
+
+    Args:
+        mapping (Dict[str, int]): UsedMeasID of each attribute of the driver data.
+    Returns:
+        Tuple[Callable[[object], Tuple], Tuple[str, ...]]: Getter of the values and names of the
+        extended measures attributes.
+    """
+    keys = tuple(mapping.keys())
+    names = tuple(f"{key}_{mapping[key]}" for key in keys)
+    if len(keys) == 0:
+        getter = lambda _: ()
+    elif len(keys) == 1:
+        single = attrgetter(keys[0])
+        getter = lambda data: (single(data),)
+    else:
+        getter = attrgetter(*keys)
+    return getter, names
 #######################             CLASSES              #######################
 
+class _MidDabsRxTapC:
+    """Proxy of the reception queue of the epc driver, that counts the periodic frames the
+    driver reads from the type of each message. The replies to the requests are not counted.
+    """
+    def __init__(self, rx_chan: SysShdIpcChanC) -> None:
+        self.rx_chan: SysShdIpcChanC = rx_chan
+        self.n_frames: int = 0
+
+    def __count(self, msg: object) -> object:
+        if msg is not None and (msg.addr & _EPC_MSG_MASK) in _EPC_PERIODIC_MSGS:
+            self.n_frames += 1
+        return msg
+
+    def receive_data(self, *args, **kwargs) -> object:
+        """Receive a message from the queue."""
+        return self.__count(self.rx_chan.receive_data(*args, **kwargs))
+
+    def receive_data_unblocking(self) -> object:
+        """Receive a message from the queue if there is any."""
+        return self.__count(self.rx_chan.receive_data_unblocking())
+
+    def __getattr__(self, name: str):
+        return getattr(self.rx_chan, name)
+
 class MidDabsIncompatibleActionErrorC(Exception):
     """Exception raised when the action is not compatible with the device.
     """
@@ -59,6 +118,8 @@ class MidDabsExtraMeterC:
             self.__mapping_attr = {}
         else:
             self.__mapping_attr = device.mapping_names
+        self.__get_values, self.__meas_names = _compile_mapping(self.__mapping_attr)
+        self.__status_name: str = 'extra_meter_'+str(self._dev_db_id)
         if device.device_type is CyclerDataDeviceTypeE.BMS:
             can_id= 0
             if isinstance(device.iface_name, str):
@@ -75,26 +136,27 @@ class MidDabsExtraMeterC:
         #     self.device : DrvBkDeviceC = DrvBkDeviceC(
         #                                       DrvScpiHandlerC(device.link_conf.__dict__))
 
+    @property
+    def dev_db_id(self) -> int:
+        """Id of the device in the database."""
+        return self._dev_db_id
+
     def update(self, ext_meas: CyclerDataExtMeasC, status: CyclerDataAllStatusC) -> None:
         """Update the external measurements from bms or bk data.
 
         Args:
             ext_meas (CyclerDataExtMeasC): [description]
         """
-        res = None
         res= self.device.get_data()
-        if hasattr(res, 'status'):
-            if isinstance(res.status, DrvBaseStatusC):
-                state = CyclerDataDeviceStatusC(error= getattr(res,'status').error_code,
-                                                    dev_db_id= self._dev_db_id)
-                setattr(status, 'extra_meter_'+str(self._dev_db_id), state)
+        if isinstance(getattr(res, 'status', None), DrvBaseStatusC):
+            state = CyclerDataDeviceStatusC(error= res.status.error_code,
+                                            dev_db_id= self._dev_db_id)
+            setattr(status, self.__status_name, state)
         # elif isinstance(self.__device, DrvBkDeviceC):
         #     bk_state = CyclerDataDeviceStatusC(error= res.status.error_code,
         #                                         dev_id= self.__dev_id)
         #     setattr(status, 'extra_meter_'+str(self.__dev_id), bk_state)
-        for key in self.__mapping_attr.keys():
-            setattr(ext_meas, key+'_'+str(self.__mapping_attr[key]),
-                    getattr(res, key))
+        ext_meas.update_values(zip(self.__meas_names, self.__get_values(res)))
 
     def close(self):
         """Close connection with the device"""
@@ -119,6 +181,15 @@ class MidDabsPwrMeterC: #pylint: disable= too-many-instance-attributes
         # self.source     : DrvEaDeviceC | None = None
         # self.load       : DrvRsDeviceC | None = None
         self.epc        : DrvEpcDeviceC| None = None
+        self.mapping_epc: Dict[str, int]|None = None
+        ## Mapping of the temperatures and the electric measures of the epc, compiled once
+        self.__get_temp, self.__temp_names = _compile_mapping({})
+        self.__get_elect, self.__elect_names = _compile_mapping({})
+        ## Reception queue of the epc driver, counting the periodic frames it reads
+        self.__rx_tap   : _MidDabsRxTapC| None = None
+        self.__n_frames : int = 0
+        self.__new_frame: Event = Event()
+        self.__poll_rx  : bool = False
         try:
             for dev in pwr_devices:
                 if dev.device_type == CyclerDataDeviceTypeE.EPC:
@@ -130,9 +201,21 @@ class MidDabsPwrMeterC: #pylint: disable= too-many-instance-attributes
                     self.epc : DrvEpcDeviceC = DrvEpcDeviceC(can_id=can_id) #pylint: disable= unexpected-keyword-arg, no-value-for-parameter
                     self.epc.open()
                     self.mapping_epc = dev.mapping_names
+                    if self.mapping_epc is not None:
+                        self.__get_temp, self.__temp_names = _compile_mapping({key: meas_id
+                            for key, meas_id in self.mapping_epc.items() if 'temp' in key})
+                        self.__get_elect, self.__elect_names = _compile_mapping({key: meas_id
+                            for key, meas_id in self.mapping_epc.items() if 'temp' not in key})
                     self.epc.set_periodic(ack_en = False,
                         elect_en = True, elect_period = DEFAULT_PERIOD_ELECT_MEAS,
                         temp_en = True, temp_period = DEFAULT_PERIOD_TEMP_MEAS)
+                    rx_chan = getattr(self.epc, _EPC_RX_ATTR, None)
+                    if rx_chan is not None:
+                        self.__rx_tap = _MidDabsRxTapC(rx_chan)
+                        setattr(self.epc, _EPC_RX_ATTR, self.__rx_tap)
+                    else:
+                        log.error(f"The epc driver has no {_EPC_RX_ATTR} queue, its frames "
+                                  f"can not be waited, check the version of wattrex-driver-epc")
                 # elif dev.device_type is CyclerDataDeviceTypeE.SOURCE:
                 #     self.source : DrvEaDeviceC = DrvEaDeviceC(
                 #                               DrvScpiHandlerC(device.link_conf.__dict__))
@@ -160,6 +243,67 @@ class MidDabsPwrMeterC: #pylint: disable= too-many-instance-attributes
     #     else:
     #         status.pwr_dev = status.source
 
+    @property
+    def notifies_data(self) -> bool:
+        """True if the device pushes its measures periodically, so wait_new_data can block
+        until they arrive.
+        """
+        return self.__rx_tap is not None
+
+    def __notify_frame(self, _) -> None:
+        """Called from the notification thread when a message arrives to the empty queue.
+        """
+        self.__new_frame.set()
+
+    def __cancel_notification(self) -> None:
+        """Remove the notification request of the queue, if it is still registered.
+        """
+        try:
+            self.__rx_tap.rx_chan.request_notification(None)
+        except Exception as err: #pylint: disable= broad-exception-caught
+            log.debug(f"Notification of the epc queue already removed: {err}")
+
+    def __wait_message(self, timeout: float) -> None:
+        """Block until a message arrives to the queue or the timeout expires. If the queue can
+        not notify it, it is polled every DEFAULT_FRAME_POLL.
+        """
+        if not self.__poll_rx:
+            self.__new_frame.clear()
+            try:
+                self.__rx_tap.rx_chan.request_notification((self.__notify_frame, None))
+            except Exception as err: #pylint: disable= broad-exception-caught
+                log.error(f"Impossible to be notified of the epc frames, polling instead: {err}")
+                self.__poll_rx = True
+        if self.__poll_rx:
+            sleep(min(timeout, DEFAULT_FRAME_POLL/1000))
+        elif not self.__rx_tap.rx_chan.is_empty():
+            # The message arrived before the request, so it will not be notified
+            self.__cancel_notification()
+        elif not self.__new_frame.wait(timeout):
+            self.__cancel_notification()
+
+    def wait_new_data(self, timeout: float) -> bool:
+        """Block until the device pushes a periodic frame not used by the last update, or the
+        timeout expires. Every message received is read by the driver, the replies to the
+        requests of the last update are not counted as frames however late they arrive.
+
+        Args:
+            timeout (float): Max time to wait, express in seconds.
+        Returns:
+            bool: True if a new frame arrived, False if the timeout expired.
+        """
+        if self.__rx_tap is None:
+            sleep(timeout)
+            return False
+        deadline = perf_counter() + timeout
+        self.epc.get_data()
+        res = self.__rx_tap.n_frames != self.__n_frames
+        while not res and perf_counter() < deadline:
+            self.__wait_message(max(0.0, deadline - perf_counter()))
+            self.epc.get_data()
+            res = self.__rx_tap.n_frames != self.__n_frames
+        return res
+
     def update(self, gen_meas: CyclerDataGenMeasC, ext_meas: CyclerDataExtMeasC,#pylint: disable= too-many-branches
                status: CyclerDataAllStatusC) -> None:
         """Update the data from the hardware sendind the corresponding messages.
@@ -182,14 +326,10 @@ class MidDabsPwrMeterC: #pylint: disable= too-many-instance-attributes
             else:
                 pwr_mode = CyclerDataPwrModeE(msg_mode.mode.value)
             status.pwr_mode = pwr_mode
-            if self.mapping_epc is not None:
-                for key in self.mapping_epc.keys():
-                    if 'temp' in key:
-                        setattr(ext_meas, key+'_'+str(self.mapping_epc[key]),
-                                getattr(msg_temp_meas, key))
-                    else:
-                        setattr(ext_meas, key+'_'+str(self.mapping_epc[key]),
-                                getattr(msg_elect_meas, key))
+            ext_meas.update_values(zip(self.__temp_names, self.__get_temp(msg_temp_meas)))
+            ext_meas.update_values(zip(self.__elect_names, self.__get_elect(msg_elect_meas)))
+            if self.__rx_tap is not None:
+                self.__n_frames = self.__rx_tap.n_frames
         # elif self.device_type is CyclerDataDeviceTypeE.BISOURCE:
         #     res: DrvEaDataC = self.bisource.get_data()
         #     status.pwr_dev = CyclerDataDeviceStatusC(error= res.status.error_code,
@@ -208,6 +348,8 @@ class MidDabsPwrMeterC: #pylint: disable= too-many-instance-attributes
         """Close connection in serial with the device"""
         try:
             if self.device_type is CyclerDataDeviceTypeE.EPC:
+                if self.__rx_tap is not None:
+                    self.__cancel_notification()
                 self.epc.close()
             # elif self.device_type is CyclerDataDeviceTypeE.BISOURCE:
             #     self.bisource.close()
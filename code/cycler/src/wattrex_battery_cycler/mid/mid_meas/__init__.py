@@ -2,8 +2,9 @@
 This file specifies what is going to be exported from this module.
 '''
 
-from .mid_meas import MidMeasNodeC
+from .mid_meas import MidMeasNodeC, MidMeasAcqModeE
+from .mid_meas_ring import MidMeasRingC
 
 __all__ = [
-    'MidMeasNodeC'
+    'MidMeasNodeC', 'MidMeasAcqModeE', 'MidMeasRingC'
 ]
@@ -26,7 +26,12 @@ from system_config_tool import sys_conf_update_config_params
 
 DEFAULT_NODE_PERIOD: int        = 120 # Express in milliseconds
 DEFAULT_NODE_NAME: str          = 'MEAS'
+DEFAULT_ACQ_MODE: str           = 'PERIODIC' # PERIODIC or EVENT, see MidMeasAcqModeE
+DEFAULT_EVENT_TIMEOUT: int      = 500 # Express in milliseconds, max wait for a new frame
+DEFAULT_EXTRA_METER_DEADLINE: int = 80 # Express in milliseconds, max wait for each extra meter
+DEFAULT_RING_SIZE: int          = 4096 # Number of samples kept in the ring buffer of the node
 
-CONSTANTS_NAMES = ('DEFAULT_NODE_PERIOD', 'DEFAULT_NODE_NAME')
+CONSTANTS_NAMES = ('DEFAULT_NODE_PERIOD', 'DEFAULT_NODE_NAME', 'DEFAULT_ACQ_MODE',
+                   'DEFAULT_EVENT_TIMEOUT', 'DEFAULT_EXTRA_METER_DEADLINE', 'DEFAULT_RING_SIZE')
 sys_conf_update_config_params(context=globals(),
                               constants_names=CONSTANTS_NAMES)
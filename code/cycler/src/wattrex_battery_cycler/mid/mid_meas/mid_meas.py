@@ -6,7 +6,12 @@ This module will create a node that will gathers the measurements of the devices
 from __future__ import annotations
 from typing import List
 #######################         GENERIC IMPORTS          #######################
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from enum import Enum
 from threading import Event
+from time import perf_counter
+from types import SimpleNamespace
 #######################       THIRD PARTY IMPORTS        #######################
 
 from system_logger_tool import sys_log_logger_get_module_logger, Logger
@@ -19,13 +24,100 @@ from wattrex_cycler_datatypes.cycler_data import (CyclerDataDeviceC, CyclerDataG
 
 #######################          MODULE IMPORTS          #######################
 from ..mid_dabs import MidDabsPwrMeterC, MidDabsExtraMeterC #pylint: disable= relative-beyond-top-level
+from .mid_meas_ring import MidMeasRingC
 #######################          PROJECT IMPORTS         #######################
 ######################             CONSTANTS              ######################
-from .context import DEFAULT_NODE_PERIOD, DEFAULT_NODE_NAME
+from .context import (DEFAULT_NODE_PERIOD, DEFAULT_NODE_NAME, DEFAULT_ACQ_MODE,
+                      DEFAULT_EVENT_TIMEOUT, DEFAULT_EXTRA_METER_DEADLINE)
 #######################              ENUMS               #######################
+class MidMeasAcqModeE(Enum):
+    """Way the node acquires the measures of the devices.
+    """
+    # An iteration every node period
+    PERIODIC = 'PERIODIC'
+    # An iteration when the power device pushes new frames, or after the event timeout
+    EVENT = 'EVENT'
 
 #######################             CLASSES              #######################
 
+class MidMeasExtraPollC:
+    """
+    Poll of an extra meter in a worker thread. The device updates its own measures and status,
+    which are copied to the ones of the node when it answers before the deadline. Otherwise its
+    measures are flagged as stale and the update keeps running until the device answers.
+    """
+
+    def __init__(self, meter: MidDabsExtraMeterC,
+                 deadline: int = DEFAULT_EXTRA_METER_DEADLINE) -> None:
+        '''
+        Initialize the poll of the meter.
+        Arguments of the constructor:
+        - meter: Extra meter to poll.
+        - deadline: Max time to wait for the meter in each iteration, express in milliseconds.
+        '''
+        self.meter: MidDabsExtraMeterC = meter
+        self.deadline: int = deadline
+        self.stale_attr: str = CyclerDataExtMeasC.stale_attr(meter.dev_db_id)
+        self.stale: bool = False
+        self.n_stale: int = 0
+        self.__ext_meas: CyclerDataExtMeasC = CyclerDataExtMeasC()
+        self.__status: SimpleNamespace = SimpleNamespace()
+        self.__future: Future|None = None
+        self.__start: float = 0.0
+
+    def start(self, pool: ThreadPoolExecutor) -> None:
+        '''Start a new update of the meter, unless the last one is still running. The deadline
+        counts from this call in both cases.
+        '''
+        self.__start = perf_counter()
+        if self.__future is None:
+            self.__future = pool.submit(self.meter.update, ext_meas= self.__ext_meas,
+                                        status= self.__status)
+
+    def collect(self, ext_meas: CyclerDataExtMeasC, status: CyclerDataAllStatusC) -> None:
+        '''Wait for the update until the deadline and copy its measures and status, or flag the
+        measures as stale if the meter has not answered yet.
+        Raises the exception of the update if it failed.
+        '''
+        if self.__future is not None:
+            wait([self.__future], timeout= max(0.0, self.__start + self.deadline/1000
+                                               - perf_counter()))
+            if self.__future.done():
+                future, self.__future = self.__future, None
+                future.result()
+                ext_meas.update_values(self.__ext_meas.items())
+                vars(status).update(vars(self.__status))
+                if self.stale:
+                    log.info(f"Extra meter {self.meter.dev_db_id} answered again")
+                self.stale = False
+            elif not self.stale:
+                log.warning(f"Extra meter {self.meter.dev_db_id} has not answered in "
+                            f"{self.deadline} ms, its measures are stale")
+                self.stale = True
+        self.n_stale += self.stale
+        setattr(ext_meas, self.stale_attr, self.stale)
+
+    def close(self) -> None:
+        '''Close the meter once its last update has finished, waiting for it until the
+        deadline. If the meter has not answered yet, it is closed by the update when it ends,
+        so it is never closed while it is being read.
+        '''
+        future = self.__future
+        if future is not None:
+            wait([future], timeout= self.deadline/1000)
+        if future is None or future.done():
+            self.meter.close()
+        else:
+            log.warning(f"Extra meter {self.meter.dev_db_id} has not answered in "
+                        f"{self.deadline} ms, it will be closed when it answers")
+            future.add_done_callback(self.__close_meter)
+
+    def __close_meter(self, _: Future) -> None:
+        try:
+            self.meter.close()
+        except Exception as err: #pylint: disable= broad-exception-caught
+            log.error(f"Error closing extra meter {self.meter.dev_db_id}: {err}")
+
 class MidMeasNodeC(SysShdNodeC): #pylint: disable=too-many-instance-attributes
     """
     Class that represents a node used for update the measurements of the devices.
@@ -34,7 +126,8 @@ class MidMeasNodeC(SysShdNodeC): #pylint: disable=too-many-instance-attributes
     def __init__(self,shared_gen_meas: SysShdSharedObjC, shared_ext_meas: SysShdSharedObjC, #pylint: disable= too-many-arguments
                  shared_status: SysShdSharedObjC, working_flag : Event,
                  devices: List[CyclerDataDeviceC], excl_tags: CyclerDataMergeTagsC,
-                 meas_params: SysShdNodeParamsC= SysShdNodeParamsC()) -> None:
+                 meas_params: SysShdNodeParamsC= SysShdNodeParamsC(),
+                 acq_mode: MidMeasAcqModeE= MidMeasAcqModeE(DEFAULT_ACQ_MODE)) -> None:
         '''
         Initialize the thread node used to update measurements from devices.
         Arguments of the constructor:
@@ -46,16 +139,28 @@ class MidMeasNodeC(SysShdNodeC): #pylint: disable=too-many-instance-attributes
         - devices: List of devices.
         - excl_tags: Tags of excluded attributes.
         - meas_params: Node parameters.
+        - acq_mode: Way the measures are acquired, EVENT is only possible if the power device
+          pushes its measures periodically.
         '''
         super().__init__(name= DEFAULT_NODE_NAME,cycle_period= DEFAULT_NODE_PERIOD,
                         working_flag= working_flag, node_params= meas_params)
         self.working_flag = working_flag
-        self.__extra_meter: List[MidDabsExtraMeterC] = []
-        for dev in devices:
-            if not dev.is_control:
-                self.__extra_meter.append(MidDabsExtraMeterC(dev))
-                devices.remove(dev)
-        self.__pwr_dev: MidDabsPwrMeterC = MidDabsPwrMeterC(devices)
+        # The list of devices is shared with other nodes, so it is not modified
+        self.__extra_meter: List[MidDabsExtraMeterC] = [MidDabsExtraMeterC(dev)
+                                                        for dev in devices if not dev.is_control]
+        self.__pwr_dev: MidDabsPwrMeterC = MidDabsPwrMeterC([dev for dev in devices
+                                                             if dev.is_control])
+        ## Extra meters are polled in parallel, so a slow one does not delay the power device
+        self.__extra_polls: List[MidMeasExtraPollC] = [MidMeasExtraPollC(dev)
+                                                       for dev in self.__extra_meter]
+        self.__pool: ThreadPoolExecutor|None = None
+        if len(self.__extra_polls) > 0:
+            self.__pool = ThreadPoolExecutor(max_workers= len(self.__extra_polls),
+                                             thread_name_prefix= DEFAULT_NODE_NAME)
+        self.acq_mode: MidMeasAcqModeE = acq_mode
+        if acq_mode is MidMeasAcqModeE.EVENT and not self.__pwr_dev.notifies_data:
+            log.warning("The power device does not push its measures, acquiring periodically")
+            self.acq_mode = MidMeasAcqModeE.PERIODIC
         self.globlal_gen_meas: SysShdSharedObjC = shared_gen_meas
         self.globlal_ext_meas: SysShdSharedObjC = shared_ext_meas
         self.globlal_all_status: SysShdSharedObjC = shared_status
@@ -63,6 +168,8 @@ class MidMeasNodeC(SysShdNodeC): #pylint: disable=too-many-instance-attributes
         self._all_status: CyclerDataAllStatusC = self.globlal_all_status.read()
         self._gen_meas: CyclerDataGenMeasC = self.globlal_gen_meas.read()
         self._ext_meas: CyclerDataExtMeasC = self.globlal_ext_meas.read()
+        ## Every sample acquired, for the consumers that read slower than the node
+        self.samples: MidMeasRingC = MidMeasRingC(self._ext_meas)
 
     def sync_shd_data(self) -> None:
         '''Update the local variables to the shared data.
@@ -82,20 +189,50 @@ class MidMeasNodeC(SysShdNodeC): #pylint: disable=too-many-instance-attributes
     def process_iteration(self) -> None:
         """Processes a single iteration.
         """
+        # The extra devices are updated in the pool while the power device is read.
+        for poll in self.__extra_polls:
+            poll.start(self.__pool)
         # Update the measurements and status of the devices.
         self.__pwr_dev.update(self._gen_meas, self._ext_meas, self._all_status)
-        # Update the measurements and status of the extra devices.
-        for dev in self.__extra_meter:
-            dev.update(ext_meas= self._ext_meas, status= self._all_status)
+        # Each iteration acquires a new sample, so the storage can detect repeated or lost ones
+        self._gen_meas.seq += 1
+        self._gen_meas.timestamp = datetime.now()
+        # Collect the measurements and status of the extra devices that answered in time.
+        for poll in self.__extra_polls:
+            poll.collect(ext_meas= self._ext_meas, status= self._all_status)
+        self.samples.append(self._gen_meas, self._ext_meas)
         # Sync the shared data with the updated data.
         self.sync_shd_data()
         if (self._gen_meas.current is not None and self._gen_meas.voltage != 0 and
             self._gen_meas.voltage is not None):
             self.status = SysShdNodeStatusE.OK
 
+    def run(self) -> None:
+        """Run the node. In EVENT mode, each iteration starts when the power device pushes new
+        frames, or after the event timeout without them, instead of every node period.
+        """
+        if self.acq_mode is MidMeasAcqModeE.PERIODIC:
+            super().run()
+        else:
+            log.info("Start running process waiting for the power device frames")
+            self.status = SysShdNodeStatusE.INIT
+            while self.working_flag.is_set():
+                try:
+                    if not self.__pwr_dev.wait_new_data(timeout= DEFAULT_EVENT_TIMEOUT/1000):
+                        log.debug(f"No frames in {DEFAULT_EVENT_TIMEOUT} ms, updating anyway")
+                    self.process_iteration()
+                except Exception as err: #pylint: disable= broad-exception-caught
+                    log.error(f"Error in node {err}")
+                    raise SysShdErrorC(err) from err
+            self.stop()
+
     def stop(self) -> None:
         """Close the thread.
         """
-        for dev in self.__extra_meter:
-            dev.close()
+        # Each extra meter is closed once its update in flight finishes
+        for poll in self.__extra_polls:
+            poll.close()
+        if self.__pool is not None:
+            # Updates of devices that are not answering are not waited
+            self.__pool.shutdown(wait= False, cancel_futures= True)
         self.__pwr_dev.close()
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+'''
+Definition of MID MEAS ring, a fixed-size buffer with the samples acquired by the meas node,
+so consumers slower than the node can read all the samples since the last one they read.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from operator import attrgetter
+from typing import List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+import numpy as np
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataGenMeasC, CyclerDataExtMeasC,
+                                                  CyclerDataExtMeasFixedC)
+
+######################             CONSTANTS              ######################
+from .context import DEFAULT_RING_SIZE
+
+# Stamp of the slots without a sample, or whose sample is being written
+_EMPTY_SEQ = -1
+_GEN_MEAS_FIELDS: Tuple[str, ...] = ('voltage', 'current', 'power')
+
+#######################              ENUMS               #######################
+
+#######################             CLASSES              #######################
+
+class MidMeasRingC:
+    '''
+    Ring buffer of the samples of the meas node, stored in a NumPy structured array with the
+    sequence number, the timestamp, the generic measures and the extended measures of the
+    station with the stale flags of its devices. Measures not available are stored as NaN.
+    There must be a single writer, readers do not lock it. Each slot is stamped with the
+    sequence number of its sample once it is written, so a reader drops the samples that the
+    writer has overwritten while they were being copied.
+    '''
+    def __init__(self, ext_meas: CyclerDataExtMeasC|CyclerDataExtMeasFixedC,
+                 size: int = DEFAULT_RING_SIZE) -> None:
+        '''
+        Allocate the buffer, with a column for each extended measure of the station.
+
+        Args:
+            ext_meas (CyclerDataExtMeasC|CyclerDataExtMeasFixedC): Extended measures of the
+                node. Only the fixed ones have columns, as their names are known at startup.
+            size (int): Number of samples kept.
+        '''
+        self.size: int = size
+        self.ext_names: Tuple[str, ...] = ()
+        fields: List[Tuple[str, str]] = [('seq', 'i8'), ('timestamp', 'datetime64[us]')]
+        fields.extend((name, 'f8') for name in _GEN_MEAS_FIELDS)
+        if isinstance(ext_meas, CyclerDataExtMeasFixedC):
+            self.ext_names = ext_meas.fields
+            fields.extend((name, 'f8') for name in ext_meas.meas_fields)
+            # Stale flags of the devices, so the repeated measures can be filtered
+            fields.extend((name, '?') for name in ext_meas.stale_fields)
+        self.dtype: np.dtype = np.dtype(fields)
+        self.__buffer: np.ndarray = np.zeros(size, dtype= self.dtype)
+        self.__buffer['seq'] = _EMPTY_SEQ
+        self.__get_gen = attrgetter(*_GEN_MEAS_FIELDS)
+        self.__get_ext = None
+        if len(self.ext_names) > 0:
+            get_ext = attrgetter(*self.ext_names)
+            self.__get_ext = get_ext if len(self.ext_names) > 1 else lambda obj: (get_ext(obj),)
+        ## Sequence number of the last sample written
+        self.__head: int = _EMPTY_SEQ
+
+    @property
+    def head(self) -> int:
+        '''Sequence number of the last sample written, -1 if there is none.
+        '''
+        return self.__head
+
+    def append(self, gen_meas: CyclerDataGenMeasC,
+               ext_meas: CyclerDataExtMeasC|CyclerDataExtMeasFixedC) -> None:
+        '''
+        Write a sample, overwriting the oldest one if the buffer is full. The sequence number
+        of the sample must be greater than the previous one.
+
+        Args:
+            gen_meas (CyclerDataGenMeasC): Generic measures, with the sequence number and the
+                timestamp of the sample.
+            ext_meas (CyclerDataExtMeasC|CyclerDataExtMeasFixedC): Extended measures.
+        '''
+        row = (_EMPTY_SEQ, gen_meas.timestamp) + self.__get_gen(gen_meas)
+        if self.__get_ext is not None:
+            row += self.__get_ext(ext_meas)
+        slot = gen_meas.seq % self.size
+        # The slot is not valid for the readers until the stamp is written
+        self.__buffer[slot] = row
+        self.__buffer['seq'][slot] = gen_meas.seq
+        self.__head = gen_meas.seq
+
+    def read_since(self, seq: int) -> np.ndarray:
+        '''
+        Read the samples written after the given sequence number, in order. If the reader is
+        too slow the oldest ones have been overwritten and are missing, which can be checked
+        with their sequence numbers.
+
+        Args:
+            seq (int): Sequence number of the last sample read, -1 to read all the samples.
+        Returns:
+            np.ndarray: Copy of the samples, it is not modified by later writes.
+        '''
+        head = self.__head
+        first = max(seq + 1, head - self.size + 1, 0)
+        expected = np.arange(first, head + 1)
+        slots = expected % self.size
+        samples = self.__buffer[slots]
+        # A sample is valid if its slot had the same stamp before and after the copy
+        valid = (samples['seq'] == expected) & (self.__buffer['seq'][slots] == expected)
+        if not valid.all():
+            samples = samples[valid]
+        return samples
@@ -5,7 +5,9 @@ This file specifies what is going to be exported from this module.
 '''
 
 from .mid_str_node import MidStrNodeC
+from .mid_str_flush import MidStrFlushNodeC
 from .mid_str_facade import MidStrFacadeC
 from .mid_str_cmd import MidStrCmdDataC, MidStrDataCmdE, MidStrReqCmdE
 
-__all__ = [ "MidStrNodeC", "MidStrFacadeC", "MidStrCmdDataC", "MidStrDataCmdE", "MidStrReqCmdE" ]
+__all__ = [ "MidStrNodeC", "MidStrFlushNodeC", "MidStrFacadeC", "MidStrCmdDataC", "MidStrDataCmdE",
+            "MidStrReqCmdE" ]
@@ -9,6 +9,7 @@ in system_config_tool.
 #######################        MANDATORY IMPORTS         #######################
 from __future__ import annotations
 #######################         GENERIC IMPORTS          #######################
+from typing import Dict
 
 #######################      SYSTEM ABSTRACTION IMPORTS  #######################
 from system_logger_tool import Logger, sys_log_logger_get_module_logger
@@ -28,8 +29,28 @@ DEFAULT_TIMEOUT_CONNECTION: int = 5
 DEFAULT_NODE_PERIOD: int        = 250 # Express in milliseconds
 DEFAULT_NODE_NAME: str          = 'STR'
 DEFAULT_CRED_FILEPATH : str = './config/.cred.yaml' # Path to the location of the credential file
+DEFAULT_FLUSH_SIZE: int         = 10 # Number of samples buffered before writing them to cache db
+DEFAULT_FLUSH_LATENCY: int      = 2000 # Max time a sample is buffered, express in milliseconds
+DEFAULT_FLUSH_NODE_PERIOD: int  = 60 # Express in milliseconds, must be below the MEAS node period
+DEFAULT_FLUSH_NODE_NAME: str    = 'STR_FLUSH'
+DEFAULT_METRICS_LOG_PERIOD: int = 60000 # Period to log the lanes metrics, express in milliseconds
+DEFAULT_CACHE_SIZE: int         = 16 # Number of profiles and batteries kept in memory
+DEFAULT_SPOOL_PATH: str         = './spool' # Directory of the spool files of the experiments
+DEFAULT_SPOOL_SIZE: int         = 4194304 # Initial size of a spool file, express in bytes
+DEFAULT_SPOOL_CHUNK: int        = 500 # Max number of spool records written to cache db at once
+DEFAULT_DRAIN_NODE_PERIOD: int  = 500 # Period of the spool drain, express in milliseconds
+DEFAULT_DRAIN_NODE_NAME: str    = 'STR_DRAIN'
+DEFAULT_STATUS_KEEP_ALIVE: int  = 60000 # Max time between status rows, express in milliseconds
+DEFAULT_COMPRESS_MODE: str      = 'DISABLED' # DISABLED, DEADBAND or SWINGING_DOOR
+# Max reconstruction error of the compressed generic measures, in mV, mA and dW
+DEFAULT_COMPRESS_TOLERANCES: Dict[str, int] = {'Voltage': 5, 'Current': 10, 'Power': 5}
 
 CONSTANTS_NAMES = ('DEFAULT_TIMEOUT_CONNECTION', 'DEFAULT_NODE_PERIOD', 'DEFAULT_NODE_NAME',
-                   'DEFAULT_CRED_FILEPATH')
+                   'DEFAULT_CRED_FILEPATH', 'DEFAULT_FLUSH_SIZE', 'DEFAULT_FLUSH_LATENCY',
+                   'DEFAULT_FLUSH_NODE_PERIOD', 'DEFAULT_FLUSH_NODE_NAME',
+                   'DEFAULT_METRICS_LOG_PERIOD', 'DEFAULT_CACHE_SIZE', 'DEFAULT_SPOOL_PATH',
+                   'DEFAULT_SPOOL_SIZE', 'DEFAULT_SPOOL_CHUNK', 'DEFAULT_DRAIN_NODE_PERIOD',
+                   'DEFAULT_DRAIN_NODE_NAME', 'DEFAULT_STATUS_KEEP_ALIVE',
+                   'DEFAULT_COMPRESS_MODE', 'DEFAULT_COMPRESS_TOLERANCES')
 sys_conf_update_config_params(context=globals(),
                               constants_names=CONSTANTS_NAMES)
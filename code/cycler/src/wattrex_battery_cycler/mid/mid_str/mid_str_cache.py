@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+'''
+Definition of MID STR LRU cache, used to keep the profiles and batteries already read from the
+master database.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Any, Hashable
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+from .context import DEFAULT_CACHE_SIZE
+
+#######################              ENUMS               #######################
+
+#######################             CLASSES              #######################
+
+class MidStrLruCacheC:
+    '''
+    Least recently used cache. Each entry is stored with a signature of the database rows it
+    was built from, an entry is only returned if the signature has not changed.
+    Entries are returned as copies, as the users modify the objects received.
+    '''
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE) -> None:
+        '''
+        Initialize the cache.
+
+        Args:
+            size (int): Max number of entries kept in the cache.
+        '''
+        self.size: int = size
+        self.hits: int = 0
+        self.misses: int = 0
+        self.__entries: OrderedDict[Hashable, tuple] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: Hashable, signature: Hashable) -> Any|None:
+        '''Get a copy of the entry stored with the given key and signature.
+
+        Args:
+            key (Hashable): Key of the entry.
+            signature (Hashable): Signature of the rows the entry is built from.
+        Returns:
+            Any|None: Copy of the entry, None if not found or the signature has changed.
+        '''
+        res = None
+        entry = self.__entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self.__entries.move_to_end(key)
+            res = deepcopy(entry[1])
+            self.hits += 1
+        else:
+            if entry is not None:
+                log.debug(f"Cache entry {key} is outdated")
+                del self.__entries[key]
+            self.misses += 1
+        return res
+
+    def put(self, key: Hashable, signature: Hashable, value: Any) -> None:
+        '''Store a copy of the value, discarding the least recently used entry if full.
+
+        Args:
+            key (Hashable): Key of the entry.
+            signature (Hashable): Signature of the rows the entry is built from.
+            value (Any): Value to store.
+        '''
+        if self.size > 0:
+            self.__entries[key] = (signature, deepcopy(value))
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.size:
+                self.__entries.popitem(last= False)
+
+    def clear(self) -> None:
+        '''Discard all the entries.
+        '''
+        self.__entries.clear()
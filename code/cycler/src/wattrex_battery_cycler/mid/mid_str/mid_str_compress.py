@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+'''
+Definition of MID STR compressor, used to discard the generic measures that can be rebuilt from
+the stored ones within the configured tolerances.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from enum import Enum
+from typing import Any, Dict, List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+from .context import DEFAULT_COMPRESS_MODE, DEFAULT_COMPRESS_TOLERANCES
+
+#######################              ENUMS               #######################
+class MidStrCompressModeE(Enum):
+    '''Algorithms available to compress the generic measures.
+    '''
+    DISABLED = 'DISABLED'
+    # Store a sample when a value moves more than its tolerance from the last stored one,
+    # dropped samples are rebuilt holding the previous value
+    DEADBAND = 'DEADBAND'
+    # Store a sample when the line from the last stored one can not follow all the samples
+    # in between within the tolerances, dropped samples are rebuilt interpolating linearly
+    SWINGING_DOOR = 'SWINGING_DOOR'
+
+#######################             CLASSES              #######################
+
+class MidStrCompressorC: #pylint: disable= too-many-instance-attributes
+    '''
+    Compression stage of the generic measures written by the STR node. It receives each sample
+    as its generic measures row together with any data that must be stored with it, and
+    returns the samples to store. The last sample received is held until the next one decides
+    if it is needed, so samples are returned with one sample of delay.
+    Samples at instruction boundaries and power mode changes are always stored, as well as
+    the last one of each segment.
+    '''
+    def __init__(self, mode: str|MidStrCompressModeE = DEFAULT_COMPRESS_MODE,
+                 tolerances: Dict[str, int] = DEFAULT_COMPRESS_TOLERANCES) -> None:
+        '''
+        Initialize the compressor.
+
+        Args:
+            mode (str|MidStrCompressModeE): Compression algorithm.
+            tolerances (Dict[str, int]): Max reconstruction error of each column of the generic
+                measures table, express in the units of the column (mV, mA, dW). Columns not
+                included are not compared.
+        '''
+        self.mode: MidStrCompressModeE = MidStrCompressModeE(mode)
+        self.tolerances: Tuple[Tuple[str, float], ...] = tuple(tolerances.items())
+        self.n_received: int = 0
+        self.n_stored: int = 0
+        self.__anchor: Dict|None = None
+        self.__anchor_time: float = 0.0
+        self.__held: Tuple[Dict, Any]|None = None
+        self.__boundary: Tuple|None = None
+        self.__slopes_up: List[float] = []
+        self.__slopes_low: List[float] = []
+
+    @property
+    def ratio(self) -> float:
+        '''Relation between the samples received and the ones stored.
+        '''
+        return self.n_received / self.n_stored if self.n_stored > 0 else 1.0
+
+    def add(self, gen_meas: Dict, data: Any = None) -> List[Tuple[Dict, Any]]:
+        '''Add a new sample.
+
+        Args:
+            gen_meas (Dict): Row of the generic measures table of the sample.
+            data (Any): Data stored together with the sample, as its extended measures.
+        Returns:
+            List[Tuple[Dict, Any]]: Samples to store, in order.
+        '''
+        self.n_received += 1
+        if self.mode is MidStrCompressModeE.DISABLED:
+            res = [(gen_meas, data)]
+        else:
+            boundary = (gen_meas['InstrID'], gen_meas['PowerMode'])
+            values_missing = any(gen_meas.get(column) is None for column, _ in self.tolerances)
+            if self.__anchor is None or boundary != self.__boundary or values_missing:
+                res = self.__take_held()
+                res.append((gen_meas, data))
+                self.__set_anchor(gen_meas)
+                self.__boundary = boundary
+            elif self.__in_tolerance(gen_meas):
+                res = []
+                self.__held = (gen_meas, data)
+            else:
+                res = self.__store_held(gen_meas, data)
+        self.n_stored += len(res)
+        return res
+
+    def flush(self) -> List[Tuple[Dict, Any]]:
+        '''Get the sample held, if any, and start a new segment with the next sample.
+        Called when the experiment finishes so its last sample is stored.
+
+        Returns:
+            List[Tuple[Dict, Any]]: Samples to store.
+        '''
+        res = self.__take_held()
+        self.n_stored += len(res)
+        self.__anchor = None
+        self.__boundary = None
+        return res
+
+    def reset(self) -> None:
+        '''Discard the sample held and the statistics.
+        '''
+        self.flush()
+        self.n_received = 0
+        self.n_stored = 0
+
+    def __take_held(self) -> List[Tuple[Dict, Any]]:
+        res = [] if self.__held is None else [self.__held]
+        self.__held = None
+        return res
+
+    def __set_anchor(self, gen_meas: Dict) -> None:
+        self.__anchor = gen_meas
+        self.__anchor_time = gen_meas['Timestamp'].timestamp()
+        self.__held = None
+        self.__slopes_up = [float('inf')] * len(self.tolerances)
+        self.__slopes_low = [float('-inf')] * len(self.tolerances)
+
+    def __store_held(self, gen_meas: Dict, data: Any) -> List[Tuple[Dict, Any]]:
+        if self.__held is None or self.mode is MidStrCompressModeE.DEADBAND:
+            # Store both sides of the step, so it is rebuilt at the right time
+            res = self.__take_held()
+            res.append((gen_meas, data))
+            self.__set_anchor(gen_meas)
+        else:
+            res = [self.__held]
+            self.__set_anchor(self.__held[0])
+            # The new sample is always inside the door opened from the held one
+            self.__in_tolerance(gen_meas)
+            self.__held = (gen_meas, data)
+        return res
+
+    def __in_tolerance(self, gen_meas: Dict) -> bool:
+        anchor = self.__anchor
+        res = True
+        if self.mode is MidStrCompressModeE.DEADBAND:
+            res = all(abs(gen_meas[column] - anchor[column]) <= tol
+                      for column, tol in self.tolerances)
+        else:
+            # The line from the stored sample to the new one must pass within the tolerance
+            # of every sample in between, so it can replace them
+            elapsed = gen_meas['Timestamp'].timestamp() - self.__anchor_time
+            diffs = [gen_meas[column] - anchor[column] for column, _ in self.tolerances]
+            if elapsed <= 0:
+                res = all(abs(diff) <= tol for diff, (_, tol) in zip(diffs, self.tolerances))
+            else:
+                res = all(self.__slopes_low[i] <= diff / elapsed <= self.__slopes_up[i]
+                          for i, diff in enumerate(diffs))
+                if res:
+                    for i, (diff, (_, tol)) in enumerate(zip(diffs, self.tolerances)):
+                        self.__slopes_up[i] = min(self.__slopes_up[i], (diff + tol) / elapsed)
+                        self.__slopes_low[i] = max(self.__slopes_low[i], (diff - tol) / elapsed)
+        return res
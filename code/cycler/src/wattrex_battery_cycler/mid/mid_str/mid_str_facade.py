@@ -7,10 +7,12 @@ from __future__ import annotations
 
 #######################         GENERIC IMPORTS          #######################
 from datetime import datetime
-from typing import List, Tuple
+from operator import attrgetter
+from time import time
+from typing import Callable, Dict, List, Tuple
 
 #######################       THIRD PARTY IMPORTS        #######################
-from sqlalchemy import select, update
+from sqlalchemy import and_, func, select, update
 
 #######################      SYSTEM ABSTRACTION IMPORTS  #######################
 from system_logger_tool import sys_log_logger_get_module_logger
@@ -18,9 +20,8 @@ log = sys_log_logger_get_module_logger(__name__)
 
 #######################          PROJECT IMPORTS         #######################
 from wattrex_driver_db import (DrvDbSqlEngineC, DrvDbMasterExperimentC, DrvDbBatteryC,
-        DrvDbProfileC, DrvDbCyclerStationC, DrvDbInstructionC, DrvDbExpStatusE, DrvDbAlarmC,
-        DrvDbCacheExtendedMeasureC, DrvDbCacheGenericMeasureC, DrvDbCacheStatusC, DrvDbTypeE,
-        DrvDbUsedDeviceC, DrvDbCompatibleDeviceC, DrvDbDeviceTypeE, DrvDbLinkConfigurationC,
+        DrvDbProfileC, DrvDbCyclerStationC, DrvDbInstructionC, DrvDbExpStatusE,
+        DrvDbTypeE, DrvDbUsedDeviceC, DrvDbCompatibleDeviceC, DrvDbDeviceTypeE, DrvDbLinkConfigurationC,
         DrvDbCacheExperimentC, DrvDbDetectedDeviceC, DrvDbUsedMeasuresC, DrvDbAvailableMeasuresC,
         transform_experiment_db)
 
@@ -30,10 +31,15 @@ from wattrex_cycler_datatypes.cycler_data import (CyclerDataAlarmC, CyclerDataGe
             CyclerDataCyclerStationC, CyclerDataInstructionC, CyclerDataPwrRangeC,
             CyclerDataPwrModeE, CyclerDataPwrLimitE, CyclerDataLinkConfC)
 
+######################             CONSTANTS              ######################
+from .context import DEFAULT_STATUS_KEEP_ALIVE
 #######################          MODULE IMPORTS          #######################
 from .mid_str_mapping import (MAPPING_INSTR_LIMIT_MODES, MAPPING_INSTR_DB, MAPPING_INSTR_MODES,
                               MAPPING_ALARM, MAPPING_BATT_DB, MAPPING_CS_DB, MAPPING_DEV_DB,
                               MAPPING_GEN_MEAS, MAPPING_EXPERIMENT, MAPPING_STATUS)
+from .mid_str_writer import MidStrBulkWriterC
+from .mid_str_cache import MidStrLruCacheC
+from .mid_str_compress import MidStrCompressorC
 
 #######################              ENUMS               #######################
 
@@ -53,25 +59,66 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
     This class is used to interface with the database.
     '''
     def __init__(self, cycler_station_id: int,
-                 cred_file : str = ".cred.yaml") -> None:
+                 cred_file : str = ".cred.yaml", use_master_db: bool = True,
+                 master_db: DrvDbSqlEngineC|None = None,
+                 cache_db: DrvDbSqlEngineC|None = None) -> None:
+        """Open the connections to the databases.
+        Args:
+            cycler_station_id (int): Id of the cycler station.
+            cred_file (str): Path to the credentials file of the databases.
+            use_master_db (bool): If False, no connection to the master db is opened.
+            master_db (DrvDbSqlEngineC|None): Master db connection to use instead of opening one.
+            cache_db (DrvDbSqlEngineC|None): Cache db connection to use instead of opening one.
+        """
         log.info("Initializing DB Connection...")
         self.cs_id = cycler_station_id
-        self.__master_db: DrvDbSqlEngineC = DrvDbSqlEngineC(db_type=DrvDbTypeE.MASTER_DB,
-                                                            config_file= cred_file)
-        self.__cache_db: DrvDbSqlEngineC = DrvDbSqlEngineC(db_type=DrvDbTypeE.CACHE_DB,
-                                                            config_file= cred_file)
+        # Facades that only write into the cache db do not open a connection to the master db
+        self.__master_db: DrvDbSqlEngineC|None = master_db
+        if self.__master_db is None and use_master_db:
+            self.__master_db = DrvDbSqlEngineC(db_type=DrvDbTypeE.MASTER_DB,
+                                               config_file= cred_file)
+        self.__cache_db: DrvDbSqlEngineC|None = cache_db
+        if self.__cache_db is None:
+            self.__cache_db = DrvDbSqlEngineC(db_type=DrvDbTypeE.CACHE_DB,
+                                              config_file= cred_file)
         self.all_status: CyclerDataAllStatusC = CyclerDataAllStatusC()
         self.gen_meas: CyclerDataGenMeasC = CyclerDataGenMeasC()
         self.ext_meas: CyclerDataExtMeasC = CyclerDataExtMeasC()
         self.meas_id: int = 0
         self.status_id: int = 0
         self.alarm_id: int = 0
+        self.status_keep_alive: int = DEFAULT_STATUS_KEEP_ALIVE
+        self.__last_status: Tuple|None = None
+        self.__last_status_time: float = 0.0
+        self.__writer: MidStrBulkWriterC = MidStrBulkWriterC()
+        self.__compressor: MidStrCompressorC = MidStrCompressorC()
+        self.__cs_devices: List[CyclerDataDeviceC] = []
+        self.__ext_meas_plan: Tuple[Tuple[Callable, int, str|None], ...] = ()
+        self.__profile_cache: MidStrLruCacheC = MidStrLruCacheC()
+        self.__battery_cache: MidStrLruCacheC = MidStrLruCacheC()
+
+    @property
+    def cs_devices(self) -> List[CyclerDataDeviceC]:
+        '''Devices of the cycler station as read from the database, not modified by the nodes
+        the station is sent to.
+        '''
+        return list(self.__cs_devices)
+
+    @property
+    def pending_rows(self) -> int:
+        '''Number of rows buffered and not written yet into the cache db.
+        '''
+        return self.__writer.n_rows
 
     def get_start_queued_exp(self) -> Tuple[CyclerDataExperimentC|None, CyclerDataBatteryC|None,
                                             CyclerDataProfileC|None]:
         '''
         Get the oldest queued experiment, assigned to the cycler station where this
         cycler would be running, and change its status to RUNNING in database.
+        The experiment is claimed in the master db by locking only its row and changing its
+        status with a conditional update, so two instances of the same cycler station can not
+        start the same experiment. The RUNNING experiment is then committed in the cache db,
+        if it fails the claim is reverted and no experiment is returned.
         '''
         self.meas_id = 0
         self.status_id = 0
@@ -82,31 +129,81 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
         self.__master_db.session.expire_all()
         self.__master_db.session.close()
         self.__master_db.session.begin()
-        exp_result = self.__master_db.session.query(DrvDbMasterExperimentC).populate_existing().\
-            filter( DrvDbMasterExperimentC.Status == DrvDbExpStatusE.QUEUED.value,
-            DrvDbMasterExperimentC.CSID == self.cs_id).order_by(
-                DrvDbMasterExperimentC.DateCreation.asc()).all()
-        if len(exp_result) != 0:
-            exp_result: DrvDbMasterExperimentC = exp_result[0]
-            exp : CyclerDataExperimentC = CyclerDataExperimentC()
-            for db_name, att_name in MAPPING_EXPERIMENT.items():
-                setattr(exp, att_name, getattr(exp_result,db_name))
-
-            # Get battery info
-            battery = self.__get_exp_battery_data(exp_result.BatID)
-            # Get profile info
-            profile = self.__get_exp_profile_data(exp_result.ProfID)
-            # Change experiment status to running and update begin datetime
-            exp_db = DrvDbCacheExperimentC()
-            transform_experiment_db(source= exp_result, target = exp_db)
+        stmt = select(DrvDbMasterExperimentC).where(
+                DrvDbMasterExperimentC.Status == DrvDbExpStatusE.QUEUED.value,
+                DrvDbMasterExperimentC.CSID == self.cs_id).\
+            order_by(DrvDbMasterExperimentC.DateCreation.asc()).limit(1).\
+            with_for_update(skip_locked= True).execution_options(populate_existing=True)
+        exp_result: DrvDbMasterExperimentC|None = self.__master_db.session.execute(stmt).\
+            scalars().first()
+        if exp_result is not None:
+            date_begin = datetime.utcnow().replace(microsecond= 0)
+            # Kept to return the experiment to the queue if it can not be started
+            queued_exp = (exp_result.ExpID, exp_result.DateBegin)
+            try:
+                stmt = update(DrvDbMasterExperimentC).where(
+                        DrvDbMasterExperimentC.ExpID == exp_result.ExpID,
+                        DrvDbMasterExperimentC.Status == DrvDbExpStatusE.QUEUED.value).\
+                    values(Status= DrvDbExpStatusE.RUNNING.value, DateBegin= date_begin).\
+                    execution_options(synchronize_session= False)
+                if self.__master_db.session.execute(stmt).rowcount != 1:
+                    log.warning(f"Experiment {exp_result.ExpID} claimed by another instance")
+                    self.__master_db.session.rollback()
+                    exp_result = None
+                else:
+                    exp : CyclerDataExperimentC = CyclerDataExperimentC()
+                    for db_name, att_name in MAPPING_EXPERIMENT.items():
+                        setattr(exp, att_name, getattr(exp_result,db_name))
+                    # Get battery info
+                    battery = self.__get_exp_battery_data(exp_result.BatID)
+                    # Get profile info
+                    profile = self.__get_exp_profile_data(exp_result.ProfID)
+                    exp_db = DrvDbCacheExperimentC()
+                    transform_experiment_db(source= exp_result, target = exp_db)
+                    # Only commit the claim once all the experiment data has been read
+                    self.__master_db.commit_changes(raise_exception= True)
+            except Exception:
+                self.__master_db.session.rollback()
+                raise
+        if exp_result is not None:
+            # Add the running experiment to the cache db, db sync will push its next changes
             exp_db.Status = DrvDbExpStatusE.RUNNING.value
-            exp_db.DateBegin = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            self.__cache_db.session.add(exp_db)
+            exp_db.DateBegin = date_begin
+            try:
+                self.__cache_db.session.add(exp_db)
+                self.__cache_db.commit_changes(raise_exception= True)
+            except Exception as err: #pylint: disable= broad-exception-caught
+                log.error(f"Experiment {queued_exp[0]} could not be added to cache db, "
+                          f"returning it to the queue: {err}")
+                self.__cache_db.session.rollback()
+                self.__unclaim_exp(*queued_exp)
+                exp_result, exp, battery, profile = None, None, None, None
+        if exp_result is not None:
+            self.compile_ext_meas_plan(self.__cs_devices)
             log.debug(f"Experiment fetched: {exp.__dict__}, {battery.__dict__}, {profile.__dict__}")
         else:
             log.debug("No experiment found")
         return exp, battery, profile
 
+    def __unclaim_exp(self, exp_id: int, date_begin: datetime|None) -> None:
+        """Return an experiment claimed by this station to the queue in the master db.
+        Args:
+            exp_id (int): Id of the experiment.
+            date_begin (datetime|None): Begin date of the experiment before the claim.
+        """
+        stmt = update(DrvDbMasterExperimentC).where(
+                DrvDbMasterExperimentC.ExpID == exp_id,
+                DrvDbMasterExperimentC.Status == DrvDbExpStatusE.RUNNING.value).\
+            values(Status= DrvDbExpStatusE.QUEUED.value, DateBegin= date_begin).\
+            execution_options(synchronize_session= False)
+        try:
+            self.__master_db.session.execute(stmt)
+            self.__master_db.commit_changes(raise_exception= True)
+        except Exception:
+            self.__master_db.session.rollback()
+            log.critical(f"Experiment {exp_id} left RUNNING in master db")
+            raise
+
     ## All methods that get information will gather the info from the master db
     def get_exp_status(self, exp_id: int) -> CyclerDataExpStatusE|None:
         """Returns the experiment status .
@@ -123,9 +220,39 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
         return CyclerDataExpStatusE(result[0][0])
 
     def __get_exp_profile_data(self,prof_id: int) -> CyclerDataProfileC|None:
-        """AI is creating summary for get_exp_profile_data
+        """Get the profile of an experiment, from the cache if it has not changed in the db.
+        The signature checked is the profile row and the number, last id and checksum of the
+        instructions, computed by the db so a single row is read. The instructions are only
+        read when the signature has changed.
         Args:
-            exp_id (int): [description]
+            prof_id (int): [description]
+        Returns:
+            CyclerDataProfileC: [description]
+        """
+        instr = DrvDbInstructionC
+        # Checksum of every column that defines each instruction, including its id so swapping
+        # the values of two instructions changes it too
+        checksum = func.sum(func.crc32(func.concat_ws(',', instr.InstrID, instr.Mode,
+                                                      instr.SetPoint, instr.LimitType,
+                                                      instr.LimitPoint)))
+        profile_cols = (DrvDbProfileC.Name, DrvDbProfileC.VoltMax, DrvDbProfileC.VoltMin,
+                        DrvDbProfileC.CurrMax, DrvDbProfileC.CurrMin)
+        stmt = select(*profile_cols, func.count(instr.InstrID), func.max(instr.InstrID),
+                      checksum).outerjoin(instr, instr.ProfID == DrvDbProfileC.ProfID).\
+            where(DrvDbProfileC.ProfID == prof_id).group_by(DrvDbProfileC.ProfID, *profile_cols)
+        signature = tuple(self.__master_db.session.execute(stmt).one())
+        profile = self.__profile_cache.get(prof_id, signature)
+        if profile is None:
+            profile = self.__read_exp_profile_data(prof_id)
+            self.__profile_cache.put(prof_id, signature, profile)
+        else:
+            log.debug(f"Profile {prof_id} read from cache")
+        return profile
+
+    def __read_exp_profile_data(self,prof_id: int) -> CyclerDataProfileC:
+        """Read the profile and all its instructions from the master db.
+        Args:
+            prof_id (int): [description]
         Returns:
             CyclerDataProfileC: [description]
         """
@@ -168,19 +295,25 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
             CyclerDataBatteryC: [description]
         """
         battery = None
-        stmt = select(DrvDbBatteryC).where(DrvDbBatteryC.BatID == bat_id)
+        # The battery row is small, so it is read entirely and used as signature
+        stmt = select(*DrvDbBatteryC.__table__.columns).where(DrvDbBatteryC.BatID == bat_id)
         try:
-            result = self.__master_db.session.execute(stmt).one()[0]
+            result = self.__master_db.session.execute(stmt).one()
         except Exception as err:
             log.exception(err)
             raise Exception(err) from err #pylint: disable= broad-exception-raised
-        battery = CyclerDataBatteryC()
-        for db_name, att_name in MAPPING_BATT_DB.items():
-            setattr(battery, att_name, getattr(result,db_name))
-        bat_range = CyclerDataPwrRangeC()
-        bat_range.fill_current(result.CurrMax, result.CurrMin)
-        bat_range.fill_voltage(result.VoltMax, result.VoltMin)
-        battery.elec_ranges = bat_range
+        battery = self.__battery_cache.get(bat_id, tuple(result))
+        if battery is None:
+            battery = CyclerDataBatteryC()
+            for db_name, att_name in MAPPING_BATT_DB.items():
+                setattr(battery, att_name, getattr(result,db_name))
+            bat_range = CyclerDataPwrRangeC()
+            bat_range.fill_current(result.CurrMax, result.CurrMin)
+            bat_range.fill_voltage(result.VoltMax, result.VoltMin)
+            battery.elec_ranges = bat_range
+            self.__battery_cache.put(bat_id, tuple(result), battery)
+        else:
+            log.debug(f"Battery {bat_id} read from cache")
         return battery
 
     def get_cycler_station_status(self) -> bool:
@@ -195,29 +328,31 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
 
     def get_cycler_station_info(self) -> CyclerDataCyclerStationC|None: #pylint: disable= too-many-locals
         """Returns the name and name of the cycle station for the experiment .
+        The whole station is read with three queries, the station with its devices, the
+        measures used by all devices and the link configuration of all devices, and then
+        assembled in memory.
         Returns:
             [CyclerDataCyclerStationC]: [description]
         """
-        ## Get cycler station info
-        stmt = select(DrvDbCyclerStationC).where(DrvDbCyclerStationC.CSID == self.cs_id)
-        result = self.__master_db.session.execute(stmt).one()[0]
+        ## Get cycler station info and the devices used in it
+        stmt = select(DrvDbCyclerStationC, DrvDbDetectedDeviceC, DrvDbCompatibleDeviceC).\
+            outerjoin(DrvDbUsedDeviceC, DrvDbUsedDeviceC.CSID == DrvDbCyclerStationC.CSID).\
+            outerjoin(DrvDbDetectedDeviceC, DrvDbDetectedDeviceC.DevID == DrvDbUsedDeviceC.DevID).\
+            outerjoin(DrvDbCompatibleDeviceC,
+                      DrvDbCompatibleDeviceC.CompDevID == DrvDbDetectedDeviceC.CompDevID).\
+            where(DrvDbCyclerStationC.CSID == self.cs_id).order_by(DrvDbUsedDeviceC.DevID)
+        result = self.__master_db.session.execute(stmt).all()
+        if len(result) == 0:
+            raise MidStrDbElementNotFoundErrorC(f'Cycler station with id {self.cs_id} not found')
         cycler_station = CyclerDataCyclerStationC()
         for key,value in MAPPING_CS_DB.items():
-            setattr(cycler_station, value, getattr(result,key))
-        ## Get devices used in the cycler station
-        stmt = select(DrvDbUsedDeviceC).where(DrvDbUsedDeviceC.CSID == self.cs_id)
-        result = self.__master_db.session.execute(stmt).all()
-        log.debug(result)
-        devices= []
-        for res_dev in result:
-            res_dev: DrvDbUsedDeviceC = res_dev[0]
-            log.debug(f"Device found, {res_dev.__dict__}")
-            stmt = select(DrvDbDetectedDeviceC, DrvDbCompatibleDeviceC).join(DrvDbCompatibleDeviceC,
-                DrvDbDetectedDeviceC.CompDevID == DrvDbCompatibleDeviceC.CompDevID).where(
-                    DrvDbDetectedDeviceC.DevID == res_dev.DevID)
-            result = self.__master_db.session.execute(stmt).one()
-            detected_dev_res = result[0]
-            comp_dev_res = result[1]
+            setattr(cycler_station, value, getattr(result[0][0],key))
+        devices: Dict[int, CyclerDataDeviceC] = {}
+        link_comp_dev: Dict[int, List[CyclerDataDeviceC]] = {}
+        for _, detected_dev_res, comp_dev_res in result:
+            if detected_dev_res is None:
+                continue
+            log.debug(f"Device found, {detected_dev_res.__dict__}")
             device = CyclerDataDeviceC(mapping_names={})
             for db_name, att_name in MAPPING_DEV_DB.items():
                 if att_name == "device_type":
@@ -227,103 +362,160 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
                     setattr(device, att_name, getattr(detected_dev_res,db_name))
                 else:
                     setattr(device, att_name, getattr(comp_dev_res,db_name))
-            stmt = select(DrvDbUsedMeasuresC).where(DrvDbUsedMeasuresC.DevID == res_dev.DevID).\
-                where(DrvDbUsedMeasuresC.CSID == self.cs_id)
-            ext_meas_res = self.__master_db.session.execute(stmt).all()
-            for ext_meas in ext_meas_res:
-                ext_meas: DrvDbUsedMeasuresC = ext_meas[0]
-                stmt = select(DrvDbAvailableMeasuresC).where(
-                    DrvDbAvailableMeasuresC.MeasType == ext_meas.MeasType and
-                    DrvDbAvailableMeasuresC.CompDevID == comp_dev_res.CompDevID)
-                available_meas = self.__master_db.session.execute(stmt).one()
-                available_meas: DrvDbAvailableMeasuresC = available_meas[0]
-                device.mapping_names[available_meas.MeasName] = int(ext_meas.UsedMeasID)
-            if comp_dev_res.DeviceType is not DrvDbDeviceTypeE.EPC.value:
-                ## Get link configuration if needed
-                stmt = select(DrvDbLinkConfigurationC).where(
-                    DrvDbLinkConfigurationC.CompDevID == detected_dev_res.CompDevID)
-                result = self.__master_db.session.execute(stmt).all()
-                if len(result) != 0:
-                    link_conf = {}
-                    for res in result:
-                        res: DrvDbLinkConfigurationC = res[0]
-                        link_conf[res.Property.lower()] = str(res.Value)
+            devices[detected_dev_res.DevID] = device
+            if comp_dev_res.DeviceType != DrvDbDeviceTypeE.EPC.value:
+                link_comp_dev.setdefault(detected_dev_res.CompDevID, []).append(device)
+        ## Get the measures used by all the devices of the cycler station
+        stmt = select(DrvDbUsedMeasuresC.DevID, DrvDbUsedMeasuresC.UsedMeasID,
+                      DrvDbAvailableMeasuresC.MeasName).\
+            join(DrvDbDetectedDeviceC, DrvDbDetectedDeviceC.DevID == DrvDbUsedMeasuresC.DevID).\
+            join(DrvDbAvailableMeasuresC,
+                 and_(DrvDbAvailableMeasuresC.MeasType == DrvDbUsedMeasuresC.MeasType,
+                      DrvDbAvailableMeasuresC.CompDevID == DrvDbDetectedDeviceC.CompDevID)).\
+            where(DrvDbUsedMeasuresC.CSID == self.cs_id).order_by(DrvDbUsedMeasuresC.UsedMeasID)
+        for dev_id, used_meas_id, meas_name in self.__master_db.session.execute(stmt).all():
+            if dev_id in devices:
+                devices[dev_id].mapping_names[meas_name] = int(used_meas_id)
+        ## Get link configuration of the devices that need it
+        if len(link_comp_dev) != 0:
+            stmt = select(DrvDbLinkConfigurationC).where(
+                DrvDbLinkConfigurationC.CompDevID.in_(link_comp_dev.keys()))
+            link_confs: Dict[int, Dict[str, str]] = {}
+            for res in self.__master_db.session.execute(stmt).all():
+                res: DrvDbLinkConfigurationC = res[0]
+                link_confs.setdefault(res.CompDevID, {})[res.Property.lower()] = str(res.Value)
+            for comp_dev_id, link_conf in link_confs.items():
+                for device in link_comp_dev[comp_dev_id]:
                     device.link_conf = CyclerDataLinkConfC(**link_conf)
-            devices.append(device)
-        cycler_station.devices= devices
+        cycler_station.devices= list(devices.values())
+        # The station sent to the other nodes may have its list of devices modified, so the
+        # plan of the next experiments is compiled from a copy
+        self.__cs_devices = list(cycler_station.devices)
+        self.compile_ext_meas_plan(self.__cs_devices)
         log.debug(f"Cycler station object, {cycler_station.__dict__}")
         return cycler_station
 
+    def compile_ext_meas_plan(self, devices: List[CyclerDataDeviceC]) -> None:
+        """Build the plan used to write the extended measures, a getter of the attribute of
+        the extended measures object, its UsedMeasID and the flag set while the measures of the
+        device are stale, None for the power device, for each measure mapped in the devices.
+        The attribute names follow the ones set by the devices, measure name + '_' + UsedMeasID.
+        Args:
+            devices (List[CyclerDataDeviceC]): Devices of the cycler station.
+        """
+        plan = []
+        for device in devices:
+            if device.mapping_names is not None:
+                stale_attr = None if device.is_control else \
+                             CyclerDataExtMeasC.stale_attr(device.dev_db_id)
+                for meas_name, used_meas_id in device.mapping_names.items():
+                    plan.append((attrgetter(f"{meas_name}_{used_meas_id}"), int(used_meas_id),
+                                 stale_attr))
+        self.__ext_meas_plan = tuple(plan)
+        log.debug(f"Extended measures plan compiled with {len(plan)} measures")
+
     ## All methods that write information will write the info into the cache db
     def modify_current_exp(self, exp_status: CyclerDataExpStatusE, exp_id: int) -> None:
         """Modify the current experiment status .
         Args:
             exp_status (CyclerDataExpStatusE): [description]
         """
-        if exp_status in (CyclerDataExpStatusE.ERROR,CyclerDataExpStatusE.FINISHED):
-            stmt = update(DrvDbCacheExperimentC).where(DrvDbCacheExperimentC.ExpID == exp_id).\
-                values(DateFinish= datetime.now(), Status = exp_status.value)
-        else:
-            stmt = update(DrvDbCacheExperimentC).where(DrvDbCacheExperimentC.ExpID == exp_id).\
-                values(Status = exp_status.value)
+        stmt = update(DrvDbCacheExperimentC).where(DrvDbCacheExperimentC.ExpID == exp_id).\
+            values(**_exp_status_values(exp_status))
         self.__cache_db.session.execute(stmt)
 
-    def write_status_changes(self, exp_id: int) -> None:
-        """Write the status changes into the cache db .
+    def write_status_changes(self, exp_id: int) -> bool:
+        """Write the status of the power device into the cache db, only when it changes or
+        the keep alive time has elapsed since the last row written.
         Args:
-            new_status (CyclerDataAllStatusC): [description]
+            exp_id (int): Id of the running experiment.
+        Returns:
+            bool: True if a status row has been written.
         """
-        status = DrvDbCacheStatusC()
-        status.StatusID = self.status_id
-        status.Timestamp = datetime.now()
-        status.ExpID = exp_id
+        status = {'StatusID': self.status_id, 'Timestamp': datetime.now(), 'ExpID': exp_id}
         for db_name, att_name in MAPPING_STATUS.items():
-            setattr(status, db_name, getattr(self.all_status.pwr_dev, att_name))
-        self.__cache_db.session.add(status)
-        self.status_id += 1
+            status[db_name] = getattr(self.all_status.pwr_dev, att_name)
+        key = (status['Status'], status['ErrorCode'], status['DevID'])
+        now = time()
+        written = (key != self.__last_status or
+                   (now - self.__last_status_time)*1000 >= self.status_keep_alive)
+        if written:
+            self.__writer.add_status(status)
+            self.__last_status = key
+            self.__last_status_time = now
+            self.status_id += 1
+        return written
 
     def write_new_alarm(self, alarms: List[CyclerDataAlarmC], exp_id: int) -> None:
         """Write an alarm into the cache db .
         Args:
             alarm (List[CyclerDataAlarmC]): [description]
         """
+        alarm_rows = []
         for alarm in alarms:
-            alarm_db = DrvDbAlarmC()
-            alarm_db.AlarmID = self.alarm_id
-            alarm_db.Timestamp = datetime.now()
-            alarm_db.ExpID = exp_id
+            alarm_row = {'AlarmID': self.alarm_id, 'Timestamp': datetime.now(), 'ExpID': exp_id}
             for db_name, att_name in MAPPING_ALARM.items():
-                setattr(alarm_db, db_name, getattr(alarm, att_name))
-            self.__cache_db.session.add(alarm_db)
+                alarm_row[db_name] = getattr(alarm, att_name)
+            alarm_rows.append(alarm_row)
             self.alarm_id += 1
+        self.__writer.add_alarms(alarm_rows)
+
+    def write_measures(self, exp_id: int) -> int:
+        """Write the generic and extended measures of the sample into the cache db, through
+        the compression stage. Extended measures are only stored with the generic measures
+        they belong to, and the MeasID of the samples discarded is not used.
+        Args:
+            exp_id (int): Id of the running experiment.
+        Returns:
+            int: Number of samples written, the ones held by the compression stage are
+            written with the next samples.
+        """
+        samples = self.__compressor.add(self.__build_generic_measures(exp_id),
+                                        self.__build_extended_measures(exp_id))
+        for gen_meas, ext_rows in samples:
+            self.__writer.add_gen_meas(gen_meas)
+            self.__writer.add_ext_meas(ext_rows)
+        return len(samples)
 
     def write_generic_measures(self, exp_id: int) -> None:
         """Write the generic measures into the cache db .
         Args:
             gen_meas (CyclerDataGenMeasC): [description]
         """
-        gen_meas = DrvDbCacheGenericMeasureC()
-        gen_meas.Timestamp = datetime.now()
-        gen_meas.ExpID = exp_id
-        gen_meas.MeasID = self.meas_id
-        gen_meas.PowerMode = self.all_status.pwr_mode.name
+        self.__writer.add_gen_meas(self.__build_generic_measures(exp_id))
+
+    def __build_generic_measures(self, exp_id: int) -> Dict:
+        # Samples are stored with the time they were acquired, not the time they are written
+        timestamp = self.gen_meas.timestamp if self.gen_meas.timestamp is not None else \
+                    datetime.now()
+        gen_meas = {'Timestamp': timestamp, 'ExpID': exp_id, 'MeasID': self.meas_id,
+                    'PowerMode': self.all_status.pwr_mode.name}
         for db_name, att_name in MAPPING_GEN_MEAS.items():
-            setattr(gen_meas, db_name, getattr(self.gen_meas, att_name))
-        self.__cache_db.session.add(gen_meas)
+            gen_meas[db_name] = getattr(self.gen_meas, att_name)
+        return gen_meas
 
     def write_extended_measures(self, exp_id: int) -> None:
         """Write the extended measures into the cache db .
         Args:
             ext_meas (CyclerDataExtMeasC): [description]
         """
-        for key in self.ext_meas.__dict__:
-            ext_meas = DrvDbCacheExtendedMeasureC()
-            ext_meas.ExpID = exp_id
-            ext_meas.UsedMeasID = key.split('_')[-1]
-            ext_meas.MeasID = self.meas_id
-            ext_meas.Value = getattr(self.ext_meas,key)
-            if ext_meas.Value is not None:
-                self.__cache_db.session.add(ext_meas)
+        self.__writer.add_ext_meas(self.__build_extended_measures(exp_id))
+
+    def __build_extended_measures(self, exp_id: int) -> List[Dict]:
+        ext_rows = []
+        for getter, used_meas_id, stale_attr in self.__ext_meas_plan:
+            if stale_attr is not None and getattr(self.ext_meas, stale_attr, False):
+                # The device has not answered in time, the value was already stored
+                continue
+            try:
+                value = getter(self.ext_meas)
+            except AttributeError:
+                # The device has not updated this measure yet
+                continue
+            if value is not None:
+                ext_rows.append({'ExpID': exp_id, 'UsedMeasID': used_meas_id,
+                                 'MeasID': self.meas_id, 'Value': value})
+        return ext_rows
 
     def turn_cycler_station_deprecated(self, exp_id: int|None) -> None:
         """Method to turn a cycler station to deprecated.
@@ -350,21 +542,89 @@ class MidStrFacadeC: #pylint: disable= too-many-instance-attributes
             exp_db.DateFinish = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
             self.__cache_db.session.add(exp_db)
 
-    def commit_changes(self):
+    def start_exp_spool(self, exp_id: int) -> None:
+        """Store the measures, status and alarms written from now on in the spool of the
+        experiment, until they are committed in the cache db.
+        Args:
+            exp_id (int): Id of the experiment.
+        """
+        self.__writer.start_spool(exp_id)
+        self.__compressor.reset()
+        # The first status of each experiment is always written
+        self.__last_status = None
+
+    def close_exp_spool(self, exp_id: int, exp_status: CyclerDataExpStatusE|None = None) -> None:
+        """Write the last sample held by the compression stage and stop storing rows in the
+        spool of the running experiment.
+        Args:
+            exp_id (int): Id of the running experiment.
+            exp_status (CyclerDataExpStatusE|None): Status to set to the experiment in the cache
+                db once all its rows are stored, None to keep it.
+        """
+        for gen_meas, ext_rows in self.__compressor.flush():
+            self.__writer.add_gen_meas(gen_meas)
+            self.__writer.add_ext_meas(ext_rows)
+        if exp_status is not None:
+            self.__writer.add_exp_status({'ExpID': exp_id, **_exp_status_values(exp_status)})
+        if self.__compressor.n_received > 0:
+            log.info(f"Samples received: {self.__compressor.n_received}, "
+                     f"stored: {self.__compressor.n_stored}")
+        self.__writer.close_spool()
+
+    def recover_spools(self) -> None:
+        """Open the spools left by previous executions, to write their rows in the cache db.
+        """
+        self.__writer.recover()
+
+    @property
+    def has_pending_rows(self) -> bool:
+        '''True if any spool has rows not committed yet into the cache db.
+        '''
+        return self.__writer.has_pending
+
+    def commit_changes(self, force_flush: bool = False) -> int:
         """Commit changes made to the cache database.
+        Buffered measures are only written when the flush size or latency is reached, and
+        removed from the spool once committed.
+        Args:
+            force_flush (bool): If True, write the buffered measures before committing.
+        Returns:
+            int: Number of buffered rows written.
         """
-        self.__cache_db.commit_changes()
+        n_rows = 0
+        flush = force_flush or self.__writer.flush_due()
+        if flush:
+            n_rows = self.__writer.flush(self.__cache_db.session)
+        # Spooled rows are only acknowledged if the commit succeeds
+        self.__cache_db.commit_changes(raise_exception= flush)
+        if flush:
+            self.__writer.ack()
+        return n_rows
 
     def reset_db_connection(self):
         """Reset the connection to the both database.
         """
         # Closing connection to databases
         self.__cache_db.reset()
-        self.__master_db.reset()
+        if self.__master_db is not None:
+            self.__master_db.reset()
 
     def close_db_connection(self):
-        """Close the connection to the both databases.
+        """Close the connection to the both databases and the spool files.
         """
         # Closing connection to databases
         self.__cache_db.close_connection()
-        self.__master_db.close_connection()
+        if self.__master_db is not None:
+            self.__master_db.close_connection()
+        self.__writer.close()
+
+#######################            FUNCTIONS             #######################
+
+def _exp_status_values(exp_status: CyclerDataExpStatusE) -> Dict:
+    """Columns of the experiment to update when its status changes, the finish date is set when
+    it ends.
+    """
+    values = {'Status': exp_status.value}
+    if exp_status in (CyclerDataExpStatusE.ERROR, CyclerDataExpStatusE.FINISHED):
+        values['DateFinish'] = datetime.now()
+    return values
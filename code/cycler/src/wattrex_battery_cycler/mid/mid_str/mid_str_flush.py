@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+'''
+Definition of MID STR Flush Node, the lane of the STR node that writes measures, status
+and alarms into the cache database, and of the drain node that commits them from the spool.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from threading import Event, Lock, current_thread
+from time import time
+from typing import List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+from func_timeout import func_timeout, FunctionTimedOut
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+from system_shared_tool import (SysShdSharedObjC, SysShdNodeC, SysShdNodeParamsC, SysShdChanC,
+                        SysShdNodeStatusE)
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataAlarmC, CyclerDataGenMeasC,
+                                              CyclerDataExtMeasC, CyclerDataAllStatusC,
+                                              CyclerDataDeviceC, CyclerDataExpStatusE)
+
+######################             CONSTANTS              ######################
+from .context import (DEFAULT_TIMEOUT_CONNECTION, DEFAULT_FLUSH_NODE_NAME,
+                      DEFAULT_FLUSH_NODE_PERIOD, DEFAULT_CRED_FILEPATH, DEFAULT_DRAIN_NODE_NAME,
+                      DEFAULT_DRAIN_NODE_PERIOD)
+#######################          MODULE IMPORTS          #######################
+from .mid_str_facade import MidStrFacadeC
+from .mid_str_metrics import MidStrLaneMetricsC
+
+#######################              ENUMS               #######################
+
+#######################             CLASSES              #######################
+### THREAD ###
+class MidStrDrainNodeC(SysShdNodeC):
+    """Node that writes the rows spooled by the flush lane into the cache database.
+    Rows are only removed from the spool once committed, so they are retried after any
+    database error. Spools left by previous executions are written first.
+    """
+    def __init__(self, working_flag : Event, db_iface: MidStrFacadeC,
+                 drain_params: SysShdNodeParamsC= SysShdNodeParamsC()) -> None:
+        '''
+        Initialize the MID_STR drain thread.
+
+        Args:
+            working_flag (threading.Event): Flag used to stop the thread.
+            db_iface (MidStrFacadeC): Facade where the flush lane writes the rows.
+        '''
+        super().__init__(DEFAULT_DRAIN_NODE_NAME, DEFAULT_DRAIN_NODE_PERIOD, working_flag,
+                         drain_params)
+        self.db_iface: MidStrFacadeC = db_iface
+        self.__flush_lock: Lock = Lock()
+        self.__flush_events: List[Event] = []
+        self.db_iface.recover_spools()
+
+    def request_flush(self, done: Event) -> None:
+        '''Write all the spooled rows, without waiting for the flush size or latency.
+
+        Args:
+            done (Event): Event set once all the rows spooled have been committed.
+        '''
+        with self.__flush_lock:
+            self.__flush_events.append(done)
+
+    def stop(self) -> None:
+        """Stop the node, writing the rows still spooled if the database is available.
+        """
+        try:
+            n_rows = 1
+            while self.db_iface.has_pending_rows and n_rows > 0:
+                n_rows = func_timeout(DEFAULT_TIMEOUT_CONNECTION, self.db_iface.commit_changes,
+                                      kwargs= {'force_flush': True})
+        except Exception as exc: #pylint: disable= broad-exception-caught
+            log.warning(f"Rows left in the spool, they will be written on next start. {exc}")
+        self.db_iface.close_db_connection()
+        self.working_flag.clear()
+        self.status = SysShdNodeStatusE.STOP
+        log.critical(f"Stopping {current_thread().name} node")
+
+    def process_iteration(self) -> None:
+        """Commit the spooled rows if the flush size or latency has been reached.
+        """
+        with self.__flush_lock:
+            flush_events = list(self.__flush_events)
+        try:
+            func_timeout(DEFAULT_TIMEOUT_CONNECTION, self.db_iface.commit_changes,
+                         kwargs= {'force_flush': len(flush_events) > 0})
+            if len(flush_events) > 0 and not self.db_iface.has_pending_rows:
+                with self.__flush_lock:
+                    for event in flush_events:
+                        self.__flush_events.remove(event)
+                        event.set()
+            self.status = SysShdNodeStatusE.OK
+        except FunctionTimedOut as exc:
+            log.warning(("Timeout during commit changes to local database."
+                         f"Database connection will be restarted. {exc}"))
+            self.status = SysShdNodeStatusE.COMM_ERROR
+            self.__reset_db_connection()
+        except ConnectionError as exc:
+            self.status = SysShdNodeStatusE.COMM_ERROR
+            log.critical(f"Communication error in str drain node {exc}")
+        except Exception as exc: #pylint: disable= broad-exception-caught
+            # Rows are kept in the spool and retried, the node keeps running
+            self.status = SysShdNodeStatusE.COMM_ERROR
+            log.error(f"Error writing spooled rows into cache db, they will be retried. {exc}")
+            self.__reset_db_connection()
+
+    def __reset_db_connection(self) -> None:
+        try:
+            self.db_iface.reset_db_connection()
+        except ConnectionError as exc:
+            log.critical(f"Unable to reset cache db connection {exc}")
+
+
+class MidStrFlushNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
+    """Lane of the STR node that stores the measures, status and alarms in the cache database.
+    Rows are appended to a spool file of the running experiment, so capturing them never
+    waits for the database. The drain node started with this lane commits them.
+    """
+    def __init__(self, working_flag : Event, shared_gen_meas: SysShdSharedObjC, #pylint: disable= too-many-arguments
+                 shared_ext_meas: SysShdSharedObjC, shared_status: SysShdSharedObjC,
+                 str_alarms: SysShdChanC, cycler_station: int,
+                 flush_params: SysShdNodeParamsC= SysShdNodeParamsC()) -> None:
+        '''
+        Initialize the MID_STR flush thread.
+
+        Args:
+            working_flag (threading.Event): Flag used to stop the thread.
+            shared_gen_meas (SysShdSharedObjC): Shared object for generic measures.
+            shared_ext_meas (SysShdSharedObjC): Shared object for extended measures.
+            shared_status (SysShdSharedObjC): Shared object for devices status.
+            str_alarms (SysShdChanC): Channel where the raised alarms are received.
+            cycler_station (int): Id of the cycler station.
+        '''
+        super().__init__(DEFAULT_FLUSH_NODE_NAME, DEFAULT_FLUSH_NODE_PERIOD, working_flag,
+                         flush_params)
+        log.info(f"Initializing {DEFAULT_FLUSH_NODE_NAME} node...")
+        self.db_iface = MidStrFacadeC(cred_file= DEFAULT_CRED_FILEPATH,
+                                      cycler_station_id= cycler_station, use_master_db= False)
+        self.str_alarms: SysShdChanC = str_alarms
+        self.globlal_gen_meas: SysShdSharedObjC = shared_gen_meas
+        self.globlal_ext_meas: SysShdSharedObjC = shared_ext_meas
+        self.globlal_all_status: SysShdSharedObjC = shared_status
+        self.metrics: MidStrLaneMetricsC = MidStrLaneMetricsC(name= DEFAULT_FLUSH_NODE_NAME,
+                                                              period= DEFAULT_FLUSH_NODE_PERIOD)
+        self.__drain_working_flag: Event = Event()
+        self.__drain_working_flag.set()
+        self.drain: MidStrDrainNodeC = MidStrDrainNodeC(working_flag= self.__drain_working_flag,
+                                                        db_iface= self.db_iface,
+                                                        drain_params= flush_params)
+        self.__actual_exp_id: int = -1
+        self.__last_seq: int = -1
+        self.__new_raised_alarms: List[CyclerDataAlarmC] = []
+        ## Experiment changes requested by the command lane, applied in order
+        self.__exp_lock: Lock = Lock()
+        self.__exp_changes: List[Tuple] = []
+
+    def start_experiment(self, exp_id: int, devices: List[CyclerDataDeviceC]) -> None:
+        '''Request the lane to start storing measures of a new experiment.
+        The experiment must be already committed in the cache database.
+
+        Args:
+            exp_id (int): Id of the experiment.
+            devices (List[CyclerDataDeviceC]): Devices of the cycler station.
+        '''
+        with self.__exp_lock:
+            self.__exp_changes.append((exp_id, devices, None))
+
+    def end_experiment(self, exp_id: int, exp_status: CyclerDataExpStatusE|None = None,
+                       timeout: float = DEFAULT_TIMEOUT_CONNECTION) -> bool:
+        '''Request the lane to stop storing measures of the experiment, and to spool its final
+        status after its last measures. The status is only set in the cache database when the
+        drain commits them, so the experiment is never finished with measures still pending.
+        Blocks until the lane has spooled the request or the timeout expires, the request is
+        applied anyway by the lane, even when it is stopping.
+
+        Args:
+            exp_id (int): Id of the experiment.
+            exp_status (CyclerDataExpStatusE|None): Final status of the experiment, None to keep
+                the one in the cache database.
+            timeout (float): Max time to wait, express in seconds.
+        Returns:
+            bool: True if the request was spooled before the timeout.
+        '''
+        spooled = Event()
+        with self.__exp_lock:
+            self.__exp_changes.append((exp_id, exp_status, spooled))
+        if not self.is_alive():
+            self.__apply_exp_changes()
+        res = spooled.wait(timeout)
+        if not res and not self.is_alive():
+            # The lane stopped before applying it
+            self.__apply_exp_changes()
+            res = spooled.is_set()
+        if not res:
+            log.warning(f"End of experiment {exp_id} not spooled yet, it will be applied later")
+        return res
+
+    def __apply_exp_changes(self) -> None:
+        with self.__exp_lock:
+            exp_changes = self.__exp_changes
+            self.__exp_changes = []
+        for exp_id, arg, spooled in exp_changes:
+            if spooled is None:
+                self.__actual_exp_id = exp_id
+                self.db_iface.start_exp_spool(exp_id)
+                self.db_iface.compile_ext_meas_plan(arg)
+                self.db_iface.meas_id = 0
+                self.__last_seq = -1
+                self.db_iface.status_id = 0
+                self.db_iface.alarm_id = 0
+                log.info(f"Storing measures of experiment {exp_id}")
+            else:
+                if exp_id != self.__actual_exp_id:
+                    # Started and ended before the lane applied it, only the status is spooled
+                    self.db_iface.start_exp_spool(exp_id)
+                self.db_iface.close_exp_spool(exp_id, arg)
+                self.__actual_exp_id = -1
+                spooled.set()
+                self.drain.request_flush(Event())
+
+    def __receive_alarms(self) -> None:
+        alarm = self.str_alarms.receive_data_unblocking()
+        while alarm is not None:
+            self.__new_raised_alarms.append(alarm)
+            alarm = self.str_alarms.receive_data_unblocking()
+
+    def __check_new_sample(self) -> bool:
+        '''Check if the sample read has not been stored yet, counting the samples lost
+        since the last one stored.
+        '''
+        seq = self.db_iface.gen_meas.seq
+        res = True
+        if seq == self.__last_seq:
+            self.metrics.samples_repeated += 1
+            res = False
+        else:
+            if 0 <= self.__last_seq < seq - 1:
+                self.metrics.samples_missed += seq - self.__last_seq - 1
+                log.debug(f"Samples {self.__last_seq + 1} to {seq - 1} not stored")
+            self.__last_seq = seq
+            self.metrics.samples_stored += 1
+        return res
+
+    def sync_shd_data(self) -> None:
+        '''Update local data
+        '''
+        self.db_iface.all_status: CyclerDataAllStatusC = self.globlal_all_status.read()
+        self.db_iface.gen_meas: CyclerDataGenMeasC     = self.globlal_gen_meas.read()
+        self.db_iface.ext_meas: CyclerDataExtMeasC     = self.globlal_ext_meas.read()
+
+    def start(self) -> None:
+        """Start the drain node and the flush lane.
+        """
+        self.drain.start()
+        super().start()
+
+    def stop(self) -> None:
+        """Stop the node if it is not already closed .
+        """
+        # The end of the experiment is spooled before the drain writes the last rows
+        try:
+            self.__apply_exp_changes()
+        except Exception as exc: #pylint: disable= broad-except
+            log.error(f"Error applying the last experiment changes: {exc}")
+        # The drain writes the spooled rows before closing the connection
+        self.__drain_working_flag.clear()
+        if self.drain.is_alive():
+            self.drain.join(DEFAULT_TIMEOUT_CONNECTION*2)
+        self.working_flag.clear()
+        self.status = SysShdNodeStatusE.STOP
+        log.info(str(self.metrics))
+        log.critical(f"Stopping {current_thread().name} node")
+
+    def process_iteration(self) -> None:
+        """Spool the measures, status and alarms of the last iteration.
+        """
+        iter_start = time()
+        try:
+            self.__apply_exp_changes()
+            # Syncronising shared data
+            self.sync_shd_data()
+            # Receive and write alarms
+            self.__receive_alarms()
+            if len(self.__new_raised_alarms)>0:
+                self.db_iface.write_new_alarm(alarms= self.__new_raised_alarms,
+                                              exp_id= self.__actual_exp_id)
+                self.__new_raised_alarms.clear()
+            ### Write measures and status changes
+            if (self.db_iface.gen_meas.instr_id is not None and self.__actual_exp_id != -1
+                and self.__check_new_sample()):
+                self.db_iface.write_measures(exp_id= self.__actual_exp_id)
+                self.db_iface.write_status_changes(exp_id= self.__actual_exp_id)
+                self.db_iface.meas_id += 1
+        except Exception as exc:
+            self.status = SysShdNodeStatusE.INTERNAL_ERROR
+            log.critical(f"Unexpected error in MID_STR flush thread.\n{exc}")
+            self.working_flag.clear()
+        self.metrics.update(queue_depth= self.db_iface.pending_rows, iter_start= iter_start)
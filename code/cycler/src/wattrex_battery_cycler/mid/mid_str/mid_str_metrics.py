@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+'''
+Definition of the metrics kept by each lane of the MID STR node.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from time import time
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+from .context import DEFAULT_METRICS_LOG_PERIOD
+
+#######################              ENUMS               #######################
+
+#######################             CLASSES              #######################
+
+class MidStrLaneMetricsC: #pylint: disable= too-many-instance-attributes
+    '''
+    Metrics of a STR lane, updated once per iteration.
+    '''
+    def __init__(self, name: str, period: int) -> None:
+        '''
+        Initialize the metrics of the lane.
+
+        Args:
+            name (str): Name of the lane.
+            period (int): Period of the lane, express in milliseconds.
+        '''
+        self.name: str = name
+        self.period: int = period
+        self.iterations: int = 0
+        self.queue_depth: int = 0
+        self.max_queue_depth: int = 0
+        self.iter_time: float = 0.0
+        self.max_iter_time: float = 0.0
+        ## Samples received from the MEAS node
+        self.samples_stored: int = 0
+        self.samples_repeated: int = 0
+        self.samples_missed: int = 0
+        self.__last_log: float = time()
+
+    def __str__(self) -> str:
+        res = (f"{self.name} lane: period {self.period} ms, iterations {self.iterations}, "
+               f"queue depth {self.queue_depth} (max {self.max_queue_depth}), "
+               f"iteration time {self.iter_time:.1f} ms (max {self.max_iter_time:.1f} ms)")
+        if self.samples_stored > 0:
+            res += (f", samples stored {self.samples_stored}, repeated {self.samples_repeated}"
+                    f", missed {self.samples_missed}")
+        return res
+
+    def update(self, queue_depth: int, iter_start: float) -> None:
+        '''Update the metrics at the end of an iteration and log them periodically.
+
+        Args:
+            queue_depth (int): Number of elements waiting to be processed by the lane.
+            iter_start (float): Time when the iteration started, express in seconds.
+        '''
+        now = time()
+        self.iterations += 1
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        self.iter_time = (now - iter_start)*1000
+        self.max_iter_time = max(self.max_iter_time, self.iter_time)
+        if (now - self.__last_log)*1000 >= DEFAULT_METRICS_LOG_PERIOD:
+            log.info(str(self))
+            self.__last_log = now
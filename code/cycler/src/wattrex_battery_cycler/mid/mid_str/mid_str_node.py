@@ -7,7 +7,7 @@ from __future__ import annotations
 
 #######################         GENERIC IMPORTS          #######################
 from threading import Event, current_thread
-from typing import List
+from time import time
 
 #######################       THIRD PARTY IMPORTS        #######################
 from func_timeout import func_timeout, FunctionTimedOut
@@ -19,9 +19,7 @@ log = sys_log_logger_get_module_logger(__name__)
 #######################          PROJECT IMPORTS         #######################
 from system_shared_tool import (SysShdSharedObjC, SysShdNodeC, SysShdNodeParamsC, SysShdChanC,
                         SysShdNodeStatusE)
-from wattrex_cycler_datatypes.cycler_data import (CyclerDataAlarmC, CyclerDataGenMeasC,
-                                              CyclerDataExtMeasC, CyclerDataAllStatusC,
-                                              CyclerDataCyclerStationC, CyclerDataExpStatusE)
+from wattrex_cycler_datatypes.cycler_data import CyclerDataCyclerStationC, CyclerDataExpStatusE
 
 ######################             CONSTANTS              ######################
 from .context import (DEFAULT_TIMEOUT_CONNECTION, DEFAULT_NODE_NAME, DEFAULT_NODE_PERIOD,
@@ -29,6 +27,8 @@ from .context import (DEFAULT_TIMEOUT_CONNECTION, DEFAULT_NODE_NAME, DEFAULT_NOD
 #######################          MODULE IMPORTS          #######################
 from .mid_str_facade import MidStrFacadeC
 from .mid_str_cmd import MidStrCmdDataC, MidStrDataCmdE, MidStrReqCmdE
+from .mid_str_flush import MidStrFlushNodeC
+from .mid_str_metrics import MidStrLaneMetricsC
 
 #######################              ENUMS               #######################
 
@@ -36,6 +36,8 @@ from .mid_str_cmd import MidStrCmdDataC, MidStrDataCmdE, MidStrReqCmdE
 ### THREAD ###
 class MidStrNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
     """This class will create a node that communicates with the databases reading and writing data.
+    The node is the command lane, it answers the requests of the manager. Measures, status and
+    alarms are written by a flush lane (MidStrFlushNodeC) started and stopped with this node.
     """
     def __init__(self, working_flag : Event, shared_gen_meas: SysShdSharedObjC, #pylint: disable= too-many-arguments
                  shared_ext_meas: SysShdSharedObjC, shared_status: SysShdSharedObjC,
@@ -55,22 +57,19 @@ class MidStrNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
                                       cycler_station_id= cycler_station)
         self.str_reqs: SysShdChanC = str_reqs
         self.str_data: SysShdChanC = str_data
-        self.str_alarms: SysShdChanC = str_alarms
-        self.globlal_gen_meas: SysShdSharedObjC = shared_gen_meas
-        self.globlal_ext_meas: SysShdSharedObjC = shared_ext_meas
-        self.globlal_all_status: SysShdSharedObjC = shared_status
+        self.metrics: MidStrLaneMetricsC = MidStrLaneMetricsC(name= DEFAULT_NODE_NAME,
+                                                              period= DEFAULT_NODE_PERIOD)
         self.__actual_exp_id: int = -1
-        self.__new_raised_alarms: List[CyclerDataAlarmC] = []
+        self.__flush_working_flag: Event = Event()
+        self.__flush_working_flag.set()
+        self.flush_lane: MidStrFlushNodeC = MidStrFlushNodeC(
+            working_flag= self.__flush_working_flag, shared_gen_meas= shared_gen_meas,
+            shared_ext_meas= shared_ext_meas, shared_status= shared_status,
+            str_alarms= str_alarms, cycler_station= cycler_station, flush_params= str_params)
         ## Once it has been initilizated all atributes ask for the cycler station info
-        cycler_info: CyclerDataCyclerStationC = self.db_iface.get_cycler_station_info()
+        self.__cycler_info: CyclerDataCyclerStationC = self.db_iface.get_cycler_station_info()
         self.str_data.send_data(MidStrCmdDataC(cmd_type= MidStrDataCmdE.CS_DATA,
-                                               station= cycler_info))
-
-    def __receive_alarms(self) -> None:
-        alarm = self.str_alarms.receive_data_unblocking()
-        while alarm is not None:
-            self.__new_raised_alarms.append(alarm)
-            alarm = self.str_alarms.receive_data_unblocking()
+                                               station= self.__cycler_info))
 
     def __apply_command(self, command : MidStrCmdDataC) -> None: #pylint: disable= too-many-branches
         '''
@@ -89,6 +88,10 @@ class MidStrNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
             exp_info, battery_info, profile_info = self.db_iface.get_start_queued_exp()
             if exp_info is not None:
                 self.__actual_exp_id = exp_info.exp_id
+                # The experiment is already in the cache db, so its measures can be written
+                # The devices of the station sent to the manager may have been modified
+                self.flush_lane.start_experiment(exp_id= self.__actual_exp_id,
+                                                 devices= self.db_iface.cs_devices)
             ## If there is an error gathering experiment info, manager will manage it
             log.debug("Sending new experiment to APP_MANAGER")
             self.str_data.send_data(MidStrCmdDataC(cmd_type= MidStrDataCmdE.EXP_DATA,
@@ -102,9 +105,9 @@ class MidStrNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
             self.str_data.send_data(MidStrCmdDataC(cmd_type= MidStrDataCmdE.EXP_STATUS,
                                                    exp_status= exp_status))
         elif command.cmd_type == MidStrReqCmdE.GET_CS:
-            cycler_info = self.db_iface.get_cycler_station_info()
+            self.__cycler_info = self.db_iface.get_cycler_station_info()
             self.str_data.send_data(MidStrCmdDataC(cmd_type= MidStrDataCmdE.CS_DATA,
-                                                   station= cycler_info))
+                                                   station= self.__cycler_info))
         elif command.cmd_type == MidStrReqCmdE.GET_CS_STATUS:
             cycler_status = self.db_iface.get_cycler_station_status()
             self.str_data.send_data(data= MidStrCmdDataC(cmd_type= MidStrDataCmdE.CS_STATUS,
@@ -113,67 +116,73 @@ class MidStrNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
             if self.__actual_exp_id == -1:
                 log.warning("No experiment is running")
             else:
-                self.db_iface.modify_current_exp(exp_status= command.exp_status,
-                                             exp_id= self.__actual_exp_id)
                 if command.exp_status in (CyclerDataExpStatusE.ERROR,
                                           CyclerDataExpStatusE.FINISHED):
+                    # The status is set once the last measures of the experiment are stored
+                    self.flush_lane.end_experiment(exp_id= self.__actual_exp_id,
+                                                   exp_status= command.exp_status)
                     self.__actual_exp_id = -1
+                else:
+                    self.db_iface.modify_current_exp(exp_status= command.exp_status,
+                                                     exp_id= self.__actual_exp_id)
         elif command.cmd_type == MidStrReqCmdE.TURN_DEPRECATED:
             log.info("Turning cycler station to deprecated")
-            self.db_iface.turn_cycler_station_deprecated(
-                exp_id= self.__actual_exp_id if self.__actual_exp_id != -1 else None)
+            if self.__actual_exp_id != -1:
+                self.flush_lane.end_experiment(exp_id= self.__actual_exp_id,
+                                               exp_status= CyclerDataExpStatusE.ERROR)
+                self.__actual_exp_id = -1
+            self.db_iface.turn_cycler_station_deprecated(exp_id= None)
             self.working_flag.clear()
         else:
             log.error(("Can`t apply command. Error in command format, "
                        "check command type and payload type"))
 
-    def sync_shd_data(self) -> None:
-        '''Update local data
-        '''
-        self.db_iface.all_status: CyclerDataAllStatusC = self.globlal_all_status.read()
-        self.db_iface.gen_meas: CyclerDataGenMeasC     = self.globlal_gen_meas.read()
-        self.db_iface.ext_meas: CyclerDataExtMeasC     = self.globlal_ext_meas.read()
+    def share_ext_meas(self, shared_ext_meas: SysShdSharedObjC) -> None:
+        """Replace the shared object of the extended measures read by the flush lane, once the
+        manager has built the fixed type of the measures of the cycler station.
+
+        Args:
+            shared_ext_meas (SysShdSharedObjC): Shared object for extended measures.
+        """
+        self.flush_lane.globlal_ext_meas = shared_ext_meas
 
+    def start(self) -> None:
+        """Start the flush lane and the command lane.
+        """
+        self.flush_lane.start()
+        super().start()
 
     def stop(self) -> None:
         """Stop the node if it is not already closed .
         """
+        # The flush lane writes its pending measures before closing its connection
+        self.__flush_working_flag.clear()
+        if self.flush_lane.is_alive() and self.flush_lane is not current_thread():
+            self.flush_lane.join(DEFAULT_TIMEOUT_CONNECTION*3)
         #Before closing connection commit all changes
-        self.db_iface.commit_changes()
+        self.db_iface.commit_changes(force_flush= True)
         self.db_iface.close_db_connection()
         self.working_flag.clear()
         self.status = SysShdNodeStatusE.STOP
+        log.info(str(self.metrics))
         log.critical(f"Stopping {current_thread().name} node")
 
     def process_iteration(self) -> None:
-        """AI is creating summary for process_iteration
+        """Apply all the commands received from the manager since the last iteration.
         """
+        iter_start = time()
         try:
-            # Syncronising shared data
-            self.sync_shd_data()
-            # Receive and write alarms
-            self.__receive_alarms()
-
-            if len(self.__new_raised_alarms)>0:
-                self.db_iface.write_new_alarm(alarms= self.__new_raised_alarms,
-                                              exp_id= self.__actual_exp_id)
-                self.__new_raised_alarms.clear()
-            ### Write measures and status changes
-            if self.db_iface.gen_meas.instr_id is not None and self.__actual_exp_id != -1:
-                self.db_iface.write_generic_measures(exp_id= self.__actual_exp_id)
-                ## TODO: remove commit, should work without this commit # pylint: disable=fixme
-                self.db_iface.commit_changes()
-                self.db_iface.write_status_changes(exp_id= self.__actual_exp_id)
-                self.db_iface.write_extended_measures(exp_id= self.__actual_exp_id)
-                self.db_iface.meas_id += 1
-            if not self.str_reqs.is_empty():
+            applied = False
+            while not self.str_reqs.is_empty() and self.working_flag.is_set():
                 # Ignore warning as receive_data return an object,
                 # which in this case must be of type DrvCanCmdDataC
                 command : MidStrCmdDataC = self.str_reqs.receive_data() # type: ignore
                 log.debug(f"Command to apply: {command.cmd_type.name}")
                 self.__apply_command(command)
-            # TIMEOUT added to detect if database connection was ended
-            func_timeout(DEFAULT_TIMEOUT_CONNECTION, self.db_iface.commit_changes)
+                applied = True
+            if applied:
+                # TIMEOUT added to detect if database connection was ended
+                func_timeout(DEFAULT_TIMEOUT_CONNECTION, self.db_iface.commit_changes)
         except FunctionTimedOut as exc:
             log.warning(("Timeout during commit changes to local database."
                          f"Database connection will be restarted. {exc}"))
@@ -186,5 +195,6 @@ class MidStrNodeC(SysShdNodeC): #pylint: disable= too-many-instance-attributes
             self.status = SysShdNodeStatusE.INTERNAL_ERROR
             log.critical(f"Unexpected error in MID_STR_Node_c thread.\n{exc}")
             self.working_flag.clear()
+        self.metrics.update(queue_depth= self.str_reqs.qsize(), iter_start= iter_start)
 
 #######################            FUNCTIONS             #######################
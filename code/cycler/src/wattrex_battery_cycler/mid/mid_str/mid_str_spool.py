@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+'''
+Definition of MID STR spool, an append-only memory-mapped file where the rows of an experiment
+are stored before being written into the cache database.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Any, List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+from .context import DEFAULT_SPOOL_SIZE
+
+_MAGIC = b'WSPL'
+_VERSION = 1
+# Magic, version, epoch and offset of the first record not acknowledged
+_HEADER = struct.Struct('<4sHIQ')
+# Payload length, epoch and table of the record
+_RECORD = struct.Struct('<IIB')
+
+#######################              ENUMS               #######################
+
+#######################             CLASSES              #######################
+
+class MidStrSpoolErrorC(Exception):
+    """Exception raised when a spool file can not be used.
+
+    Attributes:
+        message -- explanation of the error
+    """
+    def __init__(self, message):
+        super().__init__(message)
+
+class MidStrSpoolC:
+    '''
+    Append-only spool file, mapped in memory. Each record stores the rows added to a table in
+    a single call. Records are acknowledged once they are committed in the database, and the
+    file is rewound when all of them have been acknowledged.
+    Records have the epoch of the file, increased on each rewind, so the records left from
+    previous epochs are never read again. The class is not thread safe.
+    '''
+    def __init__(self, file_path: str, size: int = DEFAULT_SPOOL_SIZE) -> None:
+        '''
+        Open the spool file, creating it if it does not exist. If it exists, the records not
+        acknowledged are kept to be read again.
+
+        Args:
+            file_path (str): Path of the spool file.
+            size (int): Initial size of the file, express in bytes.
+
+        Raises:
+            MidStrSpoolErrorC: The file exists but it is not a spool file.
+        '''
+        self.file_path: str = file_path
+        self.closed: bool = False
+        self.__size: int = size
+        self.__epoch: int = 0
+        self.__ack: int = _HEADER.size
+        self.__end: int = _HEADER.size
+        exists = os.path.isfile(file_path) and os.path.getsize(file_path) >= _HEADER.size
+        self.__file = open(file_path, 'r+b' if exists else 'w+b') #pylint: disable= consider-using-with
+        if exists:
+            self.__size = os.path.getsize(file_path)
+        else:
+            self.__file.truncate(self.__size)
+        self.__mm: mmap.mmap = mmap.mmap(self.__file.fileno(), self.__size)
+        if exists:
+            magic, version, self.__epoch, self.__ack = _HEADER.unpack_from(self.__mm, 0)
+            if magic != _MAGIC or version != _VERSION:
+                self.__mm.close()
+                self.__file.close()
+                raise MidStrSpoolErrorC(f"{file_path} is not a valid spool file")
+            self.__end = self.__ack
+            record = self.__read_record_header(self.__end)
+            while record is not None:
+                self.__end += _RECORD.size + record[0]
+                record = self.__read_record_header(self.__end)
+            if self.has_pending:
+                log.warning(f"Spool {file_path} recovered with {self.pending_bytes} bytes pending")
+        else:
+            self.__write_header()
+
+    @property
+    def has_pending(self) -> bool:
+        '''True if there are records not acknowledged.
+        '''
+        return self.__end > self.__ack
+
+    @property
+    def pending_bytes(self) -> int:
+        '''Size of the records not acknowledged, express in bytes.
+        '''
+        return self.__end - self.__ack
+
+    def __write_header(self) -> None:
+        _HEADER.pack_into(self.__mm, 0, _MAGIC, _VERSION, self.__epoch, self.__ack)
+
+    def __read_record_header(self, offset: int) -> Tuple[int, int]|None:
+        record = None
+        if offset + _RECORD.size <= self.__size:
+            length, epoch, table = _RECORD.unpack_from(self.__mm, offset)
+            if (length > 0 and epoch == self.__epoch and
+                offset + _RECORD.size + length <= self.__size):
+                record = (length, table)
+        return record
+
+    def __grow(self, min_size: int) -> None:
+        new_size = self.__size
+        while new_size < min_size:
+            new_size *= 2
+        log.warning(f"Growing spool {self.file_path} to {new_size} bytes")
+        self.__mm.flush()
+        self.__mm.close()
+        self.__file.truncate(new_size)
+        self.__size = new_size
+        self.__mm = mmap.mmap(self.__file.fileno(), self.__size)
+
+    def append(self, table: int, columns: Tuple[str, ...], rows: List[Tuple]) -> None:
+        '''Append a record with the rows of a table.
+        The record length is written last, so a record partially written is never read.
+
+        Args:
+            table (int): Identifier of the table.
+            columns (Tuple[str, ...]): Names of the columns.
+            rows (List[Tuple]): Values of each row, in the same order than the columns.
+        '''
+        payload = json.dumps([columns, rows], default= _encode_value,
+                             separators= (',', ':')).encode('utf-8')
+        record_end = self.__end + _RECORD.size + len(payload)
+        # Leave room to find an empty record header after the last one
+        if record_end + _RECORD.size > self.__size:
+            self.__grow(record_end + _RECORD.size)
+        self.__mm[self.__end + _RECORD.size : record_end] = payload
+        _RECORD.pack_into(self.__mm, record_end, 0, 0, 0)
+        _RECORD.pack_into(self.__mm, self.__end, len(payload), self.__epoch, table)
+        self.__end = record_end
+
+    def read_pending(self, max_records: int) -> Tuple[List[Tuple[int, List, List]], int]:
+        '''Read the first records not acknowledged.
+
+        Args:
+            max_records (int): Max number of records to read.
+        Returns:
+            Tuple[List[Tuple[int, List, List]], int]: Table, columns and rows of each record,
+            and the offset to acknowledge once they are stored.
+        '''
+        records = []
+        offset = self.__ack
+        while offset < self.__end and len(records) < max_records:
+            record = self.__read_record_header(offset)
+            if record is None:
+                log.error(f"Spool {self.file_path} corrupted at {offset}, discarding the rest")
+                offset = self.__end
+                break
+            length, table = record
+            start = offset + _RECORD.size
+            columns, rows = json.loads(self.__mm[start : start + length])
+            records.append((table, columns, rows))
+            offset = start + length
+        return records, offset
+
+    def ack(self, offset: int) -> None:
+        '''Acknowledge all the records before the offset, rewinding the file if none is left.
+
+        Args:
+            offset (int): Offset returned by read_pending.
+        '''
+        self.__ack = max(self.__ack, min(offset, self.__end))
+        if self.__ack == self.__end:
+            self.__epoch = (self.__epoch + 1) & 0xFFFFFFFF
+            self.__ack = _HEADER.size
+            self.__end = _HEADER.size
+        self.__write_header()
+        self.__mm.flush()
+
+    def close(self) -> None:
+        '''Write the pending changes to disk and close the file.
+        '''
+        if not self.__mm.closed:
+            self.__mm.flush()
+            self.__mm.close()
+            self.__file.close()
+
+    def delete(self) -> None:
+        '''Close and remove the file.
+        '''
+        self.close()
+        os.remove(self.file_path)
+
+#######################            FUNCTIONS             #######################
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif hasattr(value, 'item'):
+        # Numpy scalars
+        value = value.item()
+    else:
+        raise TypeError(f"Value {value} of type {type(value)} can not be spooled")
+    return value
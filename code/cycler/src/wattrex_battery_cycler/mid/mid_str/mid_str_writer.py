@@ -0,0 +1,305 @@
+#!/usr/bin/python3
+'''
+Definition of MID STR bulk writer, used to spool the rows written into the cache database
+and send them with one multi-row insert per table.
+'''
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+import os
+from datetime import datetime
+from glob import glob
+from threading import Lock
+from time import time
+from typing import Dict, List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import DateTime, Table, insert, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+from wattrex_driver_db import (DrvDbCacheExtendedMeasureC, DrvDbCacheGenericMeasureC,
+                               DrvDbCacheStatusC, DrvDbAlarmC, DrvDbCacheExperimentC)
+
+######################             CONSTANTS              ######################
+from .context import (DEFAULT_FLUSH_SIZE, DEFAULT_FLUSH_LATENCY, DEFAULT_SPOOL_PATH,
+                      DEFAULT_SPOOL_CHUNK)
+#######################          MODULE IMPORTS          #######################
+from .mid_str_spool import MidStrSpoolC, MidStrSpoolErrorC
+
+# Tables in the order they are inserted, extended measures refer to the generic ones
+_TABLES: Tuple[Table, ...] = (DrvDbCacheGenericMeasureC.__table__,
+                              DrvDbCacheExtendedMeasureC.__table__,
+                              DrvDbCacheStatusC.__table__, DrvDbAlarmC.__table__)
+_GEN_MEAS, _EXT_MEAS, _STATUS, _ALARM = range(len(_TABLES))
+# Final status of the experiment, updated after all the rows spooled before it are inserted
+_EXP_STATUS = len(_TABLES)
+_EXP_TABLE: Table = DrvDbCacheExperimentC.__table__
+
+#######################              ENUMS               #######################
+
+#######################             CLASSES              #######################
+
+class MidStrBulkWriterC: #pylint: disable= too-many-instance-attributes
+    '''
+    Buffer of the rows written by the STR node. The rows are appended to a spool file of the
+    running experiment, and when the flush size (in samples) or the flush latency (in ms) is
+    reached they are sent to the cache database as a single multi-row insert per table.
+    Rows are only removed from the spool once acknowledged after the commit, so they survive
+    database outages and restarts. Rows can be added and flushed from different threads.
+    '''
+    def __init__(self, flush_size: int = DEFAULT_FLUSH_SIZE, #pylint: disable= too-many-arguments
+                 flush_latency: int = DEFAULT_FLUSH_LATENCY, spool_path: str = DEFAULT_SPOOL_PATH,
+                 spool_chunk: int = DEFAULT_SPOOL_CHUNK) -> None:
+        '''
+        Initialize the buffers.
+
+        Args:
+            flush_size (int): Number of generic samples that triggers a flush.
+            flush_latency (int): Max time in ms a buffered row waits before being flushed.
+            spool_path (str): Directory where the spool files are stored.
+            spool_chunk (int): Max number of spool records sent to the database in each flush.
+        '''
+        self.flush_size: int = flush_size
+        self.flush_latency: int = flush_latency
+        self.spool_path: str = spool_path
+        self.spool_chunk: int = spool_chunk
+        self.__lock: Lock = Lock()
+        self.__spool: MidStrSpoolC|None = None
+        self.__spools: List[MidStrSpoolC] = []
+        self.__in_flight: List[Tuple[MidStrSpoolC, int]] = []
+        self.__in_flight_samples: int = 0
+        self.__in_flight_rows: int = 0
+        self.__n_samples: int = 0
+        self.__n_rows: int = 0
+        self.__first_row_time: float|None = None
+
+    @property
+    def n_samples(self) -> int:
+        '''Number of generic samples of the running experiment waiting to be flushed.
+        '''
+        return self.__n_samples
+
+    @property
+    def n_rows(self) -> int:
+        '''Number of rows of the running experiment waiting to be flushed.
+        '''
+        return self.__n_rows
+
+    @property
+    def has_pending(self) -> bool:
+        '''True if any spool, including the recovered ones, has rows not stored yet.
+        '''
+        with self.__lock:
+            return any(spool.has_pending for spool in self.__spools)
+
+    def start_spool(self, exp_id: int) -> None:
+        '''Open the spool of an experiment, rows added from now on are stored in it.
+        Args:
+            exp_id (int): Id of the experiment.
+        '''
+        os.makedirs(self.spool_path, exist_ok= True)
+        file_path = os.path.join(self.spool_path, f"exp_{exp_id}.spool")
+        with self.__lock:
+            self.__close_spool()
+            spool = next((spool for spool in self.__spools if spool.file_path == file_path),
+                         None)
+            if spool is None:
+                spool = MidStrSpoolC(file_path)
+                self.__spools.append(spool)
+            spool.closed = False
+            self.__spool = spool
+
+    def close_spool(self) -> None:
+        '''Stop adding rows to the spool of the running experiment. The spool is removed once
+        all its rows have been stored.
+        '''
+        with self.__lock:
+            self.__close_spool()
+
+    def __close_spool(self) -> None:
+        if self.__spool is not None:
+            self.__spool.closed = True
+            self.__spool = None
+            self.__n_samples = 0
+            self.__n_rows = 0
+            self.__first_row_time = None
+
+    def recover(self) -> None:
+        '''Open the spools left by previous executions, so their rows are stored.
+        '''
+        with self.__lock:
+            opened = {spool.file_path for spool in self.__spools}
+            for file_path in sorted(glob(os.path.join(self.spool_path, 'exp_*.spool'))):
+                if file_path not in opened:
+                    try:
+                        spool = MidStrSpoolC(file_path)
+                        spool.closed = True
+                        self.__spools.append(spool)
+                    except MidStrSpoolErrorC as err:
+                        log.error(err)
+
+    def __add(self, table: int, rows: List[Dict]) -> None:
+        with self.__lock:
+            if self.__spool is None:
+                log.warning(f"No experiment running, {len(rows)} rows discarded")
+            else:
+                columns = tuple(rows[0].keys())
+                self.__spool.append(table, columns, [tuple(row.values()) for row in rows])
+                if self.__first_row_time is None:
+                    self.__first_row_time = time()
+                self.__n_rows += len(rows)
+                if table == _GEN_MEAS:
+                    self.__n_samples += 1
+
+    def add_gen_meas(self, row: Dict) -> None:
+        '''Buffer a row of the generic measures table.
+        Args:
+            row (Dict): Columns and values of the row.
+        '''
+        self.__add(_GEN_MEAS, [row])
+
+    def add_ext_meas(self, rows: List[Dict]) -> None:
+        '''Buffer the rows of the extended measures table belonging to the same sample.
+        Args:
+            rows (List[Dict]): Columns and values of each row, with the same columns.
+        '''
+        if len(rows) > 0:
+            self.__add(_EXT_MEAS, rows)
+
+    def add_status(self, row: Dict) -> None:
+        '''Buffer a row of the status table.
+        Args:
+            row (Dict): Columns and values of the row.
+        '''
+        self.__add(_STATUS, [row])
+
+    def add_alarms(self, rows: List[Dict]) -> None:
+        '''Buffer the rows of the alarms table.
+        Args:
+            rows (List[Dict]): Columns and values of each row, with the same columns.
+        '''
+        if len(rows) > 0:
+            self.__add(_ALARM, rows)
+
+    def add_exp_status(self, row: Dict) -> None:
+        '''Spool the final status of the running experiment, after all its rows. It is updated
+        in the same transaction than the last rows, so the experiment is never finished in the
+        cache db while some of its rows are not stored yet.
+        Args:
+            row (Dict): ExpID and the columns of the experiment to update.
+        '''
+        self.__add(_EXP_STATUS, [row])
+
+    def flush_due(self) -> bool:
+        '''Check if the buffered rows must be sent to the database.
+        Returns:
+            bool: True if the flush size or the flush latency has been reached, or there are
+            rows left in a spool that is no longer used.
+        '''
+        with self.__lock:
+            res = any(spool.closed and spool.has_pending for spool in self.__spools)
+            if not res and self.__first_row_time is not None:
+                res = (self.__n_samples >= self.flush_size or
+                       (time() - self.__first_row_time)*1000 >= self.flush_latency)
+        return res
+
+    def flush(self, session: Session) -> int:
+        '''Insert the first rows not stored of each spool, with one statement per table.
+        Rows already stored are ignored, as they may have been committed before a failure.
+        The transaction is not committed, it is up to the caller to commit it and call ack.
+
+        Args:
+            session (Session): Session of the cache database.
+        Returns:
+            int: Number of rows inserted.
+        '''
+        table_rows: List[List[Dict]] = [[] for _ in range(len(_TABLES) + 1)]
+        with self.__lock:
+            self.__in_flight = []
+            self.__in_flight_samples = 0
+            self.__in_flight_rows = 0
+            for spool in self.__spools:
+                if not spool.has_pending:
+                    continue
+                records, offset = spool.read_pending(self.spool_chunk)
+                self.__in_flight.append((spool, offset))
+                for table, columns, rows in records:
+                    table_rows[table].extend(dict(zip(columns, row)) for row in rows)
+                    if spool is self.__spool:
+                        self.__in_flight_rows += len(rows)
+                        if table == _GEN_MEAS:
+                            self.__in_flight_samples += len(rows)
+        n_rows = 0
+        dialect = session.get_bind().dialect.name
+        for table, rows in zip(_TABLES, table_rows):
+            if len(rows) > 0:
+                _decode_datetimes(table, rows)
+                session.execute(_insert_ignore(table, dialect), rows)
+                n_rows += len(rows)
+        _decode_datetimes(_EXP_TABLE, table_rows[_EXP_STATUS])
+        for row in table_rows[_EXP_STATUS]:
+            exp_id = row.pop('ExpID')
+            session.execute(update(_EXP_TABLE).where(_EXP_TABLE.c.ExpID == exp_id).values(row))
+            log.info(f"Experiment {exp_id} turned to {row.get('Status')} in cache db")
+        log.debug(f"Flushed {n_rows} rows to cache db")
+        return n_rows
+
+    def ack(self) -> None:
+        '''Remove from the spools the rows inserted in the last flush, once committed.
+        Spools no longer used are removed when all their rows have been stored.
+        '''
+        with self.__lock:
+            for spool, offset in self.__in_flight:
+                spool.ack(offset)
+                if spool.closed and not spool.has_pending:
+                    spool.delete()
+                    self.__spools.remove(spool)
+            self.__in_flight = []
+            self.__n_samples = max(0, self.__n_samples - self.__in_flight_samples)
+            self.__n_rows = max(0, self.__n_rows - self.__in_flight_rows)
+            self.__in_flight_samples = 0
+            self.__in_flight_rows = 0
+            self.__first_row_time = time() if self.__n_rows > 0 else None
+
+    def close(self) -> None:
+        '''Close all the spools, the rows not stored are kept in their files.
+        '''
+        with self.__lock:
+            for spool in self.__spools:
+                spool.close()
+            self.__spools = []
+            self.__spool = None
+            self.__in_flight = []
+
+#######################            FUNCTIONS             #######################
+
+def _insert_ignore(table: Table, dialect: str):
+    '''Insert statement that does nothing for rows whose primary key is already in the table,
+    as they may have been committed before a failure. Unlike INSERT IGNORE, any other error
+    is still raised.
+    '''
+    if dialect in ('mysql', 'mariadb'):
+        key = table.primary_key.columns.values()[0].name
+        stmt = mysql.insert(table).on_duplicate_key_update({key: table.c[key]})
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        log.warning(f"Rows already in {table.name} can not be skipped in {dialect}")
+        stmt = insert(table)
+    return stmt
+
+def _decode_datetimes(table: Table, rows: List[Dict]) -> None:
+    '''Convert back to datetime the values of datetime columns, stored as ISO strings.
+    '''
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            for row in rows:
+                if isinstance(row.get(column.name), str):
+                    row[column.name] = datetime.fromisoformat(row[column.name])
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+SQLite stand-ins of the master and cache databases, shared by the tests and benchmarks of the
+cycler. The MySQL integer types are compiled as INTEGER in SQLite, so the primary keys of the
+models are auto incremented, and the MariaDB functions used by mid str are added to SQLite.
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+
+#######################         GENERIC IMPORTS          #######################
+from zlib import crc32
+
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import Column, MetaData, Table, create_engine, event
+from sqlalchemy.dialects.mysql import INTEGER, MEDIUMINT, SMALLINT
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+#######################             CLASSES              #######################
+
+@compiles(MEDIUMINT, 'sqlite')
+@compiles(INTEGER, 'sqlite')
+@compiles(SMALLINT, 'sqlite')
+def _compile_int_sqlite(type_, compiler, **kw): #pylint: disable= unused-argument
+    return 'INTEGER'
+
+class SqliteEngineC:
+    """Stand-in of DrvDbSqlEngineC over a SQLite database in memory, with the tables of the
+    given models. The NOT NULL constraints are only kept if not_null is set, so the rows of a
+    test can leave out the columns it does not use.
+    """
+    def __init__(self, *models, not_null: bool = False) -> None:
+        self.engine = create_engine('sqlite://')
+        event.listen(self.engine, 'connect', _add_mariadb_functions)
+        self.session = Session(self.engine)
+        create_tables(self.engine, *models, not_null= not_null)
+
+    def commit_changes(self, raise_exception: bool = False) -> None:
+        """Commit the session, rolling it back on error."""
+        try:
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            if raise_exception:
+                raise
+
+    def close_connection(self) -> None:
+        """Close the session."""
+        self.session.close()
+
+    def reset(self) -> None:
+        """Roll back the session."""
+        self.session.rollback()
+
+#######################            FUNCTIONS             #######################
+
+def _add_mariadb_functions(dbapi_con, con_record) -> None: #pylint: disable= unused-argument
+    dbapi_con.create_function('crc32', 1, lambda value: crc32(str(value).encode()))
+    dbapi_con.create_function('concat_ws', -1, lambda sep, *values:
+                              sep.join(str(val) for val in values if val is not None))
+
+def create_tables(engine: Engine, *models, not_null: bool = False) -> None:
+    """Create the tables of the models, without foreign keys, and with their NOT NULL
+    constraints if not_null is set.
+    """
+    metadata = MetaData()
+    for model in models:
+        Table(model.__table__.name, metadata, *[Column(col.name, col.type,
+              primary_key= col.primary_key, nullable= col.nullable or not not_null)
+              for col in model.__table__.columns])
+    metadata.create_all(engine)
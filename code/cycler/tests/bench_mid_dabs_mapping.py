@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+"""
+Microbenchmark of the update of the measures of MidDabsPwrMeterC and MidDabsExtraMeterC with the
+compiled mappings against the previous per measure name building, using stand-ins of the EPC
+and BMS drivers that return the last data at once.
+Run from the repository root: python code/cycler/tests/bench_mid_dabs_mapping.py
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from time import perf_counter
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="bench_mid_dabs_mapping")
+#######################       THIRD PARTY IMPORTS        #######################
+from wattrex_driver_base import DrvBaseStatusC
+from wattrex_driver_bms import DrvBmsDataC
+from wattrex_driver_bms.context import DEFAULT_MEASURE_NAMES
+from wattrex_driver_epc import DrvEpcModeE, DrvEpcStatusC
+from wattrex_driver_epc.drv_epc_common import DrvEpcDataCtrlC, DrvEpcDataElectC, DrvEpcDataTempC
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataAllStatusC, CyclerDataDeviceC,
+    CyclerDataDeviceStatusC, CyclerDataDeviceTypeE, CyclerDataExtMeasC, CyclerDataGenMeasC,
+    CyclerDataPwrModeE)
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_dabs import mid_dabs
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+N_ITERATIONS = 100000
+EPC_MAPPING = {'ls_voltage': 1, 'ls_current': 2, 'ls_power': 3, 'hs_voltage': 4,
+               'temp_body': 5, 'temp_amb': 6, 'temp_anod': 7}
+BMS_MAPPING = {name: 100 + i for i, name in enumerate(DEFAULT_MEASURE_NAMES)}
+
+#######################             CLASSES              #######################
+
+class _EpcStandInC:
+    """Stand-in of DrvEpcDeviceC that returns the last frames received.
+    """
+    def __init__(self, can_id: int) -> None:
+        self.can_id = can_id
+        self.elect = DrvEpcDataElectC(ls_voltage= 3600, ls_current= 1000, ls_power= 36,
+                                      hs_voltage= 12000)
+        self.temp = DrvEpcDataTempC(temp_body= 250, temp_amb= 240, temp_anod= 260)
+        self.mode = DrvEpcDataCtrlC(mode= DrvEpcModeE.CC_MODE)
+        self.status = DrvEpcStatusC(0)
+
+    def open(self) -> None:
+        """Nothing to open."""
+
+    def close(self) -> None:
+        """Nothing to close."""
+
+    def set_periodic(self, **kwargs) -> None:
+        """Nothing to configure."""
+
+    def get_elec_meas(self, periodic_flag: bool = False) -> DrvEpcDataElectC: #pylint: disable= unused-argument
+        """Last electric measures."""
+        return self.elect
+
+    def get_temp_meas(self, periodic_flag: bool = False) -> DrvEpcDataTempC: #pylint: disable= unused-argument
+        """Last temperatures."""
+        return self.temp
+
+    def get_mode(self) -> DrvEpcDataCtrlC:
+        """Last mode."""
+        return self.mode
+
+    def get_status(self) -> DrvEpcStatusC:
+        """Last status."""
+        return self.status
+
+class _BmsStandInC:
+    """Stand-in of DrvBmsDeviceC that returns the last measures received.
+    """
+    def __init__(self, can_id: int) -> None:
+        self.can_id = can_id
+        self.data = DrvBmsDataC([3300 + i for i in range(len(DEFAULT_MEASURE_NAMES))])
+
+    def get_data(self) -> DrvBmsDataC:
+        """Last measures."""
+        return self.data
+
+    def close(self) -> None:
+        """Nothing to close."""
+
+#######################            FUNCTIONS             #######################
+
+def legacy_pwr_update(epc: _EpcStandInC, mapping_epc: dict, dev_db_id: int,
+                      gen_meas: CyclerDataGenMeasC, ext_meas: CyclerDataExtMeasC,
+                      status: CyclerDataAllStatusC) -> None:
+    """Update of the EPC measures building the name of each measure, as done before the
+    compiled mappings.
+    """
+    msg_elect_meas = epc.get_elec_meas(periodic_flag= True)
+    msg_temp_meas = epc.get_temp_meas(periodic_flag= True)
+    msg_mode = epc.get_mode()
+    epc_status = epc.get_status()
+    status.pwr_dev = CyclerDataDeviceStatusC(error= epc_status.error_code, dev_db_id= dev_db_id)
+    gen_meas.voltage = msg_elect_meas.ls_voltage
+    gen_meas.current = msg_elect_meas.ls_current
+    gen_meas.power   = msg_elect_meas.ls_power
+    if msg_mode.mode.value == 5:
+        pwr_mode = CyclerDataPwrModeE.WAIT
+    else:
+        pwr_mode = CyclerDataPwrModeE(msg_mode.mode.value)
+    status.pwr_mode = pwr_mode
+    if mapping_epc is not None:
+        for key in mapping_epc.keys():
+            if 'temp' in key:
+                setattr(ext_meas, key+'_'+str(mapping_epc[key]), getattr(msg_temp_meas, key))
+            else:
+                setattr(ext_meas, key+'_'+str(mapping_epc[key]), getattr(msg_elect_meas, key))
+
+def legacy_extra_update(device: _BmsStandInC, mapping_attr: dict, dev_db_id: int,
+                        ext_meas: CyclerDataExtMeasC, status: CyclerDataAllStatusC) -> None:
+    """Update of the BMS measures building the name of each measure, as done before the
+    compiled mappings.
+    """
+    res = device.get_data()
+    if hasattr(res, 'status'):
+        if isinstance(res.status, DrvBaseStatusC):
+            state = CyclerDataDeviceStatusC(error= getattr(res,'status').error_code,
+                                            dev_db_id= dev_db_id)
+            setattr(status, 'extra_meter_'+str(dev_db_id), state)
+    for key in mapping_attr.keys():
+        setattr(ext_meas, key+'_'+str(mapping_attr[key]), getattr(res, key))
+
+def bench(name: str, func) -> float:
+    """Run the update N_ITERATIONS times and print the time per update.
+    """
+    start = perf_counter()
+    for _ in range(N_ITERATIONS):
+        func()
+    elapsed = (perf_counter() - start) / N_ITERATIONS
+    print(f"{name:>16}: {elapsed*1e6:6.2f} us per update")
+    return elapsed
+
+def main() -> None:
+    """Compare both updates of the EPC and the BMS and check that they write the same measures.
+    """
+    mid_dabs.DrvEpcDeviceC = _EpcStandInC
+    mid_dabs.DrvBmsDeviceC = _BmsStandInC
+    epc_dev = CyclerDataDeviceC(dev_db_id= 1, device_type= CyclerDataDeviceTypeE.EPC,
+                                iface_name= '0x30', mapping_names= EPC_MAPPING)
+    epc_dev.check_power_device()
+    bms_dev = CyclerDataDeviceC(dev_db_id= 2, device_type= CyclerDataDeviceTypeE.BMS,
+                                iface_name= '0x40', mapping_names= BMS_MAPPING)
+    pwr_meter = mid_dabs.MidDabsPwrMeterC([epc_dev])
+    extra_meter = mid_dabs.MidDabsExtraMeterC(bms_dev)
+    print(f"EPC with {len(EPC_MAPPING)} measures, BMS with {len(BMS_MAPPING)} measures")
+
+    results = []
+    for name, pwr_update, extra_update in (
+        ('legacy', lambda gen, ext, status: legacy_pwr_update(pwr_meter.epc, EPC_MAPPING, 1,
+                                                              gen, ext, status),
+                   lambda ext, status: legacy_extra_update(extra_meter.device, BMS_MAPPING, 2,
+                                                           ext, status)),
+        ('compiled', pwr_meter.update, extra_meter.update)):
+        gen_meas, ext_meas, status = (CyclerDataGenMeasC(), CyclerDataExtMeasC(),
+                                      CyclerDataAllStatusC())
+        pwr_time = bench(f"{name} epc", lambda: pwr_update(gen_meas, ext_meas, status)) # pylint: disable=cell-var-from-loop
+        extra_time = bench(f"{name} bms", lambda: extra_update(ext_meas, status)) # pylint: disable=cell-var-from-loop
+        results.append((pwr_time, extra_time, vars(ext_meas)))
+    (legacy_pwr, legacy_extra, legacy_meas), (pwr, extra, meas) = results
+    assert legacy_meas == meas
+    print(f"speedup: epc x{legacy_pwr / pwr:.2f}, bms x{legacy_extra / extra:.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+"""
+Benchmark of the cycler station loader of MidStrFacadeC against the previous per device
+queries, using a SQLite database as stand-in of the master database.
+Run from the repository root: python code/cycler/tests/bench_mid_str_station.py
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from time import perf_counter, sleep
+from typing import Dict, List
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="bench_mid_str_station")
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import and_, event, insert, select
+from wattrex_driver_db import (DrvDbCyclerStationC, DrvDbUsedDeviceC, DrvDbDetectedDeviceC,
+    DrvDbCompatibleDeviceC, DrvDbUsedMeasuresC, DrvDbAvailableMeasuresC, DrvDbLinkConfigurationC)
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_str import MidStrFacadeC
+from _cycler_sqlite_standin import SqliteEngineC, create_tables
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+CS_ID = 1
+N_BMS_MEAS = 19
+N_ITERATIONS = 20
+LATENCY = 0.002 # Simulated round trip to the master database, express in seconds
+
+#######################             CLASSES              #######################
+
+class _LatencyEngineC(SqliteEngineC):
+    """SQLite stand-in of the master database that counts the statements executed and delays
+    each one by the round trip to the master database.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.n_statements = 0
+        event.listen(self.engine, 'before_cursor_execute', self.__count_statement)
+
+    def __count_statement(self, *args, **kwargs) -> None: #pylint: disable= unused-argument
+        self.n_statements += 1
+        sleep(LATENCY)
+
+#######################            FUNCTIONS             #######################
+
+def create_master_db(db: _LatencyEngineC) -> None:
+    """Create the tables used by the loader, without foreign keys, and fill a station with
+    an EPC, a BMS and a meter.
+    """
+    models = (DrvDbCyclerStationC, DrvDbUsedDeviceC, DrvDbDetectedDeviceC, DrvDbCompatibleDeviceC,
+              DrvDbUsedMeasuresC, DrvDbAvailableMeasuresC, DrvDbLinkConfigurationC)
+    create_tables(db.engine, *models)
+    session = db.session
+    session.execute(insert(DrvDbCyclerStationC.__table__), [{'CSID': CS_ID, 'CUID': 1,
+                    'Name': 'bench', 'Location': 'lab', 'Deprecated': False}])
+    session.execute(insert(DrvDbCompatibleDeviceC.__table__), [
+        {'CompDevID': 1, 'Name': 'epc', 'Manufacturer': 'wattrex', 'DeviceType': 'Epc'},
+        {'CompDevID': 2, 'Name': 'bms', 'Manufacturer': 'wattrex', 'DeviceType': 'Bms'},
+        {'CompDevID': 3, 'Name': 'meter', 'Manufacturer': 'bk', 'DeviceType': 'Bk'}])
+    session.execute(insert(DrvDbDetectedDeviceC.__table__), [
+        {'DevID': dev, 'CUID': 1, 'CompDevID': dev, 'SN': str(dev), 'LinkName': f'link_{dev}'}
+        for dev in (1, 2, 3)])
+    session.execute(insert(DrvDbUsedDeviceC.__table__),
+                    [{'DevID': dev, 'CSID': CS_ID} for dev in (1, 2, 3)])
+    meas_per_dev = {1: 5, 2: N_BMS_MEAS, 3: 2}
+    available, used = [], []
+    for dev, n_meas in meas_per_dev.items():
+        for i in range(n_meas):
+            meas_type = dev*100 + i
+            available.append({'MeasType': meas_type, 'CompDevID': dev,
+                              'MeasName': f'meas_{dev}_{i}'})
+            used.append({'UsedMeasID': meas_type, 'CSID': CS_ID, 'MeasType': meas_type,
+                         'DevID': dev})
+    session.execute(insert(DrvDbAvailableMeasuresC.__table__), available)
+    session.execute(insert(DrvDbUsedMeasuresC.__table__), used)
+    session.execute(insert(DrvDbLinkConfigurationC.__table__), [
+        {'CompDevID': 3, 'Property': 'baudrate', 'Value': '9600'},
+        {'CompDevID': 3, 'Property': 'parity', 'Value': 'none'},
+        {'CompDevID': 3, 'Property': 'timeout', 'Value': '0.1'}])
+    session.commit()
+
+def legacy_station_queries(db: _LatencyEngineC) -> Dict[int, Dict]:
+    """Read the station devices with one group of queries per device and one query per
+    measure, as done before the joined loader.
+    """
+    session = db.session
+    session.execute(select(DrvDbCyclerStationC).where(DrvDbCyclerStationC.CSID == CS_ID)).one()
+    devices = {}
+    for res_dev in session.execute(select(DrvDbUsedDeviceC).where(
+                                   DrvDbUsedDeviceC.CSID == CS_ID)).all():
+        res_dev = res_dev[0]
+        detected_dev_res, comp_dev_res = session.execute(select(DrvDbDetectedDeviceC,
+            DrvDbCompatibleDeviceC).join(DrvDbCompatibleDeviceC,
+            DrvDbDetectedDeviceC.CompDevID == DrvDbCompatibleDeviceC.CompDevID).where(
+            DrvDbDetectedDeviceC.DevID == res_dev.DevID)).one()
+        mapping_names = {}
+        for ext_meas in session.execute(select(DrvDbUsedMeasuresC).where(
+                DrvDbUsedMeasuresC.DevID == res_dev.DevID).where(
+                DrvDbUsedMeasuresC.CSID == CS_ID)).all():
+            ext_meas = ext_meas[0]
+            available_meas = session.execute(select(DrvDbAvailableMeasuresC).where(and_(
+                DrvDbAvailableMeasuresC.MeasType == ext_meas.MeasType,
+                DrvDbAvailableMeasuresC.CompDevID == comp_dev_res.CompDevID))).one()[0]
+            mapping_names[available_meas.MeasName] = int(ext_meas.UsedMeasID)
+        link_conf = {}
+        if comp_dev_res.DeviceType != 'Epc':
+            for res in session.execute(select(DrvDbLinkConfigurationC).where(
+                    DrvDbLinkConfigurationC.CompDevID == detected_dev_res.CompDevID)).all():
+                link_conf[res[0].Property.lower()] = str(res[0].Value)
+        devices[res_dev.DevID] = {'mapping_names': mapping_names, 'link_conf': link_conf}
+    return devices
+
+def bench(name: str, db: _LatencyEngineC, func) -> List:
+    """Run the loader N_ITERATIONS times and print the statements and time per load.
+    """
+    db.n_statements = 0
+    result = None
+    start = perf_counter()
+    for _ in range(N_ITERATIONS):
+        result = func()
+        db.session.expire_all()
+    elapsed = (perf_counter() - start) / N_ITERATIONS
+    print(f"{name:>8}: {db.n_statements / N_ITERATIONS:5.1f} statements, "
+          f"{elapsed*1000:7.2f} ms per load")
+    return result
+
+def main() -> None:
+    """Compare both loaders and check that they read the same station.
+    """
+    db = _LatencyEngineC()
+    create_master_db(db)
+    facade = MidStrFacadeC(cycler_station_id= CS_ID, master_db= db, cache_db= db)
+    print(f"Station with 3 devices and {N_BMS_MEAS} BMS measures, "
+          f"{LATENCY*1000:.1f} ms per statement")
+    legacy = bench('legacy', db, lambda: legacy_station_queries(db))
+    station = bench('joined', db, facade.get_cycler_station_info)
+    for device in station.devices:
+        link_conf = legacy[device.dev_db_id]['link_conf']
+        assert device.mapping_names == legacy[device.dev_db_id]['mapping_names']
+        assert (device.link_conf is None) == (len(link_conf) == 0)
+
+if __name__ == '__main__':
+    main()
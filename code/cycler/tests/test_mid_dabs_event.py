@@ -0,0 +1,279 @@
+#!/usr/bin/python3
+"""
+This file test the wait of the periodic frames of the EPC in mid dabs and the EVENT acquisition
+mode of mid meas, using stand-ins of the EPC driver and its reception queue.
+COMMAND: clear && pytest code/cycler/tests/test_mid_dabs_event.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from collections import deque
+from threading import Event, Lock, Thread, Timer
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_mid_dabs_event")
+#######################       THIRD PARTY IMPORTS        #######################
+import pytest
+from system_shared_tool import SysShdSharedObjC
+from wattrex_driver_epc import DrvEpcModeE, DrvEpcStatusC
+from wattrex_driver_epc.drv_epc_common import DrvEpcDataCtrlC, DrvEpcDataElectC, DrvEpcDataTempC
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataAllStatusC, CyclerDataDeviceC,
+    CyclerDataDeviceTypeE, CyclerDataExtMeasC, CyclerDataGenMeasC, CyclerDataMergeTagsC)
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_dabs import mid_dabs
+from src.wattrex_battery_cycler.mid.mid_meas import MidMeasNodeC, MidMeasAcqModeE
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+CAN_ID = 0x30
+# Types of the epc messages, replies to the requests and periodic frames
+MODE, STATUS, ELEC_MEAS, TEMP_MEAS = 0x0, 0xB, 0xC, 0xD
+TIMEOUT = 0.2
+
+#######################             CLASSES              #######################
+
+class _RxChanStandInC:
+    """Stand-in of the reception queue of the EPC, notifying like a POSIX message queue the
+    first message that arrives to the empty queue.
+    """
+    def __init__(self, notify: bool) -> None:
+        self.notify = notify
+        self.__msgs = deque()
+        self.__lock = Lock()
+        self.__notification = None
+
+    def push(self, msg_type: int) -> None:
+        """Receive a message of the epc."""
+        with self.__lock:
+            notification = None
+            if len(self.__msgs) == 0:
+                notification, self.__notification = self.__notification, None
+            self.__msgs.append(SimpleNamespace(addr= CAN_ID + msg_type, payload= bytes(8)))
+        if notification is not None:
+            Thread(target= notification[0], args= (notification[1],)).start()
+
+    def request_notification(self, notification) -> None:
+        """Register the notification of the next message, or remove it."""
+        if not self.notify:
+            raise OSError("Notifications not supported")
+        with self.__lock:
+            self.__notification = notification
+
+    def is_empty(self) -> bool:
+        """True if there are no messages."""
+        return len(self.__msgs) == 0
+
+    def receive_data(self) -> SimpleNamespace:
+        """Read the first message."""
+        with self.__lock:
+            return self.__msgs.popleft()
+
+    def delete_until_last(self) -> None:
+        """Remove all the messages."""
+        self.__msgs.clear()
+
+class _EpcStandInC:
+    """Stand-in of DrvEpcDeviceC, that reads all the messages of its queue like the driver.
+    """
+    notify = True
+    instances: list = []
+
+    def __init__(self, can_id: int) -> None:
+        self.instances.append(self)
+        self.can_id = can_id
+        self._DrvEpcDeviceC__device_handler = None #pylint: disable= invalid-name
+        self.elect = DrvEpcDataElectC(ls_voltage= 3600, ls_current= 1000, ls_power= 36,
+                                      hs_voltage= 12000)
+        self.temp = DrvEpcDataTempC(temp_body= 250, temp_amb= 240, temp_anod= 260)
+        self.mode = DrvEpcDataCtrlC(mode= DrvEpcModeE.CC_MODE)
+        self.n_read = 0
+
+    def open(self) -> None:
+        """Open the reception queue."""
+        self._DrvEpcDeviceC__device_handler = _RxChanStandInC(self.notify)
+
+    def close(self) -> None:
+        """Nothing to close."""
+
+    def set_periodic(self, **kwargs) -> None:
+        """Nothing to configure."""
+
+    def get_data(self) -> None:
+        """Read the messages received."""
+        while not self._DrvEpcDeviceC__device_handler.is_empty():
+            self._DrvEpcDeviceC__device_handler.receive_data()
+            self.n_read += 1
+
+    def get_elec_meas(self, periodic_flag: bool = False) -> DrvEpcDataElectC: #pylint: disable= unused-argument
+        """Last electric measures."""
+        self.get_data()
+        return self.elect
+
+    def get_temp_meas(self, periodic_flag: bool = False) -> DrvEpcDataTempC: #pylint: disable= unused-argument
+        """Last temperatures."""
+        self.get_data()
+        return self.temp
+
+    def get_mode(self) -> DrvEpcDataCtrlC:
+        """Last mode."""
+        self.get_data()
+        return self.mode
+
+    def get_status(self) -> DrvEpcStatusC:
+        """Last status."""
+        self.get_data()
+        return DrvEpcStatusC(0)
+
+class _EpcNoNotifyC(_EpcStandInC):
+    """Stand-in of DrvEpcDeviceC whose queue can not notify the messages.
+    """
+    notify = False
+
+class _EpcNoQueueC(_EpcStandInC):
+    """Stand-in of DrvEpcDeviceC without access to its reception queue.
+    """
+    def open(self) -> None:
+        """Nothing to open."""
+        del self._DrvEpcDeviceC__device_handler
+
+    def get_data(self) -> None:
+        """Nothing to read."""
+
+#######################            FUNCTIONS             #######################
+
+def _epc_device() -> CyclerDataDeviceC:
+    device = CyclerDataDeviceC(dev_db_id= 1, device_type= CyclerDataDeviceTypeE.EPC,
+                               iface_name= hex(CAN_ID), mapping_names= {'ls_voltage': 1,
+                               'temp_body': 2})
+    device.check_power_device()
+    return device
+
+def _pwr_meter(monkeypatch, driver: type) -> mid_dabs.MidDabsPwrMeterC:
+    monkeypatch.setattr(mid_dabs, 'DrvEpcDeviceC', driver)
+    pwr_meter = mid_dabs.MidDabsPwrMeterC([_epc_device()])
+    pwr_meter.update(CyclerDataGenMeasC(), CyclerDataExtMeasC(), CyclerDataAllStatusC())
+    return pwr_meter
+
+def _push_later(pwr_meter: mid_dabs.MidDabsPwrMeterC, delay: float, *msg_types: int) -> Timer:
+    rx_chan = pwr_meter.epc._DrvEpcDeviceC__device_handler.rx_chan #pylint: disable= protected-access
+    timer = Timer(delay, lambda: [rx_chan.push(msg_type) for msg_type in msg_types])
+    timer.start()
+    return timer
+
+def _timed_wait(pwr_meter: mid_dabs.MidDabsPwrMeterC) -> tuple:
+    start = perf_counter()
+    res = pwr_meter.wait_new_data(TIMEOUT)
+    return res, perf_counter() - start
+
+#######################             TESTS                #######################
+
+class TestWaitNewData:
+    '''Test the wait of the periodic frames of the EPC.'''
+
+    @pytest.mark.parametrize('driver', [_EpcStandInC, _EpcNoNotifyC])
+    def test_timeout(self, monkeypatch, driver: type) -> None:
+        """Without frames the wait lasts the timeout.
+        """
+        pwr_meter = _pwr_meter(monkeypatch, driver)
+        assert pwr_meter.notifies_data
+        res, elapsed = _timed_wait(pwr_meter)
+        assert not res and TIMEOUT <= elapsed < TIMEOUT + 0.1
+
+    @pytest.mark.parametrize('driver', [_EpcStandInC, _EpcNoNotifyC])
+    def test_frame(self, monkeypatch, driver: type) -> None:
+        """A periodic frame ends the wait as soon as it arrives, and it is read by the driver.
+        """
+        pwr_meter = _pwr_meter(monkeypatch, driver)
+        _push_later(pwr_meter, 0.05, ELEC_MEAS).join()
+        res, elapsed = _timed_wait(pwr_meter)
+        assert res and elapsed < 0.05
+        n_read = pwr_meter.epc.n_read
+        pwr_meter.update(CyclerDataGenMeasC(), CyclerDataExtMeasC(), CyclerDataAllStatusC())
+        timer = _push_later(pwr_meter, 0.05, TEMP_MEAS)
+        res, elapsed = _timed_wait(pwr_meter)
+        timer.join()
+        assert res and 0.04 < elapsed < TIMEOUT
+        assert pwr_meter.epc.n_read == n_read + 1
+
+    def test_late_reply(self, monkeypatch) -> None:
+        """The replies to the requests of the update are read, but they are not frames however
+        late they arrive, nor the frames read by the update.
+        """
+        pwr_meter = _pwr_meter(monkeypatch, _EpcStandInC)
+        _push_later(pwr_meter, 0, ELEC_MEAS).join()
+        pwr_meter.update(CyclerDataGenMeasC(), CyclerDataExtMeasC(), CyclerDataAllStatusC())
+        timer = _push_later(pwr_meter, 0.05, MODE, STATUS)
+        res, elapsed = _timed_wait(pwr_meter)
+        timer.join()
+        assert not res and elapsed >= TIMEOUT
+        rx_tap = pwr_meter.epc._DrvEpcDeviceC__device_handler #pylint: disable= protected-access
+        assert rx_tap.is_empty() and rx_tap.n_frames == 1
+        timer = _push_later(pwr_meter, 0.05, MODE, ELEC_MEAS)
+        res, elapsed = _timed_wait(pwr_meter)
+        timer.join()
+        assert res and elapsed < TIMEOUT and rx_tap.n_frames == 2
+
+    def test_no_queue(self, monkeypatch) -> None:
+        """Without access to the queue of the driver an error is logged, and the wait lasts the
+        timeout.
+        """
+        errors = []
+        monkeypatch.setattr(mid_dabs.log, 'error', errors.append)
+        pwr_meter = _pwr_meter(monkeypatch, _EpcNoQueueC)
+        assert not pwr_meter.notifies_data
+        assert any('wattrex-driver-epc' in error for error in errors)
+        res, elapsed = _timed_wait(pwr_meter)
+        assert not res and elapsed >= TIMEOUT
+
+class TestEventMode:
+    '''Test the EVENT acquisition mode of the meas node.'''
+
+    @staticmethod
+    def __node(acq_mode: MidMeasAcqModeE, working_flag: Event) -> MidMeasNodeC:
+        return MidMeasNodeC(shared_gen_meas= SysShdSharedObjC(CyclerDataGenMeasC()),
+                            shared_ext_meas= SysShdSharedObjC(CyclerDataExtMeasC()),
+                            shared_status= SysShdSharedObjC(CyclerDataAllStatusC()),
+                            working_flag= working_flag, devices= [_epc_device()],
+                            excl_tags= CyclerDataMergeTagsC([], [], []), acq_mode= acq_mode)
+
+    def test_fallback(self, monkeypatch) -> None:
+        """EVENT mode is only used if the frames of the power device can be waited.
+        """
+        monkeypatch.setattr(mid_dabs, 'DrvEpcDeviceC', _EpcNoQueueC)
+        node = self.__node(MidMeasAcqModeE.EVENT, Event())
+        assert node.acq_mode is MidMeasAcqModeE.PERIODIC
+        monkeypatch.setattr(mid_dabs, 'DrvEpcDeviceC', _EpcStandInC)
+        node = self.__node(MidMeasAcqModeE.EVENT, Event())
+        assert node.acq_mode is MidMeasAcqModeE.EVENT
+
+    def test_frames(self, monkeypatch) -> None:
+        """Each frame of the power device starts an iteration.
+        """
+        monkeypatch.setattr(mid_dabs, 'DrvEpcDeviceC', _EpcStandInC)
+        working_flag = Event()
+        working_flag.set()
+        node = self.__node(MidMeasAcqModeE.EVENT, working_flag)
+        rx_chan = _EpcStandInC.instances[-1]._DrvEpcDeviceC__device_handler.rx_chan #pylint: disable= protected-access
+        node.start()
+        sleep(0.05)
+        head = node.samples.head
+        for _ in range(3):
+            rx_chan.push(ELEC_MEAS)
+            sleep(0.05)
+        working_flag.clear()
+        rx_chan.push(ELEC_MEAS)
+        node.join(2)
+        assert not node.is_alive()
+        # Without frames the node waits the event timeout, longer than the test
+        assert head + 3 <= node.samples.head <= head + 4
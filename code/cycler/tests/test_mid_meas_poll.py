@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+"""
+This file test the concurrent poll of the extra meters of mid meas.
+COMMAND: clear && pytest code/cycler/tests/test_mid_meas_poll.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from threading import Event, Timer
+from time import perf_counter
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_mid_meas_poll")
+#######################       THIRD PARTY IMPORTS        #######################
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataAllStatusC, CyclerDataDeviceC,
+    CyclerDataDeviceTypeE, CyclerDataExtMeasC, CyclerDataExtMeasFixedC)
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_meas.mid_meas import MidMeasExtraPollC
+#######################          PROJECT IMPORTS         #######################
+
+#######################             CLASSES              #######################
+
+class _MeterC:
+    """Extra meter that answers when the test releases it.
+    """
+    def __init__(self, dev_db_id: int) -> None:
+        self.dev_db_id = dev_db_id
+        self.answer = Event()
+        self.value = 0
+        self.updating = False
+        self.closed = Event()
+        self.closed_updating = False
+
+    def update(self, ext_meas: CyclerDataExtMeasC, status: object) -> None:
+        """Wait for the answer and write the measure and the status."""
+        self.updating = True
+        self.answer.wait(5)
+        self.value += 1
+        self.updating = False
+        setattr(ext_meas, f'temp_{self.dev_db_id}', self.value)
+        setattr(status, f'extra_meter_{self.dev_db_id}', 'OK')
+
+    def close(self) -> None:
+        """Record if the meter was being updated."""
+        self.closed_updating = self.updating
+        self.closed.set()
+
+class TestExtraPoll:
+    '''Test the deadline of the extra meters.'''
+
+    def test_stale(self) -> None:
+        """A late meter does not block the iteration, its measures are flagged as stale until
+        it answers, and the update is not started twice.
+        """
+        meter = _MeterC(7)
+        poll = MidMeasExtraPollC(meter, deadline= 20)
+        ext_meas, status = CyclerDataExtMeasC(), CyclerDataAllStatusC()
+        with ThreadPoolExecutor(max_workers= 1) as pool:
+            for _ in range(3):
+                start = perf_counter()
+                poll.start(pool)
+                poll.collect(ext_meas, status)
+                assert perf_counter() - start < 1
+                assert getattr(ext_meas, CyclerDataExtMeasC.stale_attr(7)) is True
+                assert not hasattr(ext_meas, 'temp_7')
+            meter.answer.set()
+            poll.start(pool)
+            poll.collect(ext_meas, status)
+        assert getattr(ext_meas, 'stale_extra_meter_7') is False
+        assert (ext_meas.temp_7, status.extra_meter_7) == (1, 'OK')
+        assert poll.n_stale == 3 and status.pwr_dev is None
+
+    def test_fixed_ext_meas(self) -> None:
+        """The measures polled are merged in the fixed extended measures of the station, which
+        have no dictionary and are copied with their values.
+        """
+        device = CyclerDataDeviceC(dev_db_id= 7, device_type= CyclerDataDeviceTypeE.BMS,
+                                   iface_name= '0x40', mapping_names= {'temp': 7, 'vcell1': 8})
+        ext_meas_type = CyclerDataExtMeasFixedC.from_devices([device])
+        assert ext_meas_type.fields == ('temp_7', 'vcell1_8', 'stale_extra_meter_7')
+        ext_meas, status = ext_meas_type(), CyclerDataAllStatusC()
+        assert not hasattr(ext_meas, '__dict__') and ext_meas.temp_7 is None
+        meter = _MeterC(7)
+        meter.answer.set()
+        poll = MidMeasExtraPollC(meter, deadline= 1000)
+        with ThreadPoolExecutor(max_workers= 1) as pool:
+            poll.start(pool)
+            poll.collect(ext_meas, status)
+        copy = deepcopy(ext_meas)
+        assert type(copy) is ext_meas_type
+        assert dict(copy.items()) == {'temp_7': 1, 'vcell1_8': None, 'stale_extra_meter_7': False}
+
+    def test_close(self) -> None:
+        """The meter is closed once its update has finished, the wait of the close is bounded
+        by the deadline.
+        """
+        with ThreadPoolExecutor(max_workers= 1) as pool:
+            meter = _MeterC(7)
+            poll = MidMeasExtraPollC(meter, deadline= 200)
+            poll.start(pool)
+            Timer(0.05, meter.answer.set).start()
+            poll.close()
+            assert meter.closed.is_set() and not meter.closed_updating
+            meter = _MeterC(8)
+            poll = MidMeasExtraPollC(meter, deadline= 20)
+            poll.start(pool)
+            start = perf_counter()
+            poll.close()
+            assert perf_counter() - start < 1 and not meter.closed.is_set()
+            meter.answer.set()
+            assert meter.closed.wait(1) and not meter.closed_updating
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+"""
+This file test the ring buffer with the samples of mid meas.
+COMMAND: clear && pytest code/cycler/tests/test_mid_meas_ring.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from datetime import datetime
+from threading import Thread
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_mid_meas_ring")
+#######################       THIRD PARTY IMPORTS        #######################
+import numpy as np
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataDeviceC, CyclerDataDeviceTypeE,
+    CyclerDataExtMeasC, CyclerDataExtMeasFixedC, CyclerDataGenMeasC)
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_meas.mid_meas_ring import MidMeasRingC
+#######################          PROJECT IMPORTS         #######################
+
+#######################            FUNCTIONS             #######################
+
+def _ext_meas_type() -> type:
+    device = CyclerDataDeviceC(dev_db_id= 7, device_type= CyclerDataDeviceTypeE.BMS,
+                               iface_name= '0x40', mapping_names= {'temp': 7, 'vcell1': 8})
+    return CyclerDataExtMeasFixedC.from_devices([device])
+
+def _sample(seq: int, ext_meas: CyclerDataExtMeasFixedC) -> CyclerDataGenMeasC:
+    ext_meas.temp_7 = seq * 10
+    return CyclerDataGenMeasC(voltage= seq, current= -seq, power= 2 * seq, seq= seq,
+                              timestamp= datetime.now())
+
+#######################             CLASSES              #######################
+
+class TestMeasRing:
+    '''Test the ring buffer of the samples.'''
+
+    def test_read_since(self) -> None:
+        """The samples after the last one read are returned in order, the overwritten ones are
+        missing and the measures not written are NaN.
+        """
+        ext_meas = _ext_meas_type()()
+        ring = MidMeasRingC(ext_meas, size= 8)
+        assert ring.head == -1 and len(ring.read_since(-1)) == 0
+        for seq in range(5):
+            ring.append(_sample(seq, ext_meas), ext_meas)
+        samples = ring.read_since(2)
+        assert list(samples['seq']) == [3, 4] and list(samples['temp_7']) == [30, 40]
+        assert np.isnan(samples['vcell1_8']).all() and not samples['stale_extra_meter_7'].any()
+        for seq in range(5, 20):
+            ring.append(_sample(seq, ext_meas), ext_meas)
+        assert list(ring.read_since(4)['seq']) == list(range(12, 20))
+        assert len(ring.read_since(19)) == 0
+
+    def test_dynamic_ext_meas(self) -> None:
+        """Without fixed extended measures only the generic ones are kept.
+        """
+        ring = MidMeasRingC(CyclerDataExtMeasC(), size= 4)
+        ring.append(CyclerDataGenMeasC(voltage= None, seq= 0), CyclerDataExtMeasC())
+        samples = ring.read_since(-1)
+        assert samples.dtype.names == ('seq', 'timestamp', 'voltage', 'current', 'power')
+        assert np.isnan(samples['voltage'][0]) and np.isnat(samples['timestamp'][0])
+
+    def test_concurrent_reader(self) -> None:
+        """A reader slower than the writer only gets complete samples, in order.
+        """
+        ext_meas = _ext_meas_type()()
+        ring = MidMeasRingC(ext_meas, size= 16)
+        n_samples = 20000
+        def _writer() -> None:
+            for seq in range(n_samples):
+                ring.append(_sample(seq, ext_meas), ext_meas)
+        writer = Thread(target= _writer)
+        writer.start()
+        last, n_read = -1, 0
+        while writer.is_alive() or last < n_samples - 1:
+            samples = ring.read_since(last)
+            if len(samples) > 0:
+                assert (np.diff(samples['seq']) > 0).all() and samples['seq'][0] > last
+                assert (samples['voltage'] == samples['seq']).all()
+                assert (samples['current'] == -samples['seq']).all()
+                assert (samples['temp_7'] == 10 * samples['seq']).all()
+                last, n_read = int(samples['seq'][-1]), n_read + len(samples)
+        writer.join()
+        assert last == n_samples - 1 and n_read > 0
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+"""
+This file test the compression stage of the generic measures of mid str.
+COMMAND: clear && pytest code/cycler/tests/test_mid_str_compress.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from datetime import datetime, timedelta
+from math import exp
+from typing import Dict, List
+from pytest import mark
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_mid_str_compress")
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_str.mid_str_compress import (MidStrCompressorC,
+                                                                     MidStrCompressModeE)
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+TOLERANCES = {'Voltage': 5, 'Current': 10, 'Power': 5}
+PERIOD = 0.2 # Express in seconds
+
+#######################            FUNCTIONS             #######################
+
+def _profile() -> List[Dict]:
+    """Samples of a charge in CC followed by a CV step and a rest, as read from the EPC.
+    """
+    start = datetime(2024, 1, 1)
+    samples = []
+    for meas_id in range(6000):
+        if meas_id < 3000:
+            instr, mode = 1, 'CC_MODE'
+            voltage, current = 3600 + round(meas_id * 0.1), 2000
+        elif meas_id < 4500:
+            instr, mode = 2, 'CV_MODE'
+            voltage, current = 3900, round(2000 * exp(-(meas_id - 3000) / 500))
+        else:
+            instr, mode = 3, 'WAIT'
+            voltage, current = 3900 - round(40 * (1 - exp(-(meas_id - 4500) / 200))), 0
+        samples.append({'ExpID': 1, 'MeasID': meas_id, 'InstrID': instr, 'PowerMode': mode,
+                        'Timestamp': start + timedelta(seconds= meas_id * PERIOD),
+                        'Voltage': voltage, 'Current': current,
+                        'Power': round(voltage * current / 100000)})
+    return samples
+
+def _rebuild(stored: List[Dict], meas_id: int, column: str, interpolate: bool) -> float:
+    """Value of the column at the given sample rebuilt from the stored samples.
+    """
+    pos = next(i for i, row in enumerate(stored) if row['MeasID'] >= meas_id)
+    res = stored[pos][column]
+    if stored[pos]['MeasID'] > meas_id:
+        prev = stored[pos - 1]
+        res = prev[column]
+        if interpolate:
+            span = (stored[pos]['Timestamp'] - prev['Timestamp']).total_seconds()
+            elapsed = (meas_id - prev['MeasID']) * PERIOD
+            res +=(stored[pos][column] - prev[column]) * elapsed / span
+    return res
+
+#######################             CLASSES              #######################
+
+class TestCompressor:
+    """Test the deadband and swinging door compression of the generic measures.
+    """
+
+    @mark.parametrize("mode", [MidStrCompressModeE.DEADBAND, MidStrCompressModeE.SWINGING_DOOR])
+    def test_compression(self, mode: MidStrCompressModeE) -> None:
+        """Samples are reduced an order of magnitude keeping the error within the tolerances,
+        and the instruction boundaries are stored.
+        """
+        samples = _profile()
+        compressor = MidStrCompressorC(mode= mode, tolerances= TOLERANCES)
+        stored = []
+        for sample in samples:
+            stored.extend(gen_meas for gen_meas, _ in compressor.add(sample))
+        stored.extend(gen_meas for gen_meas, _ in compressor.flush())
+        log.info(f"{mode.name}: {len(samples)} samples, {len(stored)} stored")
+        assert len(stored) * 10 <= len(samples)
+        assert compressor.n_stored == len(stored)
+        stored_ids = [row['MeasID'] for row in stored]
+        assert stored_ids == sorted(stored_ids)
+        for meas_id in (0, 2999, 3000, 4499, 4500, len(samples) - 1):
+            assert meas_id in stored_ids
+        interpolate = mode is MidStrCompressModeE.SWINGING_DOOR
+        for sample in samples:
+            for column, tol in TOLERANCES.items():
+                value = _rebuild(stored, sample['MeasID'], column, interpolate)
+                assert abs(value - sample[column]) <= tol + 1e-6
+
+    def test_disabled(self) -> None:
+        """All the samples and their data are returned when the compression is disabled.
+        """
+        compressor = MidStrCompressorC(mode= 'DISABLED', tolerances= TOLERANCES)
+        samples = _profile()[:100]
+        stored = [compressor.add(sample, [sample['MeasID']]) for sample in samples]
+        assert all(len(res) == 1 and res[0][1] == [res[0][0]['MeasID']] for res in stored)
+        assert compressor.flush() == []
@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+"""
+This file test the facade of mid str against SQLite databases as stand-ins of the master and
+cache databases.
+COMMAND: clear && pytest code/cycler/tests/test_mid_str_facade.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from datetime import datetime
+from threading import Event
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_mid_str_facade")
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import event, insert, select, update
+from system_shared_tool import SysShdSharedObjC
+from wattrex_driver_db import (DrvDbCyclerStationC, DrvDbUsedDeviceC, DrvDbDetectedDeviceC,
+    DrvDbCompatibleDeviceC, DrvDbUsedMeasuresC, DrvDbAvailableMeasuresC, DrvDbLinkConfigurationC,
+    DrvDbMasterExperimentC, DrvDbBatteryC, DrvDbProfileC, DrvDbInstructionC,
+    DrvDbCacheExperimentC, DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC,
+    DrvDbCacheStatusC, DrvDbAlarmC)
+from wattrex_cycler_datatypes.cycler_data import (CyclerDataAllStatusC, CyclerDataExtMeasFixedC,
+    CyclerDataGenMeasC, CyclerDataMergeTagsC, CyclerDataExpStatusE, CyclerDataPwrModeE)
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_dabs import mid_dabs
+from src.wattrex_battery_cycler.mid.mid_meas import MidMeasNodeC
+from src.wattrex_battery_cycler.mid.mid_str import MidStrFacadeC
+from _cycler_sqlite_standin import SqliteEngineC
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+CS_ID = 1
+EXP_ID = 10
+# Measures of each device of the station, name and UsedMeasID
+EPC_MEAS = {'ls_voltage': 1, 'temp_body': 2}
+BMS_MEAS = {'vcell1': 3, 'vcell2': 4, 'temp1': 5}
+
+#######################             CLASSES              #######################
+
+class _DriverStandInC:
+    """Stand-in of the drivers of the EPC and the BMS.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: None
+
+#######################            FUNCTIONS             #######################
+
+def _master_db() -> SqliteEngineC:
+    """Master database with a station of an EPC and a BMS, and a queued experiment.
+    """
+    db = SqliteEngineC(DrvDbCyclerStationC, DrvDbUsedDeviceC, DrvDbDetectedDeviceC,
+                        DrvDbCompatibleDeviceC, DrvDbUsedMeasuresC, DrvDbAvailableMeasuresC,
+                        DrvDbLinkConfigurationC, DrvDbMasterExperimentC, DrvDbBatteryC,
+                        DrvDbProfileC, DrvDbInstructionC)
+    session = db.session
+    session.execute(insert(DrvDbCyclerStationC.__table__), [{'CSID': CS_ID, 'CUID': 1,
+                    'Name': 'test', 'Location': 'lab', 'Deprecated': False}])
+    session.execute(insert(DrvDbCompatibleDeviceC.__table__), [
+        {'CompDevID': 1, 'Name': 'epc', 'Manufacturer': 'wattrex', 'DeviceType': 'Epc'},
+        {'CompDevID': 2, 'Name': 'bms', 'Manufacturer': 'wattrex', 'DeviceType': 'Bms'}])
+    session.execute(insert(DrvDbDetectedDeviceC.__table__), [
+        {'DevID': 1, 'CUID': 1, 'CompDevID': 1, 'SN': '1', 'LinkName': '0x30'},
+        {'DevID': 2, 'CUID': 1, 'CompDevID': 2, 'SN': '2', 'LinkName': '0x40'}])
+    session.execute(insert(DrvDbUsedDeviceC.__table__),
+                    [{'DevID': dev, 'CSID': CS_ID} for dev in (1, 2)])
+    available, used = [], []
+    for dev, meas in ((1, EPC_MEAS), (2, BMS_MEAS)):
+        for name, used_meas_id in meas.items():
+            available.append({'MeasType': used_meas_id, 'CompDevID': dev, 'MeasName': name})
+            used.append({'UsedMeasID': used_meas_id, 'CSID': CS_ID, 'MeasType': used_meas_id,
+                         'DevID': dev})
+    session.execute(insert(DrvDbAvailableMeasuresC.__table__), available)
+    session.execute(insert(DrvDbUsedMeasuresC.__table__), used)
+    session.execute(insert(DrvDbBatteryC.__table__), [{'BatID': 1, 'Name': 'bat',
+                    'Model': 'model', 'VoltMax': 4200, 'VoltMin': 2800, 'CurrMax': 1000,
+                    'CurrMin': -1000}])
+    session.execute(insert(DrvDbProfileC.__table__), [{'ProfID': 1, 'Name': 'profile',
+                    'VoltMax': 4200, 'VoltMin': 2800, 'CurrMax': 1000, 'CurrMin': -1000}])
+    session.execute(insert(DrvDbInstructionC.__table__), [
+        {'InstrID': 1, 'ProfID': 1, 'Mode': 'CC_MODE', 'SetPoint': 500, 'LimitType': 'VOLTAGE',
+         'LimitPoint': 4100},
+        {'InstrID': 2, 'ProfID': 1, 'Mode': 'WAIT', 'SetPoint': 0, 'LimitType': 'TIME',
+         'LimitPoint': 60000}])
+    session.execute(insert(DrvDbMasterExperimentC.__table__), [{'ExpID': EXP_ID, 'CSID': CS_ID,
+                    'BatID': 1, 'ProfID': 1, 'Name': 'exp', 'Description': 'test',
+                    'DateCreation': datetime(2024, 1, 1), 'Status': 'QUEUED'}])
+    session.commit()
+    return db
+
+def _cache_db() -> SqliteEngineC:
+    return SqliteEngineC(DrvDbCacheExperimentC, DrvDbCacheGenericMeasureC,
+                          DrvDbCacheExtendedMeasureC, DrvDbCacheStatusC, DrvDbAlarmC)
+
+#######################             TESTS                #######################
+
+class TestStationPlan:
+    '''Test the plan of the extended measures of the station.'''
+
+    def test_plan_after_meas_node(self, tmp_path, monkeypatch) -> None:
+        """The meas node built with the station read by GET_CS does not remove the extra meters
+        from the plan of the experiments started later.
+        """
+        monkeypatch.chdir(tmp_path)
+        for driver in ('DrvEpcDeviceC', 'DrvBmsDeviceC'):
+            monkeypatch.setattr(mid_dabs, driver, _DriverStandInC)
+        facade = MidStrFacadeC(cycler_station_id= CS_ID, master_db= _master_db(),
+                               cache_db= _cache_db())
+        station = facade.get_cycler_station_info()
+        ext_meas = CyclerDataExtMeasFixedC.from_devices(station.devices)()
+        MidMeasNodeC(shared_gen_meas= SysShdSharedObjC(CyclerDataGenMeasC()),
+                     shared_ext_meas= SysShdSharedObjC(ext_meas),
+                     shared_status= SysShdSharedObjC(CyclerDataAllStatusC()),
+                     working_flag= Event(), devices= station.devices,
+                     excl_tags= CyclerDataMergeTagsC([], [], []))
+        assert [dev.dev_db_id for dev in station.devices] == [1, 2]
+        exp, _, _ = facade.get_start_queued_exp()
+        assert exp.exp_id == EXP_ID
+        facade.commit_changes()
+        facade.start_exp_spool(EXP_ID)
+        ext_meas.update_values((name, 1) for name in ext_meas.meas_fields)
+        facade.ext_meas = ext_meas
+        facade.write_extended_measures(EXP_ID)
+        assert facade.pending_rows == len(EPC_MEAS) + len(BMS_MEAS)
+        facade.close_exp_spool(EXP_ID)
+
+    def test_cs_devices_copy(self) -> None:
+        """The devices given to the flush lane are not affected by changes in the station sent
+        to the manager.
+        """
+        facade = MidStrFacadeC(cycler_station_id= CS_ID, master_db= _master_db(),
+                               cache_db= _cache_db())
+        station = facade.get_cycler_station_info()
+        station.devices.pop()
+        assert [dev.dev_db_id for dev in facade.cs_devices] == [1, 2]
+
+class TestExpStatus:
+    '''Test the final status of the experiments.'''
+
+    def test_status_after_rows(self, tmp_path, monkeypatch) -> None:
+        """The final status of the experiment is only set in the cache db when its last rows
+        are committed.
+        """
+        monkeypatch.chdir(tmp_path)
+        cache_db = _cache_db()
+        facade = MidStrFacadeC(cycler_station_id= CS_ID, master_db= _master_db(),
+                               cache_db= cache_db)
+        station = facade.get_cycler_station_info()
+        facade.get_start_queued_exp()
+        facade.commit_changes()
+        facade.start_exp_spool(EXP_ID)
+        ext_meas = CyclerDataExtMeasFixedC.from_devices(station.devices)()
+        ext_meas.update_values((name, 1) for name in ext_meas.meas_fields)
+        facade.ext_meas = ext_meas
+        facade.write_extended_measures(EXP_ID)
+        facade.close_exp_spool(EXP_ID, CyclerDataExpStatusE.FINISHED)
+        def _status() -> str:
+            return cache_db.session.execute(select(DrvDbCacheExperimentC.Status)).scalar_one()
+        def _n_rows() -> int:
+            return len(cache_db.session.execute(select(DrvDbCacheExtendedMeasureC)).all())
+        assert _status() == 'RUNNING' and _n_rows() == 0
+        facade.commit_changes(force_flush= True)
+        assert _status() == 'FINISHED' and _n_rows() == len(EPC_MEAS) + len(BMS_MEAS)
+        assert not facade.has_pending_rows
+
+class TestProfileCache:
+    '''Test the cache of the profiles read from the master db.'''
+
+    def test_instruction_changed(self) -> None:
+        """A profile not changed is read from the cache without reading its instructions, and
+        read again when the mode of an instruction changes or two set points are swapped, even
+        if its number of instructions and their sums are the same.
+        """
+        master_db = _master_db()
+        master_db.session.execute(insert(DrvDbMasterExperimentC.__table__), [{'ExpID': exp_id,
+            'CSID': CS_ID, 'BatID': 1, 'ProfID': 1, 'Name': f'exp{exp_id}', 'Description': 'test',
+            'DateCreation': datetime(2024, 1, 2), 'Status': 'QUEUED'}
+            for exp_id in range(EXP_ID + 1, EXP_ID + 4)])
+        master_db.session.commit()
+        facade = MidStrFacadeC(cycler_station_id= CS_ID, master_db= master_db,
+                               cache_db= _cache_db())
+        facade.get_cycler_station_info()
+        statements = []
+        @event.listens_for(master_db.engine, 'before_cursor_execute')
+        def _record(conn, cursor, statement, *args): #pylint: disable= unused-argument
+            statements.append(statement)
+        def _next_profile() -> list:
+            statements.clear()
+            _, _, profile = facade.get_start_queued_exp()
+            facade.commit_changes()
+            return [(instr.mode, instr.ref) for instr in profile.instructions]
+        instr_table = DrvDbInstructionC.__table__.name
+        def _instr_reads() -> int:
+            return sum(1 for stmt in statements if instr_table in stmt)
+        assert _next_profile() == [(CyclerDataPwrModeE.CC_MODE, 500),
+                                   (CyclerDataPwrModeE.WAIT, 0)]
+        assert _instr_reads() == 2
+        # Only the signature, a single row, is read on a hit
+        assert _next_profile() == [(CyclerDataPwrModeE.CC_MODE, 500),
+                                   (CyclerDataPwrModeE.WAIT, 0)]
+        assert _instr_reads() == 1
+        master_db.session.execute(update(DrvDbInstructionC).where(DrvDbInstructionC.InstrID == 1)
+                                  .values(Mode= 'CV_MODE'))
+        master_db.session.commit()
+        assert _next_profile()[0][0] == CyclerDataPwrModeE.CV_MODE
+        for instr_id, set_point in ((1, 0), (2, 500)):
+            master_db.session.execute(update(DrvDbInstructionC).
+                where(DrvDbInstructionC.InstrID == instr_id).values(SetPoint= set_point))
+        master_db.session.commit()
+        assert _next_profile() == [(CyclerDataPwrModeE.CV_MODE, 0), (CyclerDataPwrModeE.WAIT, 500)]
+
+class TestClaimExp:
+    '''Test the claim of the queued experiments.'''
+
+    def test_cache_commit_fails(self, monkeypatch) -> None:
+        """If the running experiment can not be committed in the cache db, it is returned to
+        the queue of the master db and claimed again later.
+        """
+        master_db, cache_db = _master_db(), _cache_db()
+        facade = MidStrFacadeC(cycler_station_id= CS_ID, master_db= master_db,
+                               cache_db= cache_db)
+        facade.get_cycler_station_info()
+        def _fail(raise_exception: bool = False) -> None: # pylint: disable=W0613
+            raise ConnectionError("cache db not available")
+        monkeypatch.setattr(cache_db, 'commit_changes', _fail)
+        assert facade.get_start_queued_exp() == (None, None, None)
+        def _master_status() -> tuple:
+            return master_db.session.execute(select(DrvDbMasterExperimentC.Status,
+                                                    DrvDbMasterExperimentC.DateBegin)).one()
+        assert tuple(_master_status()) == ('QUEUED', None)
+        monkeypatch.undo()
+        exp, _, _ = facade.get_start_queued_exp()
+        assert exp.exp_id == EXP_ID and _master_status()[0] == 'RUNNING'
+        assert cache_db.session.execute(select(DrvDbCacheExperimentC.Status)).scalar_one() \
+            == 'RUNNING'
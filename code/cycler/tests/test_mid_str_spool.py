@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+"""
+This file test the spool files of mid str and the bulk writer that stores their rows in a SQLite
+database as stand-in of the cache database.
+COMMAND: clear && pytest code/cycler/tests/test_mid_str_spool.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from datetime import datetime
+import struct
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+
+main_logger = SysLogLoggerC(file_log_levels="config/cycler/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_mid_str_spool")
+#######################       THIRD PARTY IMPORTS        #######################
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from wattrex_driver_db import DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/cycler/')
+from src.wattrex_battery_cycler.mid.mid_str.mid_str_spool import MidStrSpoolC, MidStrSpoolErrorC
+from src.wattrex_battery_cycler.mid.mid_str.mid_str_writer import (MidStrBulkWriterC,
+                                                                   _insert_ignore)
+from _cycler_sqlite_standin import SqliteEngineC
+#######################          PROJECT IMPORTS         #######################
+
+######################             CONSTANTS              ######################
+EXP_ID = 3
+_COLUMNS = ('ExpID', 'MeasID', 'InstrID', 'PowerMode', 'Timestamp', 'Voltage', 'Current',
+            'Power')
+# Size of the header of the spool file, see mid_str_spool
+_HEADER_SIZE = struct.calcsize('<4sHIQ')
+
+#######################            FUNCTIONS             #######################
+
+def _cache_session() -> Session:
+    """Session of a SQLite database in memory with the measures tables of the cache database.
+    """
+    return SqliteEngineC(DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC,
+                         not_null= True).session
+
+def _gen_meas(meas_id: int, voltage: int|None = 3700) -> dict:
+    return {'ExpID': EXP_ID, 'MeasID': meas_id, 'InstrID': 1, 'PowerMode': 'CC_MODE',
+            'Timestamp': datetime(2024, 1, 1, 0, 0, meas_id), 'Voltage': voltage,
+            'Current': 500, 'Power': 1850}
+
+def _gen_rows(session: Session) -> list:
+    return session.execute(select(DrvDbCacheGenericMeasureC.MeasID,
+                                  DrvDbCacheGenericMeasureC.Timestamp)).all()
+
+#######################             TESTS                #######################
+
+class TestSpool:
+    '''Test the spool files.'''
+
+    def test_append_read_ack(self, tmp_path) -> None:
+        """Records are read in order until acknowledged, and the file is rewound once all of
+        them are acknowledged.
+        """
+        spool = MidStrSpoolC(str(tmp_path / 'exp.spool'), size= 64)
+        assert not spool.has_pending
+        for meas_id in range(4):
+            spool.append(0, _COLUMNS, [tuple(_gen_meas(meas_id).values())])
+        records, offset = spool.read_pending(3)
+        assert [rows[0][1] for _, _, rows in records] == [0, 1, 2]
+        assert records[0][0] == 0 and records[0][1] == list(_COLUMNS)
+        assert records[0][2][0][4] == '2024-01-01T00:00:00'
+        # Not acknowledged records are read again
+        assert spool.read_pending(3)[1] == offset
+        spool.ack(offset)
+        records, offset = spool.read_pending(3)
+        assert [rows[0][1] for _, _, rows in records] == [3]
+        spool.ack(offset)
+        assert not spool.has_pending and spool.pending_bytes == 0
+        # Records of the previous epoch are not read after the rewind
+        spool.append(1, ('MeasID',), [(9,)])
+        records, offset = spool.read_pending(10)
+        assert records == [(1, ['MeasID'], [[9]])]
+        spool.delete()
+        assert not os.path.exists(tmp_path / 'exp.spool')
+
+    def test_reopen_pending(self, tmp_path) -> None:
+        """The records not acknowledged when the file is closed are read after reopening it.
+        """
+        file_path = str(tmp_path / 'exp.spool')
+        spool = MidStrSpoolC(file_path)
+        for meas_id in range(3):
+            spool.append(0, _COLUMNS, [tuple(_gen_meas(meas_id).values())])
+        spool.ack(spool.read_pending(1)[1])
+        pending = spool.pending_bytes
+        spool.close()
+        spool = MidStrSpoolC(file_path)
+        assert spool.pending_bytes == pending
+        records, _ = spool.read_pending(10)
+        assert [rows[0][1] for _, _, rows in records] == [1, 2]
+        spool.close()
+
+    def test_torn_record(self, tmp_path) -> None:
+        """A record whose length was not written before a crash is not read, nor the ones
+        after it.
+        """
+        file_path = str(tmp_path / 'exp.spool')
+        spool = MidStrSpoolC(file_path)
+        spool.append(0, ('MeasID',), [(0,)])
+        # Length of the second record
+        torn = _HEADER_SIZE + spool.pending_bytes
+        spool.append(0, ('MeasID',), [(1,)])
+        spool.append(0, ('MeasID',), [(2,)])
+        spool.close()
+        with open(file_path, 'r+b') as file:
+            file.seek(torn)
+            file.write(struct.pack('<I', 0))
+        spool = MidStrSpoolC(file_path)
+        records, offset = spool.read_pending(10)
+        assert records == [(0, ['MeasID'], [[0]])]
+        spool.ack(offset)
+        assert not spool.has_pending
+        spool.close()
+
+    def test_invalid_file(self, tmp_path) -> None:
+        """A file that is not a spool is not used.
+        """
+        file_path = tmp_path / 'exp.spool'
+        file_path.write_bytes(b'not a spool file at all')
+        with pytest.raises(MidStrSpoolErrorC):
+            MidStrSpoolC(str(file_path))
+
+class TestBulkWriter:
+    '''Test the bulk writer of the cache database.'''
+
+    def test_flush_ack(self, tmp_path) -> None:
+        """Rows are inserted when flushed, and removed from the spool after the ack. Rows
+        flushed again after a failure are skipped.
+        """
+        session = _cache_session()
+        writer = MidStrBulkWriterC(flush_size= 2, flush_latency= 60000,
+                                   spool_path= str(tmp_path))
+        writer.start_spool(EXP_ID)
+        writer.add_gen_meas(_gen_meas(0))
+        assert not writer.flush_due()
+        writer.add_gen_meas(_gen_meas(1))
+        assert writer.flush_due() and writer.n_samples == 2
+        assert writer.flush(session) == 2
+        session.commit()
+        # The ack was lost, so the same rows are flushed again
+        assert writer.flush(session) == 2
+        session.commit()
+        writer.ack()
+        assert not writer.has_pending and writer.n_samples == 0
+        assert _gen_rows(session) == [(0, datetime(2024, 1, 1, 0, 0, 0)),
+                                      (1, datetime(2024, 1, 1, 0, 0, 1))]
+        writer.close_spool()
+        writer.close()
+
+    def test_errors_raised(self, tmp_path) -> None:
+        """Errors other than duplicated rows are raised, and the rows are kept in the spool.
+        """
+        session = _cache_session()
+        writer = MidStrBulkWriterC(spool_path= str(tmp_path))
+        writer.start_spool(EXP_ID)
+        writer.add_gen_meas(_gen_meas(0, voltage= None))
+        with pytest.raises(IntegrityError):
+            writer.flush(session)
+        session.rollback()
+        assert writer.has_pending
+        writer.close()
+
+    def test_recover(self, tmp_path) -> None:
+        """Rows left in the spool of a previous execution are stored, and the spool removed.
+        """
+        writer = MidStrBulkWriterC(spool_path= str(tmp_path))
+        writer.start_spool(EXP_ID)
+        writer.add_gen_meas(_gen_meas(0))
+        writer.close()
+        session = _cache_session()
+        writer = MidStrBulkWriterC(spool_path= str(tmp_path))
+        writer.recover()
+        assert writer.has_pending and writer.flush_due()
+        assert writer.flush(session) == 1
+        session.commit()
+        writer.ack()
+        assert not writer.has_pending and len(_gen_rows(session)) == 1
+        assert not os.listdir(tmp_path)
+
+    def test_mysql_statement(self) -> None:
+        """Duplicated rows are skipped in MySQL with a no-op update of the key, not ignoring
+        all the errors.
+        """
+        table = DrvDbCacheGenericMeasureC.__table__
+        stmt = str(_insert_ignore(table, 'mysql').compile(dialect= mysql.dialect()))
+        assert 'IGNORE' not in stmt
+        key = table.primary_key.columns.values()[0].name
+        assert f"ON DUPLICATE KEY UPDATE {key} = {table.name}.{key}" in stmt.replace('`', '')
@@ -11,7 +11,7 @@ from .cycler_data_experiment import (CyclerDataPwrLimitE, CyclerDataPwrModeE, Cy
                 CyclerDataAlarmC, CyclerDataPwrRangeC, CyclerDataExperimentC, CyclerDataExpStatusE,
                 CyclerDataInstructionC)
 from .cycler_data_common import (CyclerDataAllStatusC, CyclerDataExtMeasC, CyclerDataGenMeasC,
-                                CyclerDataMergeTagsC)
+                                CyclerDataMergeTagsC, CyclerDataExtMeasFixedC)
 from .cycler_data_battery import CyclerDataBatteryC, CyclerDataLithiumBatC, CyclerDataRedoxBatC
 
 __all__ = [
@@ -20,5 +20,6 @@ __all__ = [
     'CyclerDataPwrRangeC', 'CyclerDataAlarmC', 'CyclerDataExperimentC', 'CyclerDataExpStatusE',
     'CyclerDataInstructionC', 'CyclerDataCyclerStationC', 'CyclerDataProfileC',
     'CyclerDataAllStatusC', 'CyclerDataExtMeasC', 'CyclerDataGenMeasC', 'CyclerDataBatteryC',
-    'CyclerDataLithiumBatC', 'CyclerDataRedoxBatC', 'CyclerDataMergeTagsC'
+    'CyclerDataLithiumBatC', 'CyclerDataRedoxBatC', 'CyclerDataMergeTagsC',
+    'CyclerDataExtMeasFixedC'
 ]
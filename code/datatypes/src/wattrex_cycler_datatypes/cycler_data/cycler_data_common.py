@@ -5,7 +5,8 @@ Definition of MID DATA devices used on battery cycler.
 #######################        MANDATORY IMPORTS         #######################
 from __future__ import annotations
 #######################         GENERIC IMPORTS          #######################
-from typing import List
+from datetime import datetime
+from typing import Iterable, List, Tuple
 #######################       THIRD PARTY IMPORTS        #######################
 
 #######################      SYSTEM ABSTRACTION IMPORTS  #######################
@@ -17,7 +18,7 @@ log = sys_log_logger_get_module_logger(__name__)
 
 #######################          MODULE IMPORTS          #######################
 from .cycler_data_experiment import CyclerDataPwrModeE
-from .cycler_data_device import CyclerDataDeviceStatusC
+from .cycler_data_device import CyclerDataDeviceC, CyclerDataDeviceStatusC
 #######################              ENUMS               #######################
 
 #######################             CLASSES              #######################
@@ -40,8 +41,9 @@ class CyclerDataGenMeasC:
     Class used to store generic power measures.
     '''
 
-    def __init__(self, voltage: int= 0,
-                 current: int= 0, power: int= 0, instr_id: int|None = None) -> None:
+    def __init__(self, voltage: int= 0, #pylint: disable= too-many-arguments
+                 current: int= 0, power: int= 0, instr_id: int|None = None, seq: int = -1,
+                 timestamp: datetime|None = None) -> None:
         '''
         Initialize the instance with the given measures.
 
@@ -49,12 +51,17 @@ class CyclerDataGenMeasC:
             voltage (int): measured voltage in the battery
             current (int): instant current in the battery
             power (int): active power applied to the battery in a given instant
+            instr_id (int|None): instruction running when the measures has been taken
+            seq (int): sequence number of the sample, increased on each acquisition.
+                -1 if no sample has been acquired yet
             timestamp (datetime): instante when the measures has been taken
         '''
         self.voltage : int = voltage
         self.current : int = current
         self.power : int = power
         self.instr_id : int|None = instr_id
+        self.seq : int = seq
+        self.timestamp : datetime|None = timestamp
 
 class CyclerDataExtMeasC:
     '''
@@ -66,6 +73,113 @@ class CyclerDataExtMeasC:
         Initialize the with the specified extended measures.
         '''
 
+    @staticmethod
+    def stale_attr(dev_db_id: int) -> str:
+        '''
+        Name of the flag set to True while the measures of an extra meter are stale, because
+        the device has not answered in time.
+
+        Args:
+            dev_db_id (int): id of the device in the database
+        Returns:
+            str: name of the attribute
+        '''
+        return f"stale_extra_meter_{dev_db_id}"
+
+    def items(self) -> Iterable[Tuple[str, object]]:
+        '''
+        Pairs of name and value of the measures written.
+
+        Returns:
+            Iterable[Tuple[str, object]]: name and value of each measure
+        '''
+        return vars(self).items()
+
+    def update_values(self, values: Iterable[Tuple[str, object]]) -> None:
+        '''
+        Write the given measures.
+
+        Args:
+            values (Iterable[Tuple[str, object]]): name and value of each measure
+        '''
+        vars(self).update(values)
+
+class CyclerDataExtMeasFixedC:
+    '''
+    Extended measures whose names are fixed at startup from the devices of the cycler station,
+    stored in slots instead of a dictionary. The type is built with from_devices, and the
+    measures not written yet are None.
+    '''
+    __slots__ = ()
+    ## Names of the measures, of the stale flags of the devices, and of both
+    meas_fields: Tuple[str, ...] = ()
+    stale_fields: Tuple[str, ...] = ()
+    fields: Tuple[str, ...] = ()
+    stale_attr = staticmethod(CyclerDataExtMeasC.stale_attr)
+
+    def __init__(self) -> None:
+        '''
+        Initialize all the measures to None.
+        '''
+        for name in self.fields:
+            setattr(self, name, None)
+
+    @classmethod
+    def from_devices(cls, devices: List[CyclerDataDeviceC]) -> type:
+        '''
+        Build the type of the extended measures of a cycler station, with a slot for each
+        measure of the mapping of its devices and for the stale flag of each device.
+
+        Args:
+            devices (List[CyclerDataDeviceC]): devices of the cycler station
+        Returns:
+            type: subclass of CyclerDataExtMeasFixedC
+        '''
+        meas_names, stale_names = [], []
+        for device in devices:
+            if device.mapping_names is not None:
+                meas_names.extend(f"{name}_{used_meas_id}"
+                                  for name, used_meas_id in device.mapping_names.items())
+            stale_names.append(cls.stale_attr(device.dev_db_id))
+        meas_fields = tuple(dict.fromkeys(meas_names))
+        stale_fields = tuple(dict.fromkeys(stale_names))
+        fields = meas_fields + stale_fields
+        return type(cls.__name__, (cls,), {'__slots__': fields, 'fields': fields,
+                                           'meas_fields': meas_fields,
+                                           'stale_fields': stale_fields})
+
+    def items(self) -> Iterable[Tuple[str, object]]:
+        '''
+        Pairs of name and value of the measures, None if not written yet.
+
+        Returns:
+            Iterable[Tuple[str, object]]: name and value of each measure
+        '''
+        return zip(self.fields, (getattr(self, name) for name in self.fields))
+
+    def update_values(self, values: Iterable[Tuple[str, object]]) -> None:
+        '''
+        Write the given measures.
+
+        Args:
+            values (Iterable[Tuple[str, object]]): name and value of each measure
+
+        Raises:
+            AttributeError: the name is not a measure of the cycler station
+        '''
+        for name, value in values:
+            setattr(self, name, value)
+
+    def __copy__(self) -> CyclerDataExtMeasFixedC:
+        new = object.__new__(type(self))
+        for name in self.fields:
+            setattr(new, name, getattr(self, name))
+        return new
+
+    def __deepcopy__(self, memo: dict) -> CyclerDataExtMeasFixedC:
+        # The measures are numbers and flags, so they can be shared between the copies
+        return self.__copy__()
+
 class CyclerDataMergeTagsC:
     """Class to describe which attributes should be included or excluded when mergin shared objects.
     """
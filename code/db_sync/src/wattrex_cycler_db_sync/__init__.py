@@ -1,6 +1,13 @@
 "Imports of the db sync module."
 
+from .db_sync_chunks import (DB_SYNC_EXT_CHUNKS, DbSyncExtStorageE, db_sync_encode_chunk,
+                             db_sync_decode_chunk, db_sync_read_ext_chunks)
 from .db_sync_fachade import DbSyncFachadeC
 from .db_sync_node import DbSyncNodeC
+from .db_sync_status import (DbSyncStatusIntervalC, db_sync_status_timeline,
+                             db_sync_read_status_timeline, db_sync_status_at)
 
-__all__ = ['DbSyncFachadeC', 'DbSyncNodeC']
+__all__ = ['DbSyncFachadeC', 'DbSyncNodeC', 'DbSyncStatusIntervalC', 'db_sync_status_timeline',
+           'db_sync_read_status_timeline', 'db_sync_status_at', 'DB_SYNC_EXT_CHUNKS',
+           'DbSyncExtStorageE', 'db_sync_encode_chunk', 'db_sync_decode_chunk',
+           'db_sync_read_ext_chunks']
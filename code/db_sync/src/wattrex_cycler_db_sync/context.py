@@ -27,8 +27,29 @@ DEFAULT_CRED_FILEPATH : str = 'config/.cred.yaml' # Max number of allowed messag
 DEFAULT_SYNC_NODE_NAME: str = 'SYNC'
 DEFAULT_COMP_UNIT: int = 1
 DEFAULT_NODE_PERIOD: int = 200 # ms # Period of the node
+DEFAULT_SYNC_BATCH_SIZE: int = 1000 # Max generic measures of each experiment pushed per cycle
+DEFAULT_STATE_PATH: str = './sync_state/db_sync_state.json' # File where the watermarks are stored
+DEFAULT_COPY_CHUNK: int = 500 # Rows sent to master in each insert statement
+DEFAULT_SYNC_WORKERS: int = 1 # Workers syncing the experiments in parallel
+DEFAULT_MAX_MASTER_CONN: int = 4 # Max workers using a master connection at the same time
+DEFAULT_METRICS_LOG_PERIOD: int = 60000 # Period to log the sync metrics, express in ms
+DEFAULT_MIN_NODE_PERIOD: int = 50 # ms # Period of the node while there is backlog
+DEFAULT_MAX_NODE_PERIOD: int = 5000 # ms # Period of the node while there is nothing to sync
+DEFAULT_MIN_SYNC_BATCH: int = 200 # Min batch size, used while master is slow
+DEFAULT_MAX_SYNC_BATCH: int = 20000 # Max batch size, used while there is backlog
+DEFAULT_MAX_COMMIT_LATENCY: int = 2000 # ms # Master commit time above which the sync backs off
+DEFAULT_EXT_STORAGE: str = 'ROWS' # Format of the ext meas in master, ROWS or CHUNKS
+DEFAULT_EXT_CHUNK_SIZE: int = 1000 # Generic samples of each chunk of ext meas
+DEFAULT_LAG_PERIOD: int = 5000 # ms # Period to measure the rows pending in cache
+DEFAULT_METRICS_PORT: int = 0 # Local port where the metrics are served, 0 to disable it
+DEFAULT_READ_BATCH: int = 5000 # Max experiments, status or alarms read from cache at once
 
 CONSTANTS_NAMES = ('DEFAULT_CRED_FILEPATH','DEFAULT_SYNC_NODE_NAME', 'DEFAULT_COMP_UNIT',
-                   'DEFAULT_NODE_PERIOD')
+                   'DEFAULT_NODE_PERIOD', 'DEFAULT_SYNC_BATCH_SIZE', 'DEFAULT_STATE_PATH',
+                   'DEFAULT_COPY_CHUNK', 'DEFAULT_SYNC_WORKERS', 'DEFAULT_MAX_MASTER_CONN',
+                   'DEFAULT_METRICS_LOG_PERIOD', 'DEFAULT_MIN_NODE_PERIOD',
+                   'DEFAULT_MAX_NODE_PERIOD', 'DEFAULT_MIN_SYNC_BATCH', 'DEFAULT_MAX_SYNC_BATCH',
+                   'DEFAULT_MAX_COMMIT_LATENCY', 'DEFAULT_EXT_STORAGE', 'DEFAULT_EXT_CHUNK_SIZE',
+                   'DEFAULT_LAG_PERIOD', 'DEFAULT_METRICS_PORT', 'DEFAULT_READ_BATCH')
 sys_conf_update_config_params(context=globals(),
                               constants_names=CONSTANTS_NAMES)
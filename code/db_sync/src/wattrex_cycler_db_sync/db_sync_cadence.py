@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+'''
+Controller of the period of the sync node and the batch size of the workers, adapted to the
+rows pending in cache and the latency of the master commits.
+'''
+
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from enum import Enum
+from typing import Dict
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+#######################          MODULE IMPORTS          #######################
+from .context import (DEFAULT_NODE_PERIOD, DEFAULT_SYNC_BATCH_SIZE, DEFAULT_MIN_NODE_PERIOD,
+                      DEFAULT_MAX_NODE_PERIOD, DEFAULT_MIN_SYNC_BATCH, DEFAULT_MAX_SYNC_BATCH,
+                      DEFAULT_MAX_COMMIT_LATENCY)
+
+#######################              ENUMS               #######################
+class DbSyncCadenceE(Enum):
+    '''Decision taken by the cadence controller after a cycle.
+    '''
+    # Master commits are too slow, smaller batches less often
+    BACKOFF = 'BACKOFF'
+    # Some experiment has more rows than a batch, bigger batches more often
+    BACKLOG = 'BACKLOG'
+    # Nothing was pushed, the period grows up to the max
+    IDLE = 'IDLE'
+    # Rows pushed without backlog, the period goes back to the initial one
+    STEADY = 'STEADY'
+
+#######################              CLASSES             #######################
+class DbSyncCadenceC(): #pylint: disable= too-many-instance-attributes
+    '''Adapt the period and batch size of the sync after each cycle, within the configured
+    bounds. Both are doubled or halved, so they reach the bounds in a few cycles.
+    Setting the min and max of a value to the same number disables its adaptation.
+    '''
+    def __init__(self, period: int = DEFAULT_NODE_PERIOD, #pylint: disable= too-many-arguments
+                 batch_size: int = DEFAULT_SYNC_BATCH_SIZE,
+                 period_bounds: tuple = (DEFAULT_MIN_NODE_PERIOD, DEFAULT_MAX_NODE_PERIOD),
+                 batch_bounds: tuple = (DEFAULT_MIN_SYNC_BATCH, DEFAULT_MAX_SYNC_BATCH),
+                 max_commit_latency: int = DEFAULT_MAX_COMMIT_LATENCY) -> None:
+        '''Initialize the controller.
+        Args:
+            - period (int): Initial period of the node, express in milliseconds.
+            - batch_size (int): Initial max generic measures of each experiment per cycle.
+            - period_bounds (tuple): Min and max period, express in milliseconds.
+            - batch_bounds (tuple): Min and max batch size.
+            - max_commit_latency (int): Commit latency of master above which the sync backs
+              off, express in milliseconds.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        self.min_period, self.max_period = period_bounds
+        self.min_batch, self.max_batch = batch_bounds
+        self.max_commit_latency: int = max_commit_latency
+        self.period: int = min(max(period, self.min_period), self.max_period)
+        self.base_period: int = self.period
+        self.batch_size: int = min(max(batch_size, self.min_batch), self.max_batch)
+        self.decision: DbSyncCadenceE = DbSyncCadenceE.STEADY
+        ## Number of cycles of each decision
+        self.decisions: Dict[DbSyncCadenceE, int] = {decision: 0 for decision in DbSyncCadenceE}
+
+    def __str__(self) -> str:
+        counts = ', '.join(f"{decision.value.lower()} {count}"
+                           for decision, count in self.decisions.items())
+        return (f"Sync cadence: {self.decision.value}, period {self.period} ms, "
+                f"batch size {self.batch_size}, cycles {counts}")
+
+    def to_dict(self) -> Dict:
+        '''Decisions of the controller as a dictionary serializable to json.
+        '''
+        return {'decision': self.decision.value, 'period_ms': self.period,
+                'batch_size': self.batch_size,
+                'decisions': {decision.value: count for decision, count in self.decisions.items()}}
+
+    def update(self, backlog: bool, rows: int, commit_latency: float) -> DbSyncCadenceE:
+        '''Adapt the period and batch size to the result of the last cycle.
+        Args:
+            - backlog (bool): True if some experiment had more rows pending than a batch.
+            - rows (int): Rows pushed to master in the cycle.
+            - commit_latency (float): Slowest master commit of the cycle, express in ms.
+        Returns:
+            - (DbSyncCadenceE): Decision taken.
+        Raises:
+            - None
+        '''
+        if commit_latency > self.max_commit_latency:
+            decision = DbSyncCadenceE.BACKOFF
+            self.batch_size = max(self.batch_size // 2, self.min_batch)
+            self.period = min(self.period * 2, self.max_period)
+        elif backlog:
+            decision = DbSyncCadenceE.BACKLOG
+            self.batch_size = min(self.batch_size * 2, self.max_batch)
+            self.period = max(self.period // 2, self.min_period)
+        elif rows == 0:
+            decision = DbSyncCadenceE.IDLE
+            self.period = min(self.period * 2, self.max_period)
+        else:
+            decision = DbSyncCadenceE.STEADY
+            if self.period > self.base_period:
+                self.period = max(self.period // 2, self.base_period)
+        self.decisions[decision] += 1
+        if decision is not self.decision:
+            log.info(f"Sync cadence changed from {self.decision.value} to {decision.value}: "
+                     f"period {self.period} ms, batch size {self.batch_size}")
+        self.decision = decision
+        return decision
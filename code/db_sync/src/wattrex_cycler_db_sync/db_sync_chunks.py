@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+'''
+Columnar storage of the extended measures in master. Instead of a row per sample and measure,
+each row stores the samples of a measure of an experiment in a chunk of consecutive generic
+samples, as two compressed columns with the ids of the samples and their values.
+'''
+
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+import zlib
+from array import array
+from bisect import bisect_right
+from enum import Enum
+from typing import Dict, Iterable, List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import Column, Integer, LargeBinary, MetaData, Table, select
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from sqlalchemy.orm import Session
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+#######################          MODULE IMPORTS          #######################
+
+#######################              ENUMS               #######################
+class DbSyncExtStorageE(Enum):
+    '''Format of the extended measures in master.
+    '''
+    # A row per sample and measure, ExtendedMeasures table
+    ROWS = 'ROWS'
+    # A row per chunk of samples and measure, ExtendedMeasuresChunks table
+    CHUNKS = 'CHUNKS'
+
+######################             CONSTANTS              ######################
+DB_SYNC_EXT_CHUNKS = Table('ExtendedMeasuresChunks', MetaData(),
+    Column('ExpID', Integer, primary_key= True, autoincrement= False),
+    Column('UsedMeasID', Integer, primary_key= True, autoincrement= False),
+    Column('FirstMeasID', Integer, primary_key= True, autoincrement= False),
+    Column('LastMeasID', Integer, nullable= False),
+    Column('NSamples', Integer, nullable= False),
+    Column('MeasIDs', LargeBinary().with_variant(MEDIUMBLOB(), 'mysql'), nullable= False),
+    Column('Values', LargeBinary().with_variant(MEDIUMBLOB(), 'mysql'), nullable= False))
+
+#######################            FUNCTIONS             #######################
+def db_sync_encode_chunk(values: Iterable[int]) -> bytes:
+    '''Encode a column of integers as the zlib compressed varints of the zigzag encoded
+    differences between consecutive values, so slow changing values take a few bits each.
+
+    Args:
+        values (Iterable[int]): Values of the column.
+    Returns:
+        bytes: Encoded column.
+    '''
+    res = bytearray()
+    prev = 0
+    for value in values:
+        delta = value - prev
+        prev = value
+        delta = delta << 1 if delta >= 0 else ((-delta) << 1) - 1
+        while delta >= 0x80:
+            res.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        res.append(delta)
+    return zlib.compress(bytes(res))
+
+def db_sync_decode_chunk(data: bytes) -> array:
+    '''Decode a column encoded with db_sync_encode_chunk.
+
+    Args:
+        data (bytes): Encoded column.
+    Returns:
+        array: Values of the column, as an array of signed 64 bits integers.
+    '''
+    res = array('q')
+    prev = 0
+    delta = 0
+    shift = 0
+    for byte in zlib.decompress(data):
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            prev += delta >> 1 if not delta & 1 else -((delta + 1) >> 1)
+            res.append(prev)
+            delta = 0
+            shift = 0
+    return res
+
+def db_sync_build_ext_chunks(exp_id: int, rows: Iterable[Tuple[int, int, int]],
+                             chunk_size: int, complete: bool) -> Tuple[List[Dict], int|None]:
+    '''Pack the extended measures of an experiment in chunks of chunk_size generic samples.
+    The samples that do not fill a chunk are left out, unless the experiment is complete.
+
+    Args:
+        exp_id (int): Id of the experiment.
+        rows (Iterable[Tuple[int, int, int]]): MeasID, UsedMeasID and Value of each measure.
+        chunk_size (int): Generic samples of each chunk.
+        complete (bool): True if there are no more samples, so the last chunk is not full.
+    Returns:
+        Tuple[List[Dict], int|None]: Rows of the chunks table and the MeasID of the last sample
+        packed, None if there are not enough samples for a chunk.
+    '''
+    rows = list(rows)
+    meas_ids = sorted({row[0] for row in rows})
+    n_chunks = len(meas_ids) // chunk_size
+    if complete and len(meas_ids) % chunk_size > 0:
+        n_chunks += 1
+    chunks: List[Dict] = []
+    last_meas_id = None
+    if n_chunks > 0:
+        firsts = meas_ids[:n_chunks * chunk_size:chunk_size]
+        last_meas_id = meas_ids[min(n_chunks * chunk_size, len(meas_ids)) - 1]
+        columns: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for meas_id, used_meas_id, value in rows:
+            if meas_id <= last_meas_id:
+                first = firsts[bisect_right(firsts, meas_id) - 1]
+                columns.setdefault((used_meas_id, first), []).append((meas_id, value))
+        for (used_meas_id, first), samples in sorted(columns.items()):
+            samples.sort()
+            chunks.append({'ExpID': exp_id, 'UsedMeasID': used_meas_id, 'FirstMeasID': first,
+                           'LastMeasID': samples[-1][0], 'NSamples': len(samples),
+                           'MeasIDs': db_sync_encode_chunk(sample[0] for sample in samples),
+                           'Values': db_sync_encode_chunk(sample[1] for sample in samples)})
+    return chunks, last_meas_id
+
+def db_sync_read_ext_chunks(session: Session, exp_id: int, used_meas_ids: Iterable[int]|None
+                            = None) -> Dict[int, Tuple[array, array]]:
+    '''Read the extended measures of an experiment stored in chunks.
+
+    Args:
+        session (Session): Session of the master database.
+        exp_id (int): Id of the experiment.
+        used_meas_ids (Iterable[int]|None): Measures to read, all of them if None.
+    Returns:
+        Dict[int, Tuple[array, array]]: MeasIDs and values of each measure, sorted by MeasID.
+    '''
+    table = DB_SYNC_EXT_CHUNKS
+    stmt = select(table.c.UsedMeasID, table.c.MeasIDs, table.c.Values).\
+        where(table.c.ExpID == exp_id).order_by(table.c.UsedMeasID, table.c.FirstMeasID)
+    if used_meas_ids is not None:
+        stmt = stmt.where(table.c.UsedMeasID.in_(list(used_meas_ids)))
+    res: Dict[int, Tuple[array, array]] = {}
+    n_chunks = 0
+    for used_meas_id, meas_ids, values in session.execute(stmt):
+        column = res.setdefault(used_meas_id, (array('q'), array('q')))
+        column[0].extend(db_sync_decode_chunk(meas_ids))
+        column[1].extend(db_sync_decode_chunk(values))
+        n_chunks += 1
+    log.debug(f"Exp {exp_id} has {n_chunks} ext meas chunks of {len(res)} measures")
+    return res
@@ -5,13 +5,20 @@ _______________________________________________________________________________
 
 #######################        MANDATORY IMPORTS         #######################
 from __future__ import annotations # pylint: disable=wrong-import-position
-from typing import Set
+from typing import Dict, List, Set, Tuple
 from sys import path
 import os
 
 #######################         GENERIC IMPORTS          #######################
+from datetime import datetime
+from time import perf_counter
+from operator import itemgetter
 
 #######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import Table, bindparam, column, delete, func, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Dialect
+from sqlalchemy.orm import Session
 
 #######################      SYSTEM ABSTRACTION IMPORTS  #######################
 path.append(os.getcwd())
@@ -22,9 +29,14 @@ log = sys_log_logger_get_module_logger(__name__)
 from wattrex_driver_db import (DrvDbSqlEngineC, DrvDbTypeE, DrvDbAlarmC, DrvDbCacheExperimentC, # pylint: disable=wrong-import-position
                 DrvDbCacheStatusC, DrvDbCacheExtendedMeasureC, DrvDbCacheGenericMeasureC,
                 DrvDbMasterGenericMeasureC, DrvDbMasterExtendedMeasureC, DrvDbExpStatusE,
-                DrvDbMasterStatusC, DrvDbMasterExperimentC, transform_experiment_db,
-                transform_ext_meas_db, transform_gen_meas_db, transform_status_db)
+                DrvDbMasterStatusC, DrvDbMasterExperimentC, transform_experiment_db)
 #######################          MODULE IMPORTS          #######################
+from .context import (DEFAULT_SYNC_BATCH_SIZE, DEFAULT_COPY_CHUNK, # pylint: disable=wrong-import-position
+                      DEFAULT_EXT_STORAGE, DEFAULT_EXT_CHUNK_SIZE, DEFAULT_READ_BATCH)
+from .db_sync_chunks import (DB_SYNC_EXT_CHUNKS, DbSyncExtStorageE, # pylint: disable=wrong-import-position
+                             db_sync_build_ext_chunks)
+from .db_sync_metrics import DbSyncMetricsC, DbSyncPhaseE # pylint: disable=wrong-import-position
+from .db_sync_state import DbSyncStateC, DbSyncTableE # pylint: disable=wrong-import-position
 
 #######################              ENUMS               #######################
 
@@ -32,13 +44,103 @@ from wattrex_driver_db import (DrvDbSqlEngineC, DrvDbTypeE, DrvDbAlarmC, DrvDbCa
 class _SyncExpStatus():
     def __init__(self, status: DrvDbExpStatusE) -> None:
         self.status: DrvDbExpStatusE = status
-        self.max_pushed_gen: int = -1
+        # True once all the rows of a finished experiment have been pushed
+        self.drained: bool = False
+        # Id of the last row of each table deleted from cache
+        self.deleted: Dict[DbSyncTableE, int] = {}
+
+class _DriverStmtC():
+    '''Statement compiled once for the database driver and executed with plain tuples,
+    skipping the per row processing of SQLAlchemy.
+    '''
+    def __init__(self, stmt, dialect: Dialect, names: Tuple[str, ...]) -> None:
+        compiled = stmt.compile(dialect= dialect)
+        self.sql: str = compiled.string
+        self.names: Tuple[str, ...] = names
+        self.positional: bool = compiled.positional
+        self.order: Tuple[int, ...] = tuple(names.index(name) for name in compiled.positiontup) \
+                                      if compiled.positional else ()
+        self.__reorder = itemgetter(*self.order) \
+                         if self.order != tuple(range(len(names))) else None
+
+    def execute(self, session: Session, rows: List[Tuple]) -> None:
+        '''Execute the statement once per row, in a single driver call.
+        Args:
+            - session (Session): Session where the statement is executed.
+            - rows (List[Tuple]): Values of each row, in the order of the names.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        if self.positional:
+            params = rows if self.__reorder is None else list(map(self.__reorder, rows))
+        else:
+            params = [dict(zip(self.names, row)) for row in rows]
+        session.connection().exec_driver_sql(self.sql, params)
+
+class _CopyPlanC():
+    '''Columns copied from a cache table to its master table, the ones in both tables.
+    The rows of each experiment are identified by an increasing id column.
+    '''
+    def __init__(self, table: DbSyncTableE, cache_table: Table, master_table: Table,
+                 id_column: str) -> None:
+        self.table: DbSyncTableE = table
+        self.cache_table: Table = cache_table
+        self.master_table: Table = master_table
+        self.id_column = cache_table.columns[id_column]
+        self.columns: Tuple[str, ...] = tuple(col.name for col in cache_table.columns
+                                              if col.name in master_table.columns)
+        # Columns without type, so values are read as the driver returns them and written back
+        # without conversions
+        self.cache_columns = tuple(column(col) for col in self.columns)
+        self.id_pos: int = self.columns.index(id_column)
+        self.__insert: _DriverStmtC|None = None
+
+    def select(self, exp_id: int, last_pushed: int):
+        '''Select of the copied columns of the rows of an experiment after the given id,
+        sorted by id.
+        '''
+        return select(*self.cache_columns).select_from(self.cache_table).\
+            where(self.cache_table.c.ExpID == exp_id, self.id_column > last_pushed).\
+            order_by(self.id_column.asc())
+
+    def insert(self, session: Session, rows: List[Tuple]) -> None:
+        '''Insert the rows in the master table, skipping the ones already stored.
+        '''
+        if self.__insert is None:
+            dialect = session.get_bind().dialect
+            self.__insert = _DriverStmtC(_insert_ignore(self.master_table, dialect, self.columns),
+                                         dialect, self.columns)
+        self.__insert.execute(session, rows)
+
+    def delete_until(self, session: Session, exp_id: int, last_id: int) -> int:
+        '''Delete the rows of an experiment from the cache table up to the given id.
+        Returns:
+            - (int): Number of rows deleted.
+        '''
+        stmt = delete(self.cache_table).where(self.cache_table.c.ExpID == exp_id,
+                                              self.id_column <= last_id)
+        return session.execute(stmt).rowcount
 
 class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
     '''It is a thread that runs in background and is used to synchronize
     the database with the other nodes.
     '''
-    def __init__(self, cred_file:str):
+    def __init__(self, cred_file:str, batch_size: int = DEFAULT_SYNC_BATCH_SIZE, #pylint: disable= too-many-arguments
+                 state: DbSyncStateC|None = None, copy_chunk: int = DEFAULT_COPY_CHUNK,
+                 shard: Tuple[int, int] = (0, 1), metrics: DbSyncMetricsC|None = None):
+        '''Open the cache and master sessions used by the sync.
+        Args:
+            - cred_file (str): Path of the credentials file of both databases.
+            - batch_size (int): Max generic measures of each experiment pushed per cycle.
+            - state (DbSyncStateC|None): Watermarks of the experiments.
+            - copy_chunk (int): Rows sent to master in each insert statement.
+            - shard (Tuple[int, int]): Index of the shard and number of shards, only the
+              experiments whose id modulo the number of shards is the index are synced.
+            - metrics (DbSyncMetricsC|None): Metrics where the sync is recorded, shared by all
+              the workers of the node.
+        '''
         log.info("Initializing DB Connection...")
         #Remote database
         self.__master_db: DrvDbSqlEngineC = DrvDbSqlEngineC(db_type=DrvDbTypeE.MASTER_DB,
@@ -46,16 +148,37 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
         #Local database
         self.__cache_db: DrvDbSqlEngineC = DrvDbSqlEngineC(db_type=DrvDbTypeE.CACHE_DB,
                                                             config_file= cred_file)
-        self.__push_gen_meas: Set[DrvDbCacheGenericMeasureC]  = set()
-        self.__push_ext_meas: Set[DrvDbCacheExtendedMeasureC]  = set()
-        self.__push_status:   Set[DrvDbCacheStatusC] = set()
-        self.__push_alarms:   Set[DrvDbAlarmC] = set()
         self.__push_exps:     Set[DrvDbCacheExperimentC]   = set()
         self.__exp_dict: dict[int, _SyncExpStatus] = {}
+        self.batch_size: int = batch_size
+        self.copy_chunk: int = copy_chunk
+        self.shard: Tuple[int, int] = shard
+        # Rows inserted in master since the sync started, committed or not
+        self.rows_pushed: int = 0
+        # True if some experiment had more generic measures than a batch in the last push
+        self.backlog: bool = False
+        # Duration of the last master commit, express in milliseconds
+        self.commit_latency: float = 0.0
+        self.ext_storage: DbSyncExtStorageE = DbSyncExtStorageE(DEFAULT_EXT_STORAGE)
+        self.ext_chunk_size: int = DEFAULT_EXT_CHUNK_SIZE
+        self.__chunk_insert = None
+        self.read_batch: int = DEFAULT_READ_BATCH
+        self.metrics: DbSyncMetricsC = metrics if metrics is not None else DbSyncMetricsC()
+        self.__gen_plan = _CopyPlanC(DbSyncTableE.GEN_MEAS, DrvDbCacheGenericMeasureC.__table__,
+                                     DrvDbMasterGenericMeasureC.__table__, 'MeasID')
+        self.__ext_plan = _CopyPlanC(DbSyncTableE.EXT_MEAS, DrvDbCacheExtendedMeasureC.__table__,
+                                     DrvDbMasterExtendedMeasureC.__table__, 'MeasID')
+        self.__status_plan = _CopyPlanC(DbSyncTableE.STATUS, DrvDbCacheStatusC.__table__,
+                                        DrvDbMasterStatusC.__table__, 'StatusID')
+        # Alarms use the same table in both databases
+        self.__alarm_plan = _CopyPlanC(DbSyncTableE.ALARM, DrvDbAlarmC.__table__,
+                                       DrvDbAlarmC.__table__, 'AlarmID')
+        self.__state: DbSyncStateC = state if state is not None else DbSyncStateC()
 
 
     def push_gen_meas(self) -> None:
-        '''Push the measures to the database.
+        '''Push the next batch of measures of each experiment to the database, the ones after
+        the watermark of the experiment.
         Args:
             - None
         Returns:
@@ -64,30 +187,27 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
             - None
         '''
         log.info("Pushing general measures...")
+        start = perf_counter()
+        n_rows = 0
+        self.backlog = False
         for exp_id, exp_info in self.__exp_dict.items():
-            cache_meas  = self.__cache_db.session.query(DrvDbCacheGenericMeasureC).\
-                    filter(DrvDbCacheGenericMeasureC.ExpID == exp_id).\
-                    order_by(DrvDbCacheGenericMeasureC.MeasID.asc()).all()
-
-            log.debug(f"Exp {exp_id} has {len(cache_meas)} gen meas")
+            last_pushed = self.__state.get_watermark(exp_id, DbSyncTableE.GEN_MEAS)
+            # One row more than the batch is read to know if the end has been reached
+            stmt = self.__gen_plan.select(exp_id, last_pushed).limit(self.batch_size + 1)
+            cache_meas = self.__read(stmt)
+            log.debug(f"Exp {exp_id} has {len(cache_meas)} gen meas after {last_pushed}")
+            if len(cache_meas) > self.batch_size:
+                cache_meas = cache_meas[:self.batch_size]
+                self.backlog = True
+            elif exp_info.status in (DrvDbExpStatusE.FINISHED.value,DrvDbExpStatusE.ERROR.value):
+                exp_info.drained = True
+            else:
+                # The extended measures of the last sample may not be written yet
+                cache_meas = cache_meas[:-1]
             if len(cache_meas) > 0:
-                to_push_meas = set()
-                log.debug(f"Last gen_meas in cache: {cache_meas[-1].MeasID}")
-                if exp_info.status in (DrvDbExpStatusE.FINISHED.value,DrvDbExpStatusE.ERROR.value):
-                    self.__exp_dict[exp_id].max_pushed_gen = cache_meas[-1].MeasID #pylint: disable= unnecessary-dict-index-lookup
-                    to_push_meas = set(cache_meas)
-                elif len(cache_meas)>1:
-                    last_push_gen_meas = cache_meas[-2].MeasID
-                    self.__exp_dict[exp_id].max_pushed_gen = max(last_push_gen_meas, #pylint: disable= unnecessary-dict-index-lookup
-                                                                 exp_info.max_pushed_gen)
-                    to_push_meas = set(cache_meas[:-1])
-                log.debug(f"Last pushed gen_meas: {exp_info.max_pushed_gen}")
-
-                for meas in to_push_meas:
-                    meas_add = DrvDbMasterGenericMeasureC()
-                    transform_gen_meas_db(source= meas, target= meas_add)
-                    self.__push_gen_meas.add(meas)
-                    self.__master_db.session.add(meas_add)
+                self.__copy_rows(exp_id, self.__gen_plan, cache_meas)
+                n_rows += len(cache_meas)
+        self.__end_push('gen_meas', n_rows, start)
 
     def push_ext_meas(self) -> None:
         '''Push the measures to the database.
@@ -98,18 +218,66 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
         Raises:
             - None
         '''
-        self.__cache_db.session.expire_all()
         log.info("Pushing external measures...")
+        start = perf_counter()
+        n_rows = 0
+        table = DrvDbCacheExtendedMeasureC.__table__
         for exp_id, exp_info in self.__exp_dict.items():
-            cache_meas = self.__cache_db.session.query(DrvDbCacheExtendedMeasureC).\
-                populate_existing().filter(DrvDbCacheExtendedMeasureC.ExpID == exp_id,
-                DrvDbCacheExtendedMeasureC.MeasID <= exp_info.max_pushed_gen).all()
+            # Extended measures follow the generic measures already committed
+            last_pushed = self.__state.get_watermark(exp_id, DbSyncTableE.EXT_MEAS)
+            last_gen = self.__state.get_watermark(exp_id, DbSyncTableE.GEN_MEAS)
+            if last_gen <= last_pushed:
+                continue
+            if self.ext_storage is DbSyncExtStorageE.CHUNKS:
+                n_rows += self.__push_ext_chunks(exp_id, last_pushed, last_gen, exp_info.drained)
+                continue
+            stmt = self.__ext_plan.select(exp_id, last_pushed).where(table.c.MeasID <= last_gen)
+            cache_meas = self.__read(stmt)
             log.debug(f"Exp {exp_id} has {len(cache_meas)} ext meas")
-            for meas in cache_meas:
-                meas_add = DrvDbMasterExtendedMeasureC()
-                transform_ext_meas_db(source= meas, target= meas_add)
-                self.__push_ext_meas.add(meas)
-                self.__master_db.session.add(meas_add)
+            self.__copy_rows(exp_id, self.__ext_plan, cache_meas)
+            # The watermark moves to the generic one even if some samples have no ext meas
+            self.__state.stage_watermark(exp_id, DbSyncTableE.EXT_MEAS, last_gen)
+            n_rows += len(cache_meas)
+        self.__end_push('ext_meas', n_rows, start)
+
+    def __push_ext_chunks(self, exp_id: int, last_pushed: int, last_gen: int,
+                          complete: bool) -> int:
+        '''Push the extended measures of an experiment packed in chunks of ext_chunk_size
+        generic samples. The samples that do not fill a chunk stay in cache until more samples
+        arrive or the experiment finishes.
+        Args:
+            - exp_id (int): Id of the experiment.
+            - last_pushed (int): MeasID of the last sample already pushed.
+            - last_gen (int): MeasID of the last generic sample committed in master.
+            - complete (bool): True if all the generic samples have been committed.
+        Returns:
+            - (int): Number of measures pushed.
+        Raises:
+            - None
+        '''
+        table = DrvDbCacheExtendedMeasureC.__table__
+        stmt = select(table.c.MeasID, table.c.UsedMeasID, table.c.Value).\
+            where(table.c.ExpID == exp_id, table.c.MeasID > last_pushed,
+                  table.c.MeasID <= last_gen)
+        cache_meas = self.__read(stmt)
+        chunks, last_meas_id = db_sync_build_ext_chunks(exp_id, cache_meas, self.ext_chunk_size,
+                                                        complete)
+        if len(chunks) > 0:
+            if self.__chunk_insert is None:
+                engine = self.__master_db.session.get_bind()
+                DB_SYNC_EXT_CHUNKS.create(engine, checkfirst= True)
+                self.__chunk_insert = _insert_ignore(DB_SYNC_EXT_CHUNKS, engine.dialect,
+                    tuple(col.name for col in DB_SYNC_EXT_CHUNKS.columns))
+            write_start = perf_counter()
+            self.__master_db.session.execute(self.__chunk_insert, chunks)
+            self.metrics.observe_phase(DbSyncPhaseE.WRITE, (perf_counter() - write_start)*1000)
+            log.debug(f"Exp {exp_id} pushed {len(chunks)} ext meas chunks up to {last_meas_id}")
+        if last_meas_id is not None:
+            self.__state.stage_watermark(exp_id, DbSyncTableE.EXT_MEAS, last_meas_id)
+        elif complete:
+            # Samples without ext meas
+            self.__state.stage_watermark(exp_id, DbSyncTableE.EXT_MEAS, last_gen)
+        return sum(chunk['NSamples'] for chunk in chunks)
 
     def push_alarms(self) -> None:
         '''Push the alarms to the database.
@@ -121,10 +289,7 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
             - None
         '''
         log.info("Pushing alarms...")
-        cache_meas = self.__cache_db.session.query(DrvDbAlarmC).all()
-        for meas in cache_meas:
-            self.__push_alarms.add(meas)
-            self.__master_db.session.add(meas)
+        self.__push_events(self.__alarm_plan)
 
 
     def push_status(self) -> None:
@@ -137,22 +302,89 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
             - None
         '''
         log.info("Pushing status...")
-        cache_meas = self.__cache_db.session.query(DrvDbCacheStatusC).all()
-        for meas in cache_meas:
-            meas_add = DrvDbMasterStatusC()
-            transform_status_db(source= meas, target= meas_add)
-            self.__push_status.add(meas)
-            self.__master_db.session.add(meas_add)
+        self.__push_events(self.__status_plan)
+
+    def __push_events(self, plan: _CopyPlanC) -> None:
+        '''Push all the rows of each experiment after its watermark, used for the status and
+        alarms tables.
+        '''
+        start = perf_counter()
+        n_rows = 0
+        for exp_id in self.__exp_dict:
+            last_pushed = self.__state.get_watermark(exp_id, plan.table)
+            # Pages of read_batch rows, so the memory used does not depend on the rows pending
+            cache_meas = None
+            while cache_meas is None or len(cache_meas) == self.read_batch:
+                cache_meas = self.__read(plan.select(exp_id, last_pushed).limit(self.read_batch))
+                self.__copy_rows(exp_id, plan, cache_meas)
+                n_rows += len(cache_meas)
+                if len(cache_meas) > 0:
+                    last_pushed = cache_meas[-1][plan.id_pos]
+        self.__end_push(plan.table.value, n_rows, start)
+
+    def __read(self, stmt) -> List[Tuple]:
+        '''Read the rows of a select from cache.
+        '''
+        start = perf_counter()
+        res = self.__cache_db.session.execute(stmt).all()
+        self.metrics.observe_phase(DbSyncPhaseE.READ, (perf_counter() - start)*1000)
+        return res
+
+    def __end_push(self, table: str, n_rows: int, start: float) -> None:
+        '''Log the number of rows of a table pushed and the rows per second.
+        '''
+        if n_rows > 0:
+            elapsed = perf_counter() - start
+            self.metrics.add_rows(table, n_rows, elapsed)
+            log.info(f"Pushed {n_rows} {table} rows, {n_rows / max(elapsed, 1e-6):.0f} rows/s")
+
+    def __copy_rows(self, exp_id: int, plan: _CopyPlanC, rows: List[Tuple]) -> None:
+        '''Insert the rows of an experiment read from cache into master, in chunks of
+        copy_chunk rows, and stage the watermark of the table to the last one.
+        Args:
+            - exp_id (int): Id of the experiment.
+            - plan (_CopyPlanC): Columns copied.
+            - rows (List[Tuple]): Values of the columns of each row, sorted by id.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        if len(rows) > 0:
+            rows = list(map(tuple, rows))
+            write_start = perf_counter()
+            for i in range(0, len(rows), self.copy_chunk):
+                plan.insert(self.__master_db.session, rows[i:i + self.copy_chunk])
+            self.metrics.observe_phase(DbSyncPhaseE.WRITE, (perf_counter() - write_start)*1000)
+            self.rows_pushed += len(rows)
+            self.__state.stage_watermark(exp_id, plan.table, rows[-1][plan.id_pos])
+            log.debug(f"Last pushed {plan.table.value} of exp {exp_id}: {rows[-1][plan.id_pos]}")
 
     def push_experiments(self) -> None:
         '''Push the experiments to the database.
         '''
         log.info("Pushing experiments...")
-        cache_meas = self.__cache_db.session.query(DrvDbCacheExperimentC).populate_existing().all()
-        for meas in cache_meas:
+        index, n_shards = self.shard
+        table = DrvDbCacheExperimentC.__table__
+        # Only the id and status are read, in pages, and the experiments are loaded when new
+        # or changed
+        changed: List[int] = []
+        last_exp_id = -1
+        page = None
+        while page is None or len(page) == self.read_batch:
+            page = self.__read(select(table.c.ExpID, table.c.Status).
+                               where(table.c.ExpID % n_shards == index,
+                                     table.c.ExpID > last_exp_id).
+                               order_by(table.c.ExpID.asc()).limit(self.read_batch))
+            changed.extend(exp_id for exp_id, status in page if exp_id not in self.__exp_dict
+                           or status != self.__exp_dict[exp_id].status)
+            if len(page) > 0:
+                last_exp_id = page[-1][0]
+        for exp_id in changed:
+            meas = self.__cache_db.session.get(DrvDbCacheExperimentC, exp_id,
+                                               populate_existing= True)
             meas_add = DrvDbMasterExperimentC()
-            if (meas.ExpID not in self.__exp_dict or (meas.ExpID in self.__exp_dict
-                and meas.Status != self.__exp_dict[meas.ExpID].status)):
+            if meas is not None:
                 if meas.ExpID not in self.__exp_dict:
                     self.__exp_dict[meas.ExpID] = _SyncExpStatus(meas.Status)
                     if meas.Status in (DrvDbExpStatusE.FINISHED.value,DrvDbExpStatusE.ERROR.value):
@@ -165,6 +397,32 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
                 transform_experiment_db(source= meas, target= meas_add)
                 self.__master_db.session.merge(meas_add)
 
+    def update_lag(self) -> None:
+        '''Record in the metrics the generic measures of each experiment not committed in master
+        yet, and the age of the oldest one.
+        Args:
+            - None
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        table = DrvDbCacheGenericMeasureC.__table__
+        now = datetime.now()
+        for exp_id in self.__exp_dict:
+            last_pushed = self.__state.get_watermark(exp_id, DbSyncTableE.GEN_MEAS)
+            rows, oldest = self.__cache_db.session.execute(
+                select(func.count(), func.min(table.c.Timestamp)).
+                where(table.c.ExpID == exp_id, table.c.MeasID > last_pushed)).one()
+            seconds = (now - oldest).total_seconds() if oldest is not None else 0.0
+            self.metrics.set_lag(exp_id, rows, max(seconds, 0.0))
+
+    @property
+    def n_experiments(self) -> int:
+        '''Number of experiments with rows pending to sync.
+        '''
+        return len(self.__exp_dict)
+
     def commit(self) -> None:
         '''Confirm the changes made to the indicated database.
         Args:
@@ -175,29 +433,80 @@ class DbSyncFachadeC(): # pylint: disable=too-many-instance-attributes
             - None
         '''
         log.info("Commiting changes...")
-        self.__master_db.commit_changes(raise_exception= True)
+        batch_id = self.__state.begin_batch()
+        if batch_id is not None:
+            log.debug(f"Commiting batch {batch_id}")
+        start = perf_counter()
+        try:
+            self.__master_db.commit_changes(raise_exception= True)
+        except Exception:
+            # The rows will be pushed again from the last watermarks committed
+            self.__state.discard()
+            raise
+        finally:
+            self.commit_latency = (perf_counter() - start)*1000
+            self.metrics.observe_phase(DbSyncPhaseE.COMMIT, self.commit_latency)
+        self.__state.promote()
         ## No rollback done in master db
 
+    def rollback(self) -> None:
+        '''Drop the rows pushed to master and not committed yet, and their watermarks.
+        '''
+        self.__master_db.session.rollback()
+        self.__cache_db.session.rollback()
+        self.__state.discard()
+
     def delete_pushed_data(self):
         '''Remove the pushed data from the cache database.
         '''
         log.info("Deleting ...")
-        for meas in [self.__push_alarms, self.__push_status,
-                        self.__push_ext_meas, self.__push_gen_meas]:
-            for row in meas:
-                self.__cache_db.session.expunge(row)
-                self.__cache_db.session.delete(row)
+        start = perf_counter()
+        # Rows up to the watermarks are committed in master, so each table of each experiment
+        # is cleaned with a single statement
+        deleted = []
+        for exp_id, exp_info in self.__exp_dict.items():
+            for plan in (self.__alarm_plan, self.__status_plan, self.__ext_plan,
+                         self.__gen_plan):
+                last_pushed = self.__state.get_watermark(exp_id, plan.table)
+                if last_pushed > exp_info.deleted.get(plan.table, -1):
+                    n_rows = plan.delete_until(self.__cache_db.session, exp_id, last_pushed)
+                    log.debug(f"Deleted {n_rows} {plan.table.value} rows of exp {exp_id}")
+                    deleted.append((exp_info, plan.table, last_pushed))
         self.__cache_db.commit_changes(raise_exception= True)
+        self.metrics.observe_phase(DbSyncPhaseE.DELETE, (perf_counter() - start)*1000)
+        for exp_info, table, last_pushed in deleted:
+            exp_info.deleted[table] = last_pushed
 
-        for exp in self.__push_exps:
+        # Finished experiments are kept until all their measures have been pushed
+        drained_exps = {exp for exp in self.__push_exps if self.__exp_dict[exp.ExpID].drained}
+        for exp in drained_exps:
             log.debug(f"Deleting experiment {exp.ExpID}")
             self.__exp_dict.pop(exp.ExpID)
             self.__cache_db.session.expunge(exp)
             self.__cache_db.session.delete(exp)
         self.__cache_db.commit_changes(raise_exception= True)
+        for exp in drained_exps:
+            self.__state.remove_experiment(exp.ExpID)
+            self.metrics.remove_experiment(exp.ExpID)
+
+        self.__push_exps       -= drained_exps
 
-        self.__push_gen_meas   = set()
-        self.__push_ext_meas   = set()
-        self.__push_status     = set()
-        self.__push_alarms     = set()
-        self.__push_exps       = set()
+#######################            FUNCTIONS             #######################
+def _insert_ignore(table: Table, dialect: Dialect, columns: Tuple[str, ...]):
+    '''Insert statement that does nothing for rows whose primary key is already in master,
+    so a batch can be pushed again after a failure without conflicts.
+    '''
+    values = {col: bindparam(col) for col in columns}
+    if dialect.name in ('mysql', 'mariadb'):
+        # Unlike INSERT IGNORE, any other error is still raised
+        stmt = mysql.insert(table).values(values)
+        key = table.primary_key.columns.values()[0].name
+        stmt = stmt.on_duplicate_key_update({key: stmt.inserted[key]})
+    elif dialect.name == 'sqlite':
+        stmt = sqlite.insert(table).values(values).on_conflict_do_nothing()
+    elif dialect.name == 'postgresql':
+        stmt = postgresql.insert(table).values(values).on_conflict_do_nothing()
+    else:
+        log.warning(f"Rows already in {table.name} can not be skipped in {dialect.name}")
+        stmt = insert(table).values(values)
+    return stmt
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+'''
+Metrics of the sync between the cache and the master database, shared by all the workers of
+the node and exposed as a periodic log line and an optional local http endpoint.
+'''
+
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+import json
+from bisect import bisect_left
+from enum import Enum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Callable, Dict, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+#######################          MODULE IMPORTS          #######################
+
+#######################              ENUMS               #######################
+class DbSyncPhaseE(Enum):
+    '''Phases of a sync cycle whose latency is measured.
+    '''
+    READ = 'read'       # Select of the rows in cache
+    WRITE = 'write'     # Insert of the rows in master
+    COMMIT = 'commit'   # Commit of master
+    DELETE = 'delete'   # Delete of the pushed rows from cache and its commit
+
+######################             CONSTANTS              ######################
+# Upper bounds of the buckets of the latency histograms, express in milliseconds
+_LATENCY_BUCKETS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+#######################              CLASSES             #######################
+class DbSyncHistogramC():
+    '''Histogram of latencies, with the count of each bucket and the total.
+    '''
+    def __init__(self, buckets: Tuple[float, ...] = _LATENCY_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = buckets
+        ## The last count is for the values above the last bucket
+        self.counts: list = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        '''Add a latency, express in milliseconds.
+        '''
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict:
+        '''Histogram as a dictionary, with the cumulative count of each bucket.
+        '''
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ('inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': self.count, 'sum_ms': round(self.total, 3),
+                'max_ms': round(self.max, 3), 'buckets': buckets}
+
+class DbSyncMetricsC():
+    '''Metrics of the sync, updated by the fachades of all the workers.
+    '''
+    def __init__(self) -> None:
+        self.__lock: Lock = Lock()
+        self.__phases: Dict[DbSyncPhaseE, DbSyncHistogramC] = {phase: DbSyncHistogramC()
+                                                               for phase in DbSyncPhaseE}
+        ## Rows pushed of each table, total and rows per second of the last push
+        self.__rows: Dict[str, int] = {}
+        self.__rates: Dict[str, float] = {}
+        ## Rows pending in cache and age of the oldest one of each experiment
+        self.__lag: Dict[int, Dict[str, float]] = {}
+
+    def observe_phase(self, phase: DbSyncPhaseE, latency: float) -> None:
+        '''Add the latency of a phase, express in milliseconds.
+        '''
+        with self.__lock:
+            self.__phases[phase].observe(latency)
+
+    def add_rows(self, table: str, n_rows: int, elapsed: float) -> None:
+        '''Add the rows of a table pushed, and the time spent on them, express in seconds.
+        '''
+        with self.__lock:
+            self.__rows[table] = self.__rows.get(table, 0) + n_rows
+            self.__rates[table] = n_rows / max(elapsed, 1e-6)
+
+    def set_lag(self, exp_id: int, rows: int, seconds: float) -> None:
+        '''Set the rows of an experiment not yet committed in master, and the age of the oldest
+        one, express in seconds.
+        '''
+        with self.__lock:
+            self.__lag[exp_id] = {'rows': rows, 'seconds': round(seconds, 3)}
+
+    def remove_experiment(self, exp_id: int) -> None:
+        '''Forget the lag of an experiment completely synced.
+        '''
+        with self.__lock:
+            self.__lag.pop(exp_id, None)
+
+    def to_dict(self) -> Dict:
+        '''Snapshot of the metrics as a dictionary serializable to json.
+        '''
+        with self.__lock:
+            return {'lag': {str(exp_id): dict(lag) for exp_id, lag in self.__lag.items()},
+                    'rows': dict(self.__rows),
+                    'rows_per_second': {table: round(rate, 1)
+                                        for table, rate in self.__rates.items()},
+                    'latency': {phase.value: histogram.to_dict()
+                                for phase, histogram in self.__phases.items()}}
+
+class DbSyncMetricsServerC():
+    '''Local http endpoint that returns the metrics of the sync as json.
+    '''
+    def __init__(self, snapshot: Callable[[], Dict], port: int, host: str = '127.0.0.1') -> None:
+        '''Start serving the metrics in a daemon thread.
+        Args:
+            - snapshot (Callable[[], Dict]): Function that returns the metrics to serve.
+            - port (int): Port of the endpoint.
+            - host (str): Address of the endpoint, only local by default.
+        Returns:
+            - None
+        Raises:
+            - OSError: The port can not be bound.
+        '''
+        class _HandlerC(BaseHTTPRequestHandler):
+            '''Handler of the requests to the metrics endpoint.
+            '''
+            def do_GET(self) -> None: #pylint: disable= invalid-name
+                '''Return the metrics in /metrics, not found for other paths.
+                '''
+                if self.path.rstrip('/') == '/metrics':
+                    body = json.dumps(snapshot()).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format: str, *args) -> None: #pylint: disable= redefined-builtin
+                log.debug(format % args)
+
+        self.__server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), _HandlerC)
+        self.port: int = self.__server.server_address[1]
+        self.__thread: Thread = Thread(target= self.__server.serve_forever, daemon= True,
+                                       name= 'SYNC_METRICS')
+        self.__thread.start()
+        log.info(f"Sync metrics served in http://{host}:{self.port}/metrics")
+
+    def close(self) -> None:
+        '''Stop serving the metrics.
+        '''
+        self.__server.shutdown()
+        self.__server.server_close()
@@ -8,7 +8,11 @@ from sys import path
 import os
 
 #######################         GENERIC IMPORTS          #######################
-from threading import Event
+from concurrent.futures import ThreadPoolExecutor, wait
+import json
+from threading import BoundedSemaphore, Event
+from time import time
+from typing import Dict, List
 
 #######################       THIRD PARTY IMPORTS        #######################
 
@@ -23,8 +27,12 @@ from system_shared_tool import SysShdNodeC # pylint: disable=wrong-import-positi
 
 #######################          MODULE IMPORTS          #######################
 from .context import (DEFAULT_CRED_FILEPATH, DEFAULT_SYNC_NODE_NAME, DEFAULT_NODE_PERIOD,
-                      DEFAULT_COMP_UNIT)
-from .db_sync_fachade import DbSyncFachadeC # pylint: disable=wrong-import-position
+                      DEFAULT_COMP_UNIT, DEFAULT_SYNC_WORKERS, DEFAULT_MAX_MASTER_CONN,
+                      DEFAULT_METRICS_LOG_PERIOD, DEFAULT_METRICS_PORT, DEFAULT_STATE_PATH)
+from .db_sync_cadence import DbSyncCadenceC # pylint: disable=wrong-import-position
+from .db_sync_metrics import DbSyncMetricsC, DbSyncMetricsServerC # pylint: disable=wrong-import-position
+from .db_sync_state import db_sync_state_migrate # pylint: disable=wrong-import-position
+from .db_sync_worker import DbSyncWorkerC # pylint: disable=wrong-import-position
 
 #######################              ENUMS               #######################
 
@@ -37,11 +45,20 @@ class DbSyncNodeC(SysShdNodeC): #pylint: disable= abstract-method
     '''
     def __init__(self, working_flag: Event, comp_unit: int= DEFAULT_COMP_UNIT,
                  cycle_period: int= DEFAULT_NODE_PERIOD,
-                 cred_file: str = DEFAULT_CRED_FILEPATH):
+                 cred_file: str = DEFAULT_CRED_FILEPATH, n_workers: int = DEFAULT_SYNC_WORKERS,
+                 max_master_conn: int = DEFAULT_MAX_MASTER_CONN,
+                 metrics_port: int = DEFAULT_METRICS_PORT,
+                 state_path: str = DEFAULT_STATE_PATH):
         '''Initialize the class.
         Args:
             - comp_unit (int): number of the computational unit.
-            - cycle_period (int): period of the sync.
+            - cycle_period (int): initial period of the sync, adapted after each iteration.
+            - n_workers (int): workers syncing the experiments in parallel, each one with its
+              own sessions and a shard of the experiments.
+            - max_master_conn (int): max workers using a master connection at the same time.
+            - metrics_port (int): local port where the metrics are served as json, 0 to only
+              log them.
+            - state_path (str): Path of the state file of the sync, one per worker.
         Returns:
             - None
         Raises:
@@ -51,7 +68,31 @@ class DbSyncNodeC(SysShdNodeC): #pylint: disable= abstract-method
         super().__init__(name= DEFAULT_SYNC_NODE_NAME, cycle_period=cycle_period,
                          working_flag= working_flag)
         self.comp_unit: int = comp_unit
-        self.fachade: DbSyncFachadeC = DbSyncFachadeC(cred_file= cred_file)
+        master_slots = BoundedSemaphore(max_master_conn)
+        self.metrics: DbSyncMetricsC = DbSyncMetricsC()
+        # The watermarks stored by a different number of workers are moved to the new shards
+        db_sync_state_migrate(state_path, n_workers)
+        self.workers: List[DbSyncWorkerC] = [DbSyncWorkerC(index= index, n_workers= n_workers,
+                                                           master_slots= master_slots,
+                                                           cred_file= cred_file,
+                                                           state_path= state_path,
+                                                           metrics= self.metrics)
+                                             for index in range(n_workers)]
+        self.cadence: DbSyncCadenceC = DbSyncCadenceC(period= cycle_period)
+        self.cycle_period = self.cadence.period
+        for worker in self.workers:
+            worker.fachade.batch_size = self.cadence.batch_size
+        self.__pool: ThreadPoolExecutor|None = None
+        if n_workers > 1:
+            self.__pool = ThreadPoolExecutor(max_workers= n_workers,
+                                             thread_name_prefix= DEFAULT_SYNC_NODE_NAME)
+        self.__last_log: float = time()
+        self.__server: DbSyncMetricsServerC|None = None
+        if metrics_port > 0:
+            try:
+                self.__server = DbSyncMetricsServerC(self.snapshot, port= metrics_port)
+            except OSError as err:
+                log.error(f"Sync metrics can not be served in port {metrics_port}: {err}")
 
     def stop(self) -> None:
         '''Stop the thread.
@@ -64,6 +105,25 @@ class DbSyncNodeC(SysShdNodeC): #pylint: disable= abstract-method
         '''
         log.critical(f"Stopping {self.name} in CU {self.comp_unit}...")
         self.working_flag.clear()
+        if self.__pool is not None:
+            self.__pool.shutdown(wait= True)
+        if self.__server is not None:
+            self.__server.close()
+
+    def snapshot(self) -> Dict:
+        '''Get the metrics of the sync, the workers and the cadence.
+        Args:
+            - None
+        Returns:
+            - (Dict): Metrics serializable to json.
+        Raises:
+            - None
+        '''
+        res = self.metrics.to_dict()
+        res['comp_unit'] = self.comp_unit
+        res['cadence'] = self.cadence.to_dict()
+        res['workers'] = [worker.metrics.to_dict() for worker in self.workers]
+        return res
 
     def process_iteration(self) -> None:
         '''Process the iteration.
@@ -75,16 +135,18 @@ class DbSyncNodeC(SysShdNodeC): #pylint: disable= abstract-method
             - None
         '''
         log.info("Processing iteration for experiment...") # pylint: disable=logging-fstring-interpolation
-        self.fachade.push_experiments()
-        self.fachade.push_gen_meas()
-        try:
-            self.fachade.commit()
-            log.debug("Commit and push of gen and exp done")
-            self.fachade.push_ext_meas()
-            self.fachade.push_alarms()
-            self.fachade.push_status()
-            self.fachade.commit()
-            log.debug("Commit and push ext, alarms and status done")
-            self.fachade.delete_pushed_data()
-        except Exception as err:
-            log.error((f"Error in trying to commit to master or cache, doing rollback: {err}"))
+        if self.__pool is None:
+            self.workers[0].run_cycle()
+        else:
+            # The iteration ends when all the shards have been synced
+            wait([self.__pool.submit(worker.run_cycle) for worker in self.workers])
+        self.cadence.update(backlog= any(worker.metrics.backlog for worker in self.workers),
+                            rows= sum(worker.metrics.cycle_rows for worker in self.workers),
+                            commit_latency= max(worker.metrics.commit_latency
+                                                for worker in self.workers))
+        self.cycle_period = self.cadence.period
+        for worker in self.workers:
+            worker.fachade.batch_size = self.cadence.batch_size
+        if (time() - self.__last_log)*1000 >= DEFAULT_METRICS_LOG_PERIOD:
+            log.info(f"Sync metrics: {json.dumps(self.snapshot())}")
+            self.__last_log = time()
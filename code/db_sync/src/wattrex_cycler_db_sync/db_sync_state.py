@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+'''
+Persisted state of the sync between the cache and the master database.
+'''
+
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+import json
+import os
+import re
+from enum import Enum
+from glob import escape as glob_escape, glob
+from typing import Dict, List, Tuple
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+#######################          MODULE IMPORTS          #######################
+from .context import DEFAULT_STATE_PATH
+
+#######################              ENUMS               #######################
+class DbSyncTableE(Enum):
+    '''Tables of each experiment synchronized by rows.
+    '''
+    GEN_MEAS = 'gen_meas'
+    EXT_MEAS = 'ext_meas'
+    STATUS = 'status'
+    ALARM = 'alarm'
+
+class DbSyncBatchStatusE(Enum):
+    '''Status of the last batch pushed to master, as written in the journal.
+    '''
+    # Written before the master commit, the rows may or may not be in master
+    PENDING = 'PENDING'
+    COMMITTED = 'COMMITTED'
+    DISCARDED = 'DISCARDED'
+
+#######################              CLASSES             #######################
+class DbSyncStateC():
+    '''Watermarks of each experiment and table, the id of the last row committed in the master
+    database. Watermarks are staged while the rows are pushed, and only promoted and written
+    to disk once the master database has committed them.
+    Each commit is recorded in a journal as a batch, with the range of ids of each table. A
+    batch left pending means the sync stopped during the master commit, so its rows are pushed
+    again and the master side must ignore the ones already stored.
+    '''
+    def __init__(self, file_path: str = DEFAULT_STATE_PATH) -> None:
+        '''Load the state stored in the file, if it exists.
+        Args:
+            - file_path (str): Path of the file where the state is stored.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        self.file_path: str = file_path
+        self.__watermarks: Dict[int, Dict[str, int]] = {}
+        self.__staged: Dict[int, Dict[str, int]] = {}
+        self.batch_id: int = 0
+        self.__journal: Dict|None = None
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path, 'r', encoding= 'utf-8') as file:
+                    state = json.load(file)
+                self.__watermarks = {int(exp_id): marks
+                                     for exp_id, marks in state['watermarks'].items()}
+                self.batch_id = state.get('batch_id', 0)
+                self.__journal = state.get('journal')
+                log.info(f"Sync state loaded with {len(self.__watermarks)} experiments")
+            except (OSError, ValueError, KeyError) as err:
+                log.error(f"Sync state in {file_path} could not be read, starting empty: {err}")
+        if self.__journal is not None and \
+                self.__journal['status'] == DbSyncBatchStatusE.PENDING.value:
+            log.warning(f"Batch {self.__journal['id']} was not confirmed, its rows will be "
+                        f"pushed again skipping the ones already in master: "
+                        f"{self.__journal['ranges']}")
+
+    def get_watermark(self, exp_id: int, table: DbSyncTableE) -> int:
+        '''Get the id of the last row of the table committed in master.
+        Args:
+            - exp_id (int): Id of the experiment.
+            - table (DbSyncTableE): Table of the rows.
+        Returns:
+            - (int): Id of the last row committed, -1 if none has been committed.
+        Raises:
+            - None
+        '''
+        return self.__watermarks.get(exp_id, {}).get(table.value, -1)
+
+    def stage_watermark(self, exp_id: int, table: DbSyncTableE, row_id: int) -> None:
+        '''Stage the id of the last row of the table pushed to master, not committed yet.
+        Args:
+            - exp_id (int): Id of the experiment.
+            - table (DbSyncTableE): Table of the rows.
+            - row_id (int): Id of the last row pushed.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        self.__staged.setdefault(exp_id, {})[table.value] = row_id
+
+    def begin_batch(self) -> int|None:
+        '''Record in the journal the batch of staged rows, before committing it in master.
+        Args:
+            - None
+        Returns:
+            - (int|None): Id of the batch, None if there are no rows staged.
+        Raises:
+            - None
+        '''
+        res = None
+        if len(self.__staged) > 0:
+            self.batch_id += 1
+            res = self.batch_id
+            ranges: Dict[str, Dict[str, List[int]]] = {}
+            for exp_id, marks in self.__staged.items():
+                ranges[str(exp_id)] = {table: [self.__watermarks.get(exp_id, {}).get(table, -1),
+                                               row_id] for table, row_id in marks.items()}
+            self.__journal = {'id': res, 'status': DbSyncBatchStatusE.PENDING.value,
+                              'ranges': ranges}
+            self.save()
+        return res
+
+    def promote(self) -> None:
+        '''Promote the staged watermarks once committed in master, and store them.
+        '''
+        if len(self.__staged) > 0:
+            for exp_id, marks in self.__staged.items():
+                self.__watermarks.setdefault(exp_id, {}).update(marks)
+            self.__staged = {}
+            self.__close_batch(DbSyncBatchStatusE.COMMITTED)
+
+    def discard(self) -> None:
+        '''Discard the staged watermarks, as their rows have not been committed.
+        '''
+        self.__staged = {}
+        self.__close_batch(DbSyncBatchStatusE.DISCARDED)
+
+    def __close_batch(self, status: DbSyncBatchStatusE) -> None:
+        if self.__journal is not None and \
+                self.__journal['status'] == DbSyncBatchStatusE.PENDING.value:
+            self.__journal['status'] = status.value
+            log.debug(f"Batch {self.__journal['id']} {status.value.lower()}")
+            self.save()
+
+    def merge(self, other: DbSyncStateC, shard: Tuple[int, int] = (0, 1)) -> None:
+        '''Add the watermarks of the experiments of the shard stored in another state, keeping
+        the highest of each table. The staged watermarks and the journal of the other state are
+        not merged, the rows of a pending batch are pushed again as they were not promoted.
+        Args:
+            - other (DbSyncStateC): State to merge.
+            - shard (Tuple[int, int]): Index of the shard and number of shards, only the
+              experiments whose id modulo the number of shards is the index are merged.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        index, n_shards = shard
+        for exp_id, marks in other.__watermarks.items():
+            if exp_id % n_shards == index:
+                own_marks = self.__watermarks.setdefault(exp_id, {})
+                for table, row_id in marks.items():
+                    own_marks[table] = max(own_marks.get(table, -1), row_id)
+        self.batch_id = max(self.batch_id, other.batch_id)
+
+    def remove_experiment(self, exp_id: int) -> None:
+        '''Forget the watermarks of an experiment whose rows have all been removed from cache.
+        Args:
+            - exp_id (int): Id of the experiment.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        self.__staged.pop(exp_id, None)
+        if self.__watermarks.pop(exp_id, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        '''Write the state to disk atomically, replacing the previous file.
+        '''
+        folder = os.path.dirname(self.file_path)
+        if folder != '':
+            os.makedirs(folder, exist_ok= True)
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w', encoding= 'utf-8') as file:
+            json.dump({'watermarks': self.__watermarks, 'batch_id': self.batch_id,
+                       'journal': self.__journal}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.file_path)
+
+#######################            FUNCTIONS             #######################
+def db_sync_state_paths(state_path: str, n_workers: int) -> List[str]:
+    '''Get the path of the state file of each worker, the index of the worker and the number
+    of workers are added to the state path when there are several workers.
+    Args:
+        - state_path (str): Path of the state file.
+        - n_workers (int): Number of workers.
+    Returns:
+        - (List[str]): Path of the state file of each worker.
+    Raises:
+        - None
+    '''
+    res = [state_path]
+    if n_workers > 1:
+        root, ext = os.path.splitext(state_path)
+        res = [f"{root}_{index}of{n_workers}{ext}" for index in range(n_workers)]
+    return res
+
+def db_sync_state_migrate(state_path: str, n_workers: int) -> None:
+    '''Move to the state files of the workers the watermarks stored by a different number of
+    workers, so changing the number of workers does not push again the rows already in master.
+    The previous files are removed once the new ones have been written.
+    Args:
+        - state_path (str): Path of the state file.
+        - n_workers (int): Number of workers.
+    Returns:
+        - None
+    Raises:
+        - None
+    '''
+    paths = db_sync_state_paths(state_path, n_workers)
+    root, ext = os.path.splitext(state_path)
+    pattern = re.compile(re.escape(root) + r'_\d+of\d+' + re.escape(ext))
+    old_paths = sorted(path for path in glob(glob_escape(root) + '_*of*' + glob_escape(ext))
+                       if pattern.fullmatch(path) and path not in paths)
+    if os.path.isfile(state_path) and state_path not in paths:
+        old_paths.append(state_path)
+    if len(old_paths) > 0:
+        log.warning(f"Sync state stored by a different number of workers in {old_paths}, "
+                    f"moving it to {paths}")
+        old_states = [DbSyncStateC(path) for path in old_paths]
+        for index, path in enumerate(paths):
+            state = DbSyncStateC(path)
+            for old_state in old_states:
+                state.merge(old_state, shard= (index, n_workers))
+            state.save()
+        for path in old_paths:
+            os.remove(path)
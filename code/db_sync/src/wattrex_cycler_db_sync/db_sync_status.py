@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+'''
+Helpers to rebuild the status timeline of the devices of an experiment. The cycler only stores
+a status row when the status changes or when the keep alive time elapses, so each row is valid
+until the next transition of the same device.
+'''
+
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+from wattrex_driver_db import DrvDbMasterStatusC
+
+#######################          MODULE IMPORTS          #######################
+
+#######################              ENUMS               #######################
+
+#######################              CLASSES             #######################
+class DbSyncStatusIntervalC():
+    '''Interval of time where a device kept the same status.
+    '''
+    def __init__(self, dev_id: int, status: str, error_code: int, start: datetime,
+                 end: datetime) -> None:
+        self.dev_id: int = dev_id
+        self.status: str = status
+        self.error_code: int = error_code
+        self.start: datetime = start
+        self.end: datetime = end
+
+    def __repr__(self) -> str:
+        return (f"DbSyncStatusIntervalC(dev_id={self.dev_id}, status={self.status}, "
+                f"error_code={self.error_code}, start={self.start}, end={self.end})")
+
+#######################            FUNCTIONS             #######################
+def db_sync_status_timeline(rows: Iterable,
+                            end: datetime|None = None) -> Dict[int, List[DbSyncStatusIntervalC]]:
+    '''Build the status intervals of each device from the status rows of an experiment.
+    Consecutive rows with the same status and error code, as the keep alive ones, are merged.
+
+    Args:
+        rows (Iterable): Status rows of the experiment, cache or master ones.
+        end (datetime|None): End of the last interval of each device, usually the finish date
+            of the experiment. If None, the timestamp of the last row of the device is used.
+    Returns:
+        Dict[int, List[DbSyncStatusIntervalC]]: Intervals of each device, sorted by start.
+    '''
+    timeline: Dict[int, List[DbSyncStatusIntervalC]] = {}
+    for row in sorted(rows, key= lambda row: (row.Timestamp, row.StatusID)):
+        intervals = timeline.setdefault(row.DevID, [])
+        if len(intervals) > 0:
+            last = intervals[-1]
+            last.end = row.Timestamp
+            if last.status == row.Status and last.error_code == row.ErrorCode:
+                continue
+        intervals.append(DbSyncStatusIntervalC(dev_id= row.DevID, status= row.Status,
+                                               error_code= row.ErrorCode,
+                                               start= row.Timestamp, end= row.Timestamp))
+    if end is not None:
+        for intervals in timeline.values():
+            intervals[-1].end = max(intervals[-1].end, end)
+    return timeline
+
+def db_sync_read_status_timeline(session: Session, exp_id: int, end: datetime|None = None,
+                                 status_model= DrvDbMasterStatusC
+                                 ) -> Dict[int, List[DbSyncStatusIntervalC]]:
+    '''Read the status rows of an experiment and build the status intervals of each device.
+
+    Args:
+        session (Session): Session of the database to read from.
+        exp_id (int): Id of the experiment.
+        end (datetime|None): End of the last interval, usually the finish date of the experiment.
+        status_model: Model of the status table, DrvDbMasterStatusC or DrvDbCacheStatusC.
+    Returns:
+        Dict[int, List[DbSyncStatusIntervalC]]: Intervals of each device, sorted by start.
+    '''
+    stmt = select(status_model).where(status_model.ExpID == exp_id).\
+        order_by(status_model.StatusID.asc())
+    rows = session.execute(stmt).scalars().all()
+    log.debug(f"Exp {exp_id} has {len(rows)} status rows")
+    return db_sync_status_timeline(rows, end= end)
+
+def db_sync_status_at(intervals: List[DbSyncStatusIntervalC],
+                      timestamp: datetime) -> DbSyncStatusIntervalC|None:
+    '''Get the status a device had at the given time.
+
+    Args:
+        intervals (List[DbSyncStatusIntervalC]): Intervals of the device, sorted by start.
+        timestamp (datetime): Time to look for.
+    Returns:
+        DbSyncStatusIntervalC|None: Interval containing the time, None if it is before the
+        first row or after the end of the timeline.
+    '''
+    res = None
+    pos = bisect_right([interval.start for interval in intervals], timestamp) - 1
+    if pos >= 0 and timestamp <= intervals[pos].end:
+        res = intervals[pos]
+    return res
@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+'''
+Workers of the sync, each one pushes a shard of the experiments of the cache with its own
+cache and master sessions.
+'''
+
+#######################        MANDATORY IMPORTS         #######################
+from __future__ import annotations
+
+#######################         GENERIC IMPORTS          #######################
+from threading import BoundedSemaphore
+from time import perf_counter, time
+from typing import Dict
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+from system_logger_tool import sys_log_logger_get_module_logger
+log = sys_log_logger_get_module_logger(__name__)
+
+#######################          PROJECT IMPORTS         #######################
+
+#######################          MODULE IMPORTS          #######################
+from .context import DEFAULT_CRED_FILEPATH, DEFAULT_STATE_PATH, DEFAULT_LAG_PERIOD
+from .db_sync_fachade import DbSyncFachadeC
+from .db_sync_metrics import DbSyncMetricsC
+from .db_sync_state import DbSyncStateC, db_sync_state_paths
+
+#######################              ENUMS               #######################
+
+#######################              CLASSES             #######################
+class DbSyncWorkerMetricsC(): #pylint: disable= too-many-instance-attributes
+    '''Metrics of a sync worker, updated once per cycle.
+    '''
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.cycles: int = 0
+        self.errors: int = 0
+        self.experiments: int = 0
+        self.rows_pushed: int = 0
+        ## Result of the last cycle, used to adapt the cadence of the sync
+        self.cycle_rows: int = 0
+        self.backlog: bool = False
+        self.commit_latency: float = 0.0
+        self.cycle_time: float = 0.0
+        self.max_cycle_time: float = 0.0
+        ## Time waiting for a free master connection
+        self.wait_time: float = 0.0
+        self.max_wait_time: float = 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.name}: cycles {self.cycles}, errors {self.errors}, "
+                f"experiments {self.experiments}, rows pushed {self.rows_pushed}, "
+                f"cycle time {self.cycle_time:.1f} ms (max {self.max_cycle_time:.1f} ms), "
+                f"master wait {self.wait_time:.1f} ms (max {self.max_wait_time:.1f} ms)")
+
+    def to_dict(self) -> Dict:
+        '''Metrics as a dictionary serializable to json.
+        '''
+        return {key: round(value, 3) if isinstance(value, float) else value
+                for key, value in vars(self).items()}
+
+    def update(self, cycle_start: float, wait_end: float) -> None:
+        '''Update the metrics at the end of a cycle.
+        Args:
+            - cycle_start (float): Time when the cycle started, express in seconds.
+            - wait_end (float): Time when the master connection was granted, express in seconds.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        now = perf_counter()
+        self.cycles += 1
+        self.cycle_time = (now - cycle_start)*1000
+        self.max_cycle_time = max(self.max_cycle_time, self.cycle_time)
+        self.wait_time = (wait_end - cycle_start)*1000
+        self.max_wait_time = max(self.max_wait_time, self.wait_time)
+
+class DbSyncWorkerC():
+    '''Sync of the experiments of a shard, the ones whose id modulo the number of workers is the
+    index of the worker. Each worker stores its watermarks in its own state file.
+    '''
+    def __init__(self, index: int, n_workers: int, master_slots: BoundedSemaphore,
+                 cred_file: str = DEFAULT_CRED_FILEPATH, state_path: str = DEFAULT_STATE_PATH,
+                 metrics: DbSyncMetricsC|None = None) -> None:
+        '''Initialize the worker and its database sessions.
+        Args:
+            - index (int): Index of the worker.
+            - n_workers (int): Number of workers of the node.
+            - master_slots (BoundedSemaphore): Slots of the master connections shared by all the
+              workers, a worker holds one during its cycle.
+            - cred_file (str): Path of the credentials file of both databases.
+            - state_path (str): Path of the state file, the index of the worker is added to it
+              when there are several workers.
+            - metrics (DbSyncMetricsC|None): Metrics of the sync shared by all the workers.
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        self.name: str = f"SYNC_WORKER_{index}"
+        state_path = db_sync_state_paths(state_path, n_workers)[index]
+        self.__master_slots: BoundedSemaphore = master_slots
+        self.fachade: DbSyncFachadeC = DbSyncFachadeC(cred_file= cred_file,
+                                                      state= DbSyncStateC(state_path),
+                                                      shard= (index, n_workers),
+                                                      metrics= metrics)
+        self.metrics: DbSyncWorkerMetricsC = DbSyncWorkerMetricsC(self.name)
+        self.__last_lag: float = 0.0
+
+    def run_cycle(self) -> None:
+        '''Push the new rows of the experiments of the shard and delete them from cache once
+        committed in master.
+        Args:
+            - None
+        Returns:
+            - None
+        Raises:
+            - None
+        '''
+        cycle_start = perf_counter()
+        self.metrics.commit_latency = 0.0
+        with self.__master_slots:
+            wait_end = perf_counter()
+            try:
+                self.fachade.push_experiments()
+                self.fachade.push_gen_meas()
+                self.fachade.commit()
+                self.metrics.commit_latency = self.fachade.commit_latency
+                log.debug(f"{self.name} commit and push of gen and exp done")
+                self.fachade.push_ext_meas()
+                self.fachade.push_alarms()
+                self.fachade.push_status()
+                self.fachade.commit()
+                self.metrics.commit_latency = max(self.metrics.commit_latency,
+                                                  self.fachade.commit_latency)
+                log.debug(f"{self.name} commit and push ext, alarms and status done")
+                self.fachade.delete_pushed_data()
+                if (time() - self.__last_lag)*1000 >= DEFAULT_LAG_PERIOD:
+                    self.fachade.update_lag()
+                    self.__last_lag = time()
+            except Exception as err: #pylint: disable= broad-exception-caught
+                self.metrics.errors += 1
+                log.error((f"{self.name} error in trying to commit to master or cache, "
+                           f"doing rollback: {err}"))
+                self.fachade.rollback()
+                # A failed commit counts as a slow one
+                self.metrics.commit_latency = max(self.metrics.commit_latency,
+                                                  self.fachade.commit_latency)
+        self.metrics.experiments = self.fachade.n_experiments
+        self.metrics.cycle_rows = self.fachade.rows_pushed - self.metrics.rows_pushed
+        self.metrics.rows_pushed = self.fachade.rows_pushed
+        self.metrics.backlog = self.fachade.backlog
+        self.metrics.update(cycle_start, wait_end)
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""
+SQLite stand-ins of the cache and master databases, shared by the tests and benchmarks of the
+db sync. The MySQL integer types are compiled as INTEGER in SQLite, so the primary keys of the
+models are auto incremented. The system logger must be initialized before importing it.
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+
+#######################         GENERIC IMPORTS          #######################
+from typing import Dict
+
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import Column, MetaData, Table, create_engine, event
+from sqlalchemy.dialects.mysql import INTEGER, MEDIUMINT, SMALLINT
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from wattrex_driver_db import (DrvDbTypeE, DrvDbAlarmC, DrvDbCacheExperimentC,
+    DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC, DrvDbCacheStatusC,
+    DrvDbMasterExperimentC, DrvDbMasterGenericMeasureC, DrvDbMasterExtendedMeasureC,
+    DrvDbMasterStatusC)
+
+######################             CONSTANTS              ######################
+CACHE_MODELS = (DrvDbCacheExperimentC, DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC,
+                DrvDbCacheStatusC, DrvDbAlarmC)
+MASTER_MODELS = (DrvDbMasterExperimentC, DrvDbMasterGenericMeasureC, DrvDbMasterExtendedMeasureC,
+                 DrvDbMasterStatusC, DrvDbAlarmC)
+
+#######################             CLASSES              #######################
+
+@compiles(MEDIUMINT, 'sqlite')
+@compiles(INTEGER, 'sqlite')
+@compiles(SMALLINT, 'sqlite')
+def _compile_int_sqlite(type_, compiler, **kw): #pylint: disable= unused-argument
+    return 'INTEGER'
+
+class SqliteEngineC:
+    """Stand-in of DrvDbSqlEngineC over a SQLite file.
+    """
+    def __init__(self, path: str) -> None:
+        self.engine = sqlite_engine(path)
+        self.session = Session(self.engine)
+
+    def commit_changes(self, raise_exception: bool = False) -> None:
+        """Commit the session, rolling it back on error."""
+        try:
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            if raise_exception:
+                raise
+
+    def close_connection(self) -> None:
+        """Close the session."""
+        self.session.close()
+
+    def reset(self) -> None:
+        """Roll back the session."""
+        self.session.rollback()
+
+#######################            FUNCTIONS             #######################
+
+def sqlite_engine(path: str) -> Engine:
+    """Engine of a SQLite file shared by several threads, in WAL mode so the readers do not
+    block the writer.
+    """
+    engine = create_engine(f'sqlite:///{path}',
+                           connect_args= {'check_same_thread': False, 'timeout': 60})
+    @event.listens_for(engine, 'connect')
+    def _set_wal(dbapi_con, con_record): #pylint: disable= unused-argument
+        dbapi_con.execute('PRAGMA journal_mode=WAL')
+        dbapi_con.execute('PRAGMA synchronous=NORMAL')
+    return engine
+
+def create_tables(engine: Engine, *models) -> None:
+    """Create the tables of the models, without foreign keys.
+    """
+    metadata = MetaData()
+    for model in models:
+        Table(model.__table__.name, metadata, *[Column(col.name, col.type,
+              primary_key= col.primary_key, nullable= col.nullable)
+              for col in model.__table__.columns])
+    metadata.create_all(engine)
+
+def create_databases(folder: str) -> Dict[DrvDbTypeE, str]:
+    """Create the cache and master tables in two SQLite files of the folder.
+    Returns:
+        - (Dict[DrvDbTypeE, str]): Path of the file of each database.
+    """
+    paths = {DrvDbTypeE.CACHE_DB: os.path.join(folder, 'cache.db'),
+             DrvDbTypeE.MASTER_DB: os.path.join(folder, 'master.db')}
+    for db_type, models in ((DrvDbTypeE.CACHE_DB, CACHE_MODELS),
+                            (DrvDbTypeE.MASTER_DB, MASTER_MODELS)):
+        engine = sqlite_engine(paths[db_type])
+        create_tables(engine, *models)
+        engine.dispose()
+    return paths
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+"""
+Load benchmark of DbSyncNodeC, using SQLite databases as stand-ins of the cache and master
+databases. A generator inserts in cache the measures of N stations at R Hz with M extended
+measures each while the node syncs them, and the throughput, lag and memory of the sync are
+reported. Once the load stops, the experiments are finished and the time to drain the cache
+is measured too.
+Run from the repository root:
+    python code/db_sync/tests/bench_db_sync.py --stations 8 --rate 10 --ext 20 --seconds 30
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+import resource
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from typing import Dict, List
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="bench_db_sync")
+
+#######################       THIRD PARTY IMPORTS        #######################
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Engine
+from wattrex_driver_db import (DrvDbTypeE, DrvDbExpStatusE, DrvDbCacheExperimentC,
+    DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC, DrvDbCacheStatusC,
+    DrvDbMasterGenericMeasureC)
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync import db_sync_fachade
+from src.wattrex_cycler_db_sync.db_sync_chunks import DbSyncExtStorageE
+from src.wattrex_cycler_db_sync.db_sync_node import DbSyncNodeC
+from _db_sync_sqlite_standin import SqliteEngineC, create_databases, sqlite_engine
+
+######################             CONSTANTS              ######################
+TICK = 0.1 # Period of the generator, express in seconds
+LAG_PERIOD = 1.0 # Period of the lag samples, express in seconds
+DRAIN_TIMEOUT = 600.0 # Max time to drain the cache once the load stops, express in seconds
+
+#######################             CLASSES              #######################
+
+class _StationsLoadC(Thread):
+    """Generator of the measures of the stations, one running experiment per station with a
+    generic measure per sample, M extended measures per sample and a status per second.
+    """
+    def __init__(self, engine: Engine, n_stations: int, rate: float, n_ext: int) -> None:
+        super().__init__(name= 'BENCH_LOAD', daemon= True)
+        self.engine: Engine = engine
+        self.exp_ids: List[int] = list(range(1, n_stations + 1))
+        self.rate: float = rate
+        self.n_ext: int = n_ext
+        self.working_flag: Event = Event()
+        self.lock: Lock = Lock()
+        ## Samples generated of each experiment
+        self.samples: Dict[int, int] = {exp_id: 0 for exp_id in self.exp_ids}
+        self.insert_time: float = 0.0
+
+    def create_experiments(self) -> None:
+        """Insert the running experiments in cache."""
+        now = datetime.now()
+        with self.engine.begin() as con:
+            con.execute(insert(DrvDbCacheExperimentC.__table__), [{'ExpID': exp_id,
+                'Name': f'bench_{exp_id}', 'Description': 'bench', 'DateCreation': now,
+                'DateBegin': now, 'DateFinish': None, 'Status': DrvDbExpStatusE.RUNNING.value,
+                'CSID': exp_id, 'BatID': 1, 'ProfID': 1} for exp_id in self.exp_ids])
+
+    def finish_experiments(self) -> None:
+        """Set all the experiments as finished."""
+        table = DrvDbCacheExperimentC.__table__
+        with self.engine.begin() as con:
+            con.execute(update(table).values(Status= DrvDbExpStatusE.FINISHED.value,
+                                             DateFinish= datetime.now()))
+
+    def stop(self) -> None:
+        """Stop the generator and wait for it."""
+        self.working_flag.clear()
+        self.join()
+
+    def run(self) -> None:
+        self.working_flag.set()
+        start = perf_counter()
+        while self.working_flag.is_set():
+            tick_start = perf_counter()
+            target = int((tick_start - start) * self.rate)
+            now = datetime.now()
+            gen, ext, status = [], [], []
+            for exp_id in self.exp_ids:
+                for meas_id in range(self.samples[exp_id], target):
+                    gen.append({'ExpID': exp_id, 'MeasID': meas_id, 'Timestamp': now,
+                                'InstrID': 1, 'Voltage': 3600 + meas_id % 500,
+                                'Current': 1000, 'Power': 3600, 'PowerMode': 'CC_MODE'})
+                    ext.extend({'ExpID': exp_id, 'MeasID': meas_id, 'UsedMeasID': used_meas_id,
+                                'Value': 250 + (meas_id + used_meas_id) % 7}
+                               for used_meas_id in range(1, self.n_ext + 1))
+                    if meas_id % max(int(self.rate), 1) == 0:
+                        status.append({'ExpID': exp_id, 'StatusID': meas_id, 'DevID': 1,
+                                       'Timestamp': now, 'Status': 'OK', 'ErrorCode': 0})
+            if len(gen) > 0:
+                with self.engine.begin() as con:
+                    con.execute(insert(DrvDbCacheGenericMeasureC.__table__), gen)
+                    if len(ext) > 0:
+                        con.execute(insert(DrvDbCacheExtendedMeasureC.__table__), ext)
+                    if len(status) > 0:
+                        con.execute(insert(DrvDbCacheStatusC.__table__), status)
+                with self.lock:
+                    for exp_id in self.exp_ids:
+                        self.samples[exp_id] = target
+                self.insert_time += perf_counter() - tick_start
+            sleep(max(0.0, TICK - (perf_counter() - tick_start)))
+
+#######################            FUNCTIONS             #######################
+
+def master_samples(engine: Engine) -> Dict[int, int]:
+    """Generic measures of each experiment already committed in master."""
+    table = DrvDbMasterGenericMeasureC.__table__
+    with engine.connect() as con:
+        return dict(con.execute(select(table.c.ExpID, func.count()).group_by(table.c.ExpID)).all())
+
+def sample_lag(load: _StationsLoadC, master: Engine) -> Dict[str, float]:
+    """Generic measures generated but not yet committed in master, in total and for the most
+    delayed experiment, whose age follows from the rate of the load.
+    """
+    with load.lock:
+        generated = dict(load.samples)
+    pushed = master_samples(master)
+    lags = [generated[exp_id] - pushed.get(exp_id, 0) for exp_id in generated]
+    return {'rows': sum(lags), 'seconds': max(lags) / load.rate if load.rate > 0 else 0.0}
+
+def peak_rss() -> float:
+    """Peak resident memory of the process, express in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform != 'darwin' else peak / 1024**2
+
+def run_node(node: DbSyncNodeC, until, on_sample) -> None:
+    """Run iterations of the node at its adaptive period until the condition is met, sampling
+    the lag every LAG_PERIOD.
+    """
+    last_sample = perf_counter()
+    while not until():
+        iteration_start = perf_counter()
+        node.process_iteration()
+        if perf_counter() - last_sample >= LAG_PERIOD:
+            on_sample()
+            last_sample = perf_counter()
+        sleep(max(0.0, node.cycle_period/1000 - (perf_counter() - iteration_start)))
+
+def parse_args() -> Namespace:
+    """Arguments of the benchmark."""
+    parser = ArgumentParser(description= __doc__.split('\n', maxsplit= 2)[1])
+    parser.add_argument('--stations', type= int, default= 8, help= 'stations generating data')
+    parser.add_argument('--rate', type= float, default= 10, help= 'samples per second')
+    parser.add_argument('--ext', type= int, default= 20, help= 'extended measures per sample')
+    parser.add_argument('--seconds', type= float, default= 30, help= 'duration of the load')
+    parser.add_argument('--workers', type= int, default= 1, help= 'sync workers of the node')
+    parser.add_argument('--ext-storage', default= DbSyncExtStorageE.ROWS.value,
+                        choices= [storage.value for storage in DbSyncExtStorageE])
+    parser.add_argument('--trace-memory', action= 'store_true',
+                        help= 'trace the python allocations, slower but more precise')
+    return parser.parse_args()
+
+def main() -> None: #pylint: disable= too-many-locals
+    """Run the load while the node syncs it, then drain the cache and print the results.
+    """
+    args = parse_args()
+    with TemporaryDirectory(prefix= 'bench_db_sync_') as folder:
+        paths = create_databases(folder)
+        db_sync_fachade.DrvDbSqlEngineC = lambda db_type, config_file: \
+            SqliteEngineC(paths[db_type])
+        cache, master = (sqlite_engine(paths[DrvDbTypeE.CACHE_DB]),
+                         sqlite_engine(paths[DrvDbTypeE.MASTER_DB]))
+        load = _StationsLoadC(cache, args.stations, args.rate, args.ext)
+        load.create_experiments()
+        rss_start = peak_rss()
+        if args.trace_memory:
+            tracemalloc.start()
+        node = DbSyncNodeC(working_flag= Event(), cred_file= 'bench', n_workers= args.workers,
+                           state_path= os.path.join(folder, 'state.json'))
+        for worker in node.workers:
+            worker.fachade.ext_storage = DbSyncExtStorageE(args.ext_storage)
+        print(f"{args.stations} stations at {args.rate:g} Hz with {args.ext} extended measures, "
+              f"{args.workers} workers, {args.ext_storage.lower()} storage, "
+              f"{args.seconds:g} s of load")
+
+        lags: List[Dict[str, float]] = []
+        load.start()
+        start = perf_counter()
+        run_node(node, until= lambda: perf_counter() - start >= args.seconds,
+                 on_sample= lambda: lags.append(sample_lag(load, master)))
+        load.stop()
+        live_time = perf_counter() - start
+        live_rows = dict(node.metrics.to_dict()['rows'])
+        final_lag = sample_lag(load, master)
+
+        load.finish_experiments()
+        total = sum(load.samples.values())
+        start = perf_counter()
+        run_node(node, until= lambda: sum(master_samples(master).values()) >= total or
+                 perf_counter() - start >= DRAIN_TIMEOUT, on_sample= lambda: None)
+        drain_time = perf_counter() - start
+        snapshot = node.snapshot()
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        node.stop()
+
+        gen_rows = live_rows.get('gen_meas', 0)
+        generated = total * (1 + args.ext)
+        print(f"generated : {total} samples, {generated} rows, "
+              f"{generated / live_time:9.1f} rows/s "
+              f"(generator busy {load.insert_time / live_time * 100:.0f} %)")
+        print(f"live      : {sum(live_rows.values())} rows pushed, "
+              f"{sum(live_rows.values()) / live_time:9.1f} rows/s, "
+              f"{gen_rows / live_time:9.1f} gen/s")
+        if len(lags) > 0:
+            print(f"lag       : mean {sum(lag['rows'] for lag in lags) / len(lags):.0f} rows, "
+                  f"max {max(lag['rows'] for lag in lags)} rows / "
+                  f"{max(lag['seconds'] for lag in lags):.1f} s, "
+                  f"at the end {final_lag['rows']} rows / {final_lag['seconds']:.1f} s")
+        print(f"drain     : {drain_time:.2f} s, "
+              f"{sum(master_samples(master).values())}/{total} samples in master")
+        for phase, histogram in snapshot['latency'].items():
+            if histogram['count'] > 0:
+                print(f"{phase:>10}: {histogram['count']} times, mean "
+                      f"{histogram['sum_ms'] / histogram['count']:.1f} ms, "
+                      f"max {histogram['max_ms']:.1f} ms")
+        print(f"cadence   : period {snapshot['cadence']['period_ms']} ms, "
+              f"batch {snapshot['cadence']['batch_size']}")
+        print(f"memory    : peak rss {peak_rss():.1f} MiB "
+              f"(+{peak_rss() - rss_start:.1f} MiB while syncing)"
+              + (f", python peak {traced_peak / 1024**2:.1f} MiB" if traced_peak else ""))
+        cache.dispose()
+        master.dispose()
+
+if __name__ == '__main__':
+    main()
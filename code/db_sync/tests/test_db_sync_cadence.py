@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""
+This file test the adaptive period and batch size of the db sync.
+COMMAND: clear && pytest code/db_sync/tests/test_db_sync_cadence.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_db_sync_cadence")
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync.db_sync_cadence import DbSyncCadenceC, DbSyncCadenceE
+
+#######################             CLASSES              #######################
+
+class TestSyncCadence:
+    '''Test the decisions of the cadence controller.'''
+
+    @staticmethod
+    def _cadence() -> DbSyncCadenceC:
+        return DbSyncCadenceC(period= 500, batch_size= 1000, period_bounds= (50, 5000),
+                              batch_bounds= (200, 8000), max_commit_latency= 1000)
+
+    def test_backlog_and_idle(self) -> None:
+        """The sync speeds up while there is backlog, and slows down within the bounds
+        once there is nothing to push.
+        """
+        cadence = self._cadence()
+        for _ in range(10):
+            assert cadence.update(backlog= True, rows= 1000, commit_latency= 10) \
+                is DbSyncCadenceE.BACKLOG
+        assert (cadence.period, cadence.batch_size) == (50, 8000)
+        for _ in range(10):
+            assert cadence.update(backlog= False, rows= 0, commit_latency= 0) \
+                is DbSyncCadenceE.IDLE
+        assert cadence.period == 5000
+        cadence.update(backlog= False, rows= 10, commit_latency= 10)
+        assert cadence.decision is DbSyncCadenceE.STEADY and cadence.period == 2500
+        assert cadence.decisions[DbSyncCadenceE.BACKLOG] == 10
+
+    def test_backoff(self) -> None:
+        """Slow commits shrink the batch and lengthen the period even with backlog.
+        """
+        cadence = self._cadence()
+        for _ in range(5):
+            assert cadence.update(backlog= True, rows= 1000, commit_latency= 1500) \
+                is DbSyncCadenceE.BACKOFF
+        assert (cadence.period, cadence.batch_size) == (5000, 200)
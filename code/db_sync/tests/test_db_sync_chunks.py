@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""
+This file test the columnar chunks of extended measures stored by the db sync.
+COMMAND: clear && pytest code/db_sync/tests/test_db_sync_chunks.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from random import Random
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_db_sync_chunks")
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync.db_sync_chunks import (db_sync_build_ext_chunks,
+                                                       db_sync_decode_chunk, db_sync_encode_chunk)
+
+#######################             CLASSES              #######################
+
+class TestExtChunks:
+    '''Test the encoding of the chunks and the packing of the extended measures.'''
+
+    def test_codec(self) -> None:
+        """Columns are decoded back exactly, and slow changing values compress well.
+        """
+        rand = Random(0)
+        temperature = [250 + rand.randint(-2, 2) for _ in range(1000)]
+        values = [0, -1, 1, -8388608, 8388607, 2**40, -2**40] + temperature
+        assert db_sync_decode_chunk(db_sync_encode_chunk(values)).tolist() == values
+        assert db_sync_decode_chunk(db_sync_encode_chunk([])).tolist() == []
+        encoded = db_sync_encode_chunk(temperature)
+        log.info(f"1000 temperatures encoded in {len(encoded)} bytes")
+        assert len(encoded) < 1000
+
+    def test_build(self) -> None:
+        """Only full chunks are packed until the experiment is complete.
+        """
+        rows = [(meas_id, used_meas_id, meas_id * 10 + used_meas_id)
+                for meas_id in range(5, 30) for used_meas_id in (1, 2)]
+        chunks, last = db_sync_build_ext_chunks(7, rows, chunk_size= 10, complete= False)
+        assert last == 24 and len(chunks) == 4
+        assert [(c['UsedMeasID'], c['FirstMeasID'], c['LastMeasID'], c['NSamples'])
+                for c in chunks] == [(1, 5, 14, 10), (1, 15, 24, 10), (2, 5, 14, 10),
+                                     (2, 15, 24, 10)]
+        assert db_sync_decode_chunk(chunks[1]['Values']).tolist() == \
+            [meas_id * 10 + 1 for meas_id in range(15, 25)]
+        chunks, last = db_sync_build_ext_chunks(7, rows, chunk_size= 10, complete= True)
+        assert last == 29 and chunks[-1]['NSamples'] == 5
+        assert db_sync_build_ext_chunks(7, rows[:6], chunk_size= 10, complete= False) == ([], None)
@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+"""
+This file test the copy of the rows from cache to master done by the db sync, using SQLite
+databases as stand-ins of both databases.
+COMMAND: clear && pytest code/db_sync/tests/test_db_sync_fachade.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+import json
+from datetime import datetime
+from typing import Dict
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_db_sync_fachade")
+
+#######################       THIRD PARTY IMPORTS        #######################
+import pytest
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.dialects import mysql
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from wattrex_driver_db import (DrvDbTypeE, DrvDbExpStatusE, DrvDbCacheExperimentC,
+    DrvDbCacheGenericMeasureC, DrvDbCacheExtendedMeasureC, DrvDbMasterExperimentC,
+    DrvDbMasterGenericMeasureC, DrvDbMasterExtendedMeasureC)
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync import db_sync_fachade
+from src.wattrex_cycler_db_sync.db_sync_fachade import (DbSyncFachadeC, _DriverStmtC,
+                                                        _insert_ignore)
+from src.wattrex_cycler_db_sync.db_sync_state import (DbSyncStateC, DbSyncTableE,
+                                                      DbSyncBatchStatusE)
+from _db_sync_sqlite_standin import (SqliteEngineC, create_databases, create_tables,
+                                     sqlite_engine)
+
+######################             CONSTANTS              ######################
+EXP_ID = 4
+N_SAMPLES = 10
+N_EXT = 2 # Extended measures of each sample
+
+#######################            FUNCTIONS             #######################
+
+def _sync_databases(folder, monkeypatch) -> Dict[DrvDbTypeE, Engine]:
+    """Create the cache and master databases in two SQLite files used by the facades created
+    afterwards. The cache has a running experiment with its measures.
+    """
+    paths = create_databases(str(folder))
+    engines = {db_type: sqlite_engine(path) for db_type, path in paths.items()}
+    monkeypatch.setattr(db_sync_fachade, 'DrvDbSqlEngineC', lambda db_type, config_file:
+                        SqliteEngineC(paths[db_type]))
+    now = datetime(2024, 1, 1)
+    with engines[DrvDbTypeE.CACHE_DB].begin() as con:
+        con.execute(insert(DrvDbCacheExperimentC.__table__), {'ExpID': EXP_ID,
+            'Name': 'test', 'Description': 'test', 'DateCreation': now, 'DateBegin': now,
+            'DateFinish': None, 'Status': DrvDbExpStatusE.RUNNING.value, 'CSID': 1, 'BatID': 1,
+            'ProfID': 1})
+        con.execute(insert(DrvDbCacheGenericMeasureC.__table__), [{'ExpID': EXP_ID,
+            'MeasID': meas_id, 'Timestamp': now, 'InstrID': 1, 'Voltage': 3600 + meas_id,
+            'Current': 1000, 'Power': 3600, 'PowerMode': 'CC_MODE'}
+            for meas_id in range(N_SAMPLES)])
+        con.execute(insert(DrvDbCacheExtendedMeasureC.__table__), [{'ExpID': EXP_ID,
+            'MeasID': meas_id, 'UsedMeasID': used_meas_id, 'Value': meas_id * used_meas_id}
+            for meas_id in range(N_SAMPLES) for used_meas_id in range(1, N_EXT + 1)])
+    return engines
+
+def _finish_experiment(engines: Dict[DrvDbTypeE, Engine]) -> None:
+    with engines[DrvDbTypeE.CACHE_DB].begin() as con:
+        con.execute(update(DrvDbCacheExperimentC.__table__).
+                    values(Status= DrvDbExpStatusE.FINISHED.value))
+
+def _meas_ids(engine: Engine, model) -> list:
+    """MeasID of the measures of a table, once per row."""
+    with engine.connect() as con:
+        return [row[0] for row in con.execute(select(model.MeasID).order_by(model.MeasID))]
+
+def _run_cycle(fachade: DbSyncFachadeC) -> None:
+    """Cycle of a sync worker, see DbSyncWorkerC.run_cycle."""
+    fachade.push_experiments()
+    fachade.push_gen_meas()
+    fachade.commit()
+    fachade.push_ext_meas()
+    fachade.push_alarms()
+    fachade.push_status()
+    fachade.commit()
+    fachade.delete_pushed_data()
+
+#######################             TESTS                #######################
+
+class TestInsertIgnore:
+    '''Test the statements used to insert the rows in master.'''
+
+    def test_driver_stmt(self) -> None:
+        """Rows given in any column order are inserted, and the ones already stored skipped.
+        """
+        engine = create_engine('sqlite://')
+        table = DrvDbMasterExtendedMeasureC.__table__
+        create_tables(engine, DrvDbMasterExtendedMeasureC)
+        names = ('Value', 'UsedMeasID', 'MeasID', 'ExpID')
+        stmt = _DriverStmtC(_insert_ignore(table, engine.dialect, names), engine.dialect, names)
+        assert stmt.positional and stmt.order != tuple(range(len(names)))
+        with Session(engine) as session:
+            stmt.execute(session, [(10, 1, 0, EXP_ID), (20, 2, 0, EXP_ID)])
+            stmt.execute(session, [(99, 2, 0, EXP_ID), (30, 1, 1, EXP_ID)])
+            session.commit()
+            rows = session.execute(select(table.c.MeasID, table.c.UsedMeasID, table.c.Value).
+                                   order_by(table.c.MeasID, table.c.UsedMeasID)).all()
+        assert rows == [(0, 1, 10), (0, 2, 20), (1, 1, 30)]
+
+    def test_mysql_statement(self) -> None:
+        """Duplicated rows are skipped in MySQL with a no-op update of the key.
+        """
+        table = DrvDbMasterGenericMeasureC.__table__
+        columns = tuple(col.name for col in table.columns)
+        stmt = str(_insert_ignore(table, mysql.dialect(), columns).
+                   compile(dialect= mysql.dialect())).replace('`', '')
+        key = table.primary_key.columns.values()[0].name
+        assert 'IGNORE' not in stmt
+        assert f"ON DUPLICATE KEY UPDATE {key} = VALUES({key})" in stmt
+
+class TestSyncFachade:
+    '''Test the copy of the measures from cache to master.'''
+
+    def test_copy_pages(self, tmp_path, monkeypatch) -> None:
+        """The measures are copied in several batches and insert statements, the last sample
+        of a running experiment is kept until it finishes, and the rows committed in master are
+        removed from cache.
+        """
+        engines = _sync_databases(tmp_path, monkeypatch)
+        cache, master = engines[DrvDbTypeE.CACHE_DB], engines[DrvDbTypeE.MASTER_DB]
+        state = DbSyncStateC(str(tmp_path / 'state.json'))
+        fachade = DbSyncFachadeC(cred_file= 'test', batch_size= 4, copy_chunk= 3, state= state)
+        _run_cycle(fachade)
+        assert fachade.backlog
+        assert _meas_ids(master, DrvDbMasterGenericMeasureC) == list(range(4))
+        assert _meas_ids(master, DrvDbMasterExtendedMeasureC) == \
+            [meas_id for meas_id in range(4) for _ in range(N_EXT)]
+        assert _meas_ids(cache, DrvDbCacheGenericMeasureC) == list(range(4, N_SAMPLES))
+        _run_cycle(fachade)
+        _run_cycle(fachade)
+        assert not fachade.backlog
+        assert _meas_ids(master, DrvDbMasterGenericMeasureC) == list(range(N_SAMPLES - 1))
+        assert _meas_ids(cache, DrvDbCacheGenericMeasureC) == [N_SAMPLES - 1]
+        assert state.get_watermark(EXP_ID, DbSyncTableE.EXT_MEAS) == N_SAMPLES - 2
+        with master.connect() as con:
+            values = con.execute(select(func.sum(DrvDbMasterExtendedMeasureC.Value))).scalar()
+        assert values == sum(meas_id * used_meas_id for meas_id in range(N_SAMPLES - 1)
+                             for used_meas_id in range(1, N_EXT + 1))
+        assert fachade.rows_pushed == (N_SAMPLES - 1) * (1 + N_EXT)
+
+    def test_drained(self, tmp_path, monkeypatch) -> None:
+        """A finished experiment is removed from cache and from the state once all its rows
+        are committed in master.
+        """
+        engines = _sync_databases(tmp_path, monkeypatch)
+        cache, master = engines[DrvDbTypeE.CACHE_DB], engines[DrvDbTypeE.MASTER_DB]
+        state = DbSyncStateC(str(tmp_path / 'state.json'))
+        fachade = DbSyncFachadeC(cred_file= 'test', batch_size= 4, state= state)
+        _run_cycle(fachade)
+        _finish_experiment(engines)
+        _run_cycle(fachade)
+        assert fachade.n_experiments == 1
+        assert _meas_ids(cache, DrvDbCacheGenericMeasureC) == list(range(8, N_SAMPLES))
+        _run_cycle(fachade)
+        assert fachade.n_experiments == 0
+        assert _meas_ids(master, DrvDbMasterGenericMeasureC) == list(range(N_SAMPLES))
+        assert len(_meas_ids(master, DrvDbMasterExtendedMeasureC)) == N_SAMPLES * N_EXT
+        with cache.connect() as con:
+            assert con.execute(select(func.count()).
+                               select_from(DrvDbCacheExperimentC.__table__)).scalar() == 0
+        assert not _meas_ids(cache, DrvDbCacheGenericMeasureC)
+        assert not _meas_ids(cache, DrvDbCacheExtendedMeasureC)
+        with master.connect() as con:
+            assert con.execute(select(DrvDbMasterExperimentC.Status)).scalar() == \
+                DrvDbExpStatusE.FINISHED.value
+        with open(tmp_path / 'state.json', 'r', encoding= 'utf-8') as file:
+            assert json.load(file)['watermarks'] == {}
+
+    def test_pending_batch(self, tmp_path, monkeypatch) -> None:
+        """Rows of a batch committed in master but not promoted in the state are pushed again
+        after a restart, skipping the ones already stored.
+        """
+        engines = _sync_databases(tmp_path, monkeypatch)
+        master = engines[DrvDbTypeE.MASTER_DB]
+        state_path = str(tmp_path / 'state.json')
+        state = DbSyncStateC(state_path)
+        fachade = DbSyncFachadeC(cred_file= 'test', batch_size= 4, state= state)
+        fachade.push_experiments()
+        fachade.push_gen_meas()
+        def _crash() -> None:
+            raise RuntimeError('stopped before the promotion')
+        monkeypatch.setattr(state, 'promote', _crash)
+        with pytest.raises(RuntimeError):
+            fachade.commit()
+        assert _meas_ids(master, DrvDbMasterGenericMeasureC) == list(range(4))
+
+        restarted = DbSyncStateC(state_path)
+        with open(state_path, 'r', encoding= 'utf-8') as file:
+            assert json.load(file)['journal']['status'] == DbSyncBatchStatusE.PENDING.value
+        assert restarted.get_watermark(EXP_ID, DbSyncTableE.GEN_MEAS) == -1
+        fachade = DbSyncFachadeC(cred_file= 'test', batch_size= 6, state= restarted)
+        _run_cycle(fachade)
+        assert restarted.get_watermark(EXP_ID, DbSyncTableE.GEN_MEAS) == 5
+        assert _meas_ids(master, DrvDbMasterGenericMeasureC) == list(range(6))
+        with open(state_path, 'r', encoding= 'utf-8') as file:
+            assert json.load(file)['journal']['status'] == DbSyncBatchStatusE.COMMITTED.value
+
+    def test_delete_promoted(self, tmp_path, monkeypatch) -> None:
+        """Only the rows up to the promoted watermarks are deleted from cache, not the ones
+        pushed and not committed yet.
+        """
+        engines = _sync_databases(tmp_path, monkeypatch)
+        cache = engines[DrvDbTypeE.CACHE_DB]
+        state = DbSyncStateC(str(tmp_path / 'state.json'))
+        fachade = DbSyncFachadeC(cred_file= 'test', batch_size= 4, state= state)
+        fachade.push_experiments()
+        fachade.push_gen_meas()
+        fachade.commit()
+        fachade.push_gen_meas()
+        fachade.delete_pushed_data()
+        assert state.get_watermark(EXP_ID, DbSyncTableE.GEN_MEAS) == 3
+        assert _meas_ids(cache, DrvDbCacheGenericMeasureC) == list(range(4, N_SAMPLES))
+        assert len(_meas_ids(cache, DrvDbCacheExtendedMeasureC)) == N_SAMPLES * N_EXT
+        fachade.rollback()
+        fachade.push_gen_meas()
+        fachade.commit()
+        fachade.delete_pushed_data()
+        assert _meas_ids(cache, DrvDbCacheGenericMeasureC) == list(range(8, N_SAMPLES))
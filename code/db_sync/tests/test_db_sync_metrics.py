@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+"""
+This file test the metrics of the db sync and their http endpoint.
+COMMAND: clear && pytest code/db_sync/tests/test_db_sync_metrics.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+import json
+from urllib.request import urlopen
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_db_sync_metrics")
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync.db_sync_metrics import (DbSyncMetricsC, DbSyncMetricsServerC,
+                                                        DbSyncPhaseE)
+
+#######################             CLASSES              #######################
+
+class TestSyncMetrics:
+    '''Test the metrics recorded by the sync.'''
+
+    def test_snapshot(self) -> None:
+        """Latencies are counted in cumulative buckets, and the lag of finished experiments
+        is removed.
+        """
+        metrics = DbSyncMetricsC()
+        for latency in (0.5, 3, 40, 20000):
+            metrics.observe_phase(DbSyncPhaseE.COMMIT, latency)
+        metrics.add_rows('gen_meas', 1000, 0.5)
+        metrics.set_lag(1, 200, 1.5)
+        metrics.set_lag(2, 0, 0.0)
+        metrics.remove_experiment(2)
+        snapshot = json.loads(json.dumps(metrics.to_dict()))
+        commit = snapshot['latency']['commit']
+        assert commit['count'] == 4 and commit['max_ms'] == 20000
+        assert (commit['buckets']['1'], commit['buckets']['50'], commit['buckets']['inf']) == \
+            (1, 3, 4)
+        assert snapshot['latency']['read']['count'] == 0
+        assert snapshot['rows_per_second'] == {'gen_meas': 2000.0}
+        assert snapshot['lag'] == {'1': {'rows': 200, 'seconds': 1.5}}
+
+    def test_server(self) -> None:
+        """The metrics are served as json in the local endpoint.
+        """
+        server = DbSyncMetricsServerC(lambda: {'rows': {'gen_meas': 1}}, port= 0)
+        try:
+            with urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout= 5) as response:
+                assert json.loads(response.read()) == {'rows': {'gen_meas': 1}}
+        finally:
+            server.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+This file test the watermarks and batch journal stored by the db sync.
+COMMAND: clear && pytest code/db_sync/tests/test_db_sync_state.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+import json
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_db_sync_state")
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync.db_sync_state import (DbSyncStateC, DbSyncTableE,
+                                                      DbSyncBatchStatusE, db_sync_state_paths,
+                                                      db_sync_state_migrate)
+
+#######################             CLASSES              #######################
+
+class TestSyncState:
+    '''Test the watermarks and the batch journal of the sync state.'''
+
+    def test_batch_committed(self, tmp_path) -> None:
+        """Staged watermarks are only visible once the batch is committed.
+        """
+        file_path = str(tmp_path / 'state.json')
+        state = DbSyncStateC(file_path)
+        state.stage_watermark(1, DbSyncTableE.GEN_MEAS, 99)
+        assert state.begin_batch() == 1
+        assert state.get_watermark(1, DbSyncTableE.GEN_MEAS) == -1
+        state.promote()
+        assert state.get_watermark(1, DbSyncTableE.GEN_MEAS) == 99
+        assert state.begin_batch() is None
+        with open(file_path, 'r', encoding= 'utf-8') as file:
+            journal = json.load(file)['journal']
+        assert journal == {'id': 1, 'status': DbSyncBatchStatusE.COMMITTED.value,
+                           'ranges': {'1': {'gen_meas': [-1, 99]}}}
+
+    def test_batch_pending(self, tmp_path) -> None:
+        """A batch interrupted during the commit keeps the previous watermarks after a restart.
+        """
+        file_path = str(tmp_path / 'state.json')
+        state = DbSyncStateC(file_path)
+        state.stage_watermark(1, DbSyncTableE.GEN_MEAS, 9)
+        state.begin_batch()
+        state.promote()
+        state.stage_watermark(1, DbSyncTableE.GEN_MEAS, 19)
+        state.stage_watermark(1, DbSyncTableE.STATUS, 2)
+        state.begin_batch()
+        restarted = DbSyncStateC(file_path)
+        assert restarted.batch_id == 2
+        assert restarted.get_watermark(1, DbSyncTableE.GEN_MEAS) == 9
+        assert restarted.get_watermark(1, DbSyncTableE.STATUS) == -1
+        restarted.stage_watermark(1, DbSyncTableE.GEN_MEAS, 19)
+        assert restarted.begin_batch() == 3
+
+    def test_workers_changed(self, tmp_path) -> None:
+        """The watermarks stored by a different number of workers are moved to the shards of
+        the new workers, and the previous files removed.
+        """
+        state_path = str(tmp_path / 'state.json')
+        assert db_sync_state_paths(state_path, 1) == [state_path]
+        old_paths = db_sync_state_paths(state_path, 2)
+        assert old_paths == [str(tmp_path / 'state_0of2.json'), str(tmp_path / 'state_1of2.json')]
+        for index, path in enumerate(old_paths):
+            state = DbSyncStateC(path)
+            for exp_id in range(index, 6, 2):
+                state.stage_watermark(exp_id, DbSyncTableE.GEN_MEAS, 10 * exp_id)
+            state.begin_batch()
+            state.promote()
+        # A batch not confirmed is pushed again after the migration
+        state.stage_watermark(5, DbSyncTableE.GEN_MEAS, 99)
+        state.begin_batch()
+        (tmp_path / 'state_other.json').write_text('{}', encoding= 'utf-8')
+        db_sync_state_migrate(state_path, 3)
+        new_paths = db_sync_state_paths(state_path, 3)
+        assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(path) for path in
+                                                       new_paths] + ['state_other.json'])
+        for index, path in enumerate(new_paths):
+            state = DbSyncStateC(path)
+            for exp_id in range(6):
+                expected = 10 * exp_id if exp_id % 3 == index else -1
+                assert state.get_watermark(exp_id, DbSyncTableE.GEN_MEAS) == expected
+            assert state.batch_id == 2
+        db_sync_state_migrate(state_path, 1)
+        state = DbSyncStateC(state_path)
+        assert [state.get_watermark(exp_id, DbSyncTableE.GEN_MEAS) for exp_id in range(6)] == \
+            [0, 10, 20, 30, 40, 50]
+        db_sync_state_migrate(state_path, 1)
+        assert sorted(os.listdir(tmp_path)) == ['state.json', 'state_other.json']
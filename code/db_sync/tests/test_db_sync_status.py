@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+This file test the rebuild of the status timeline from the status transitions.
+COMMAND: clear && pytest code/db_sync/tests/test_db_sync_status.py -s
+"""
+
+#######################        MANDATORY IMPORTS         #######################
+import os
+import sys
+#######################         GENERIC IMPORTS          #######################
+from datetime import datetime, timedelta
+
+#######################      SYSTEM ABSTRACTION IMPORTS  #######################
+sys.path.append(os.getcwd())
+os.environ.setdefault('CONFIG_FILE_PATH', 'config/config_params_example.yaml')
+from system_logger_tool import Logger, SysLogLoggerC, sys_log_logger_get_module_logger
+main_logger = SysLogLoggerC(file_log_levels="config/db_sync/log_config_example.yaml",
+                            output_sub_folder='tests')
+log: Logger = sys_log_logger_get_module_logger(name="test_db_sync_status")
+
+#######################       THIRD PARTY IMPORTS        #######################
+
+#######################          PROJECT IMPORTS         #######################
+from wattrex_driver_db import DrvDbMasterStatusC
+
+#######################          MODULE IMPORTS          #######################
+sys.path.append(os.getcwd()+'/code/db_sync/')
+from src.wattrex_cycler_db_sync import db_sync_status_timeline, db_sync_status_at
+
+######################             CONSTANTS              ######################
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+#######################             CLASSES              #######################
+
+class TestStatusTimeline:
+    '''Test the status timeline built from the status transitions.'''
+
+    @staticmethod
+    def _row(status_id: int, seconds: int, status: str, error_code: int = 0,
+             dev_id: int = 1) -> DrvDbMasterStatusC:
+        return DrvDbMasterStatusC(ExpID= 1, StatusID= status_id, DevID= dev_id,
+                                  Timestamp= START + timedelta(seconds= seconds),
+                                  Status= status, ErrorCode= error_code)
+
+    def test_keep_alive_merged(self) -> None:
+        """Keep alive rows extend the interval of the previous transition.
+        """
+        rows = [self._row(0, 0, 'OK'), self._row(1, 60, 'OK'), self._row(2, 90, 'COMM_ERROR', 3),
+                self._row(3, 95, 'OK'), self._row(4, 155, 'OK')]
+        end = START + timedelta(seconds= 200)
+        intervals = db_sync_status_timeline(reversed(rows), end= end)[1]
+        assert [(i.status, i.error_code) for i in intervals] == [('OK', 0), ('COMM_ERROR', 3),
+                                                                 ('OK', 0)]
+        assert intervals[0].end == intervals[1].start == START + timedelta(seconds= 90)
+        assert intervals[-1].end == end
+        assert db_sync_status_at(intervals, START + timedelta(seconds= 92)).status == 'COMM_ERROR'
+        assert db_sync_status_at(intervals, START - timedelta(seconds= 1)) is None
+        assert db_sync_status_at(intervals, end + timedelta(seconds= 1)) is None
+
+    def test_devices_split(self) -> None:
+        """Each device has its own intervals.
+        """
+        rows = [self._row(0, 0, 'OK', dev_id= 1), self._row(1, 0, 'OK', dev_id= 2),
+                self._row(2, 10, 'INTERNAL_ERROR', 5, dev_id= 2)]
+        timeline = db_sync_status_timeline(rows)
+        assert len(timeline[1]) == 1 and timeline[1][0].end == START
+        assert [i.status for i in timeline[2]] == ['OK', 'INTERNAL_ERROR']